@@ -1,55 +1,83 @@
 """
 Flask web application for AI Voice Bot
 """
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, abort, g, render_template, request, jsonify, send_file, session, url_for, stream_with_context
 from flask_cors import CORS
 import sys
-import json
-import requests
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+import time
 from config import (
-    GROQ_API_KEY,
-    GROQ_MODEL,
-    OPENAI_API_KEY,
-    OPENAI_MODEL,
-    SYSTEM_PROMPT,
-    N8N_WEBHOOK_URL,
     GOOGLE_CLIENT_ID,
     SECRET_KEY,
+    METRICS_ENABLED,
 )
 
-# Import LLM clients from voice_bot
-from voice_bot import GroqClient, OpenAIClient, FallbackClient
+import chat_service
+# Shared with async_app.py (init_worker, shutdown_worker and warm_up are also importable from here)
+from chat_service import (
+    start_background_work,
+    start_warm_up,
+    init_worker,
+    shutdown_worker,
+    warm_up,
+)
+from google_verifier import google_verifier
+import server_session
+from assets import asset_url, resolve_asset, webp_url
+from metrics import (
+    REGISTRY,
+    HTTP_REQUESTS,
+    HTTP_REQUEST_SECONDS,
+    HTTP_IN_FLIGHT,
+)
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = SECRET_KEY
+server_session.install(app)
 CORS(app, supports_credentials=True)
 
-# Initialize LLM client
-def get_llm_client():
-    """Initialize the LLM client based on configuration"""
-    try:
-        if GROQ_API_KEY:
-            print(f"Initializing Groq client with model: {GROQ_MODEL}")
-            return GroqClient(GROQ_API_KEY, GROQ_MODEL)
-        elif OPENAI_API_KEY:
-            print(f"Initializing OpenAI client with model: {OPENAI_MODEL}")
-            return OpenAIClient(OPENAI_API_KEY, OPENAI_MODEL)
-        else:
-            print("No API keys found. Using fallback client.")
-            return FallbackClient()
-    except Exception as e:
-        print(f"Error initializing LLM client: {e}")
-        print("Falling back to FallbackClient")
-        return FallbackClient()
-
-try:
-    llm_client = get_llm_client()
-    print(f"LLM client initialized: {type(llm_client).__name__}")
-except Exception as e:
-    print(f"Critical error initializing LLM client: {e}")
-    llm_client = FallbackClient()
+@app.before_request
+def start_request_metrics():
+    start_background_work()
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_started_at = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(route=g.metrics_route)
+
+@app.after_request
+def count_request(response):
+    HTTP_REQUESTS.inc(route=g.get('metrics_route', 'unmatched'), method=request.method,
+                      status=response.status_code)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc=None):
+    # Runs after the last byte of streamed responses, too
+    route = g.pop('metrics_route', None)
+    if route is None:
+        return
+    HTTP_IN_FLIGHT.dec(route=route)
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started_at, route=route)
+
+@app.context_processor
+def asset_helpers():
+    return {
+        'asset_url': lambda name: asset_url(name, lambda n: url_for('static', filename=n)),
+        'webp_url': webp_url,
+    }
+
+@app.route('/assets/<path:filename>')
+def built_asset(filename):
+    """Fingerprinted static file from `python assets.py build`"""
+    resolved = resolve_asset(filename, request.headers.get('Accept-Encoding', ''),
+                             request.headers.get('If-None-Match', ''))
+    if resolved is None:
+        abort(404)
+    status, path, headers = resolved
+    if status == 304:
+        return Response(status=304, headers=headers)
+    response = send_file(path, mimetype=headers['Content-Type'], conditional=False, etag=False)
+    response.headers.pop('Content-Disposition', None)
+    response.headers.update(headers)
+    return response
 
 @app.route('/')
 def index():
@@ -70,140 +98,10 @@ def chat():
         if not question:
             return jsonify({'error': 'No question provided'}), 400
         
-        # Check if user is authenticated and if question is about booking
-        user_email = session.get('user_email')
-        user_name = session.get('user_name')
-        is_authenticated = session.get('authenticated', False)
-        
-        # Detect booking intent (keywords that suggest user wants to book)
-        booking_keywords = ['book', 'schedule', 'appointment', 'interview', 'meeting', 'slot', 'call', 'connect', 'talk']
-        question_lower = question.lower()
-        is_booking_intent = any(keyword in question_lower for keyword in booking_keywords)
-        
-        # If user is authenticated and wants to book, add their info to context
-        if is_authenticated and is_booking_intent and user_name and user_email:
-            # Add user context before the question so LLM knows their info
-            context_message = f"[User Info: Name: {user_name}, Email: {user_email}]"
-            enhanced_question = f"{context_message}\n\nUser: {question}"
-            print(f"[AUTH] Using authenticated user info for booking: {user_name} ({user_email})")
-        else:
-            enhanced_question = question
-        
-        # Get response from LLM
-        raw_response = llm_client.get_response(enhanced_question)
-
-        if not raw_response:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to generate response'
-            }), 500
-
-        response_text = raw_response
-        booking_payload = None
-        booking_result = None
-
-        # Detect special meeting booking marker from the LLM response
-        marker = "[[BOOK_INTERVIEW]]"  # Keep marker name for backward compatibility
-        if marker in raw_response:
-            try:
-                # Split conversational text and machine-readable JSON marker
-                conversational_part, marker_part = raw_response.rsplit(marker, 1)
-                response_text = conversational_part.strip()
-
-                marker_json_str = marker_part.strip()
-                if marker_json_str:
-                    # Be defensive: extract substring between first '{' and last '}' to avoid trailing text
-                    start_idx = marker_json_str.find('{')
-                    end_idx = marker_json_str.rfind('}')
-                    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                        json_str = marker_json_str[start_idx:end_idx + 1]
-                    else:
-                        json_str = marker_json_str
-
-                    booking_payload = json.loads(json_str)
-                    
-                    # Normalize date format for Google Calendar (ensure ISO format with seconds)
-                    # Check if time part has format HH:MM (needs :00 seconds) vs HH:MM:SS (already has seconds)
-                    def normalize_datetime(dt_str):
-                        if not dt_str or "T" not in dt_str:
-                            return dt_str
-                        # Split date and time parts
-                        if "T" in dt_str:
-                            date_part, time_part = dt_str.split("T", 1)
-                            # Check if time part has seconds (2 colons) or just minutes (1 colon)
-                            if time_part.count(":") == 1:
-                                # Format is HH:MM, add :00 for seconds
-                                return f"{date_part}T{time_part}:00"
-                            # Already has seconds or timezone, return as is
-                            return dt_str
-                        return dt_str
-                    
-                    if "start" in booking_payload:
-                        booking_payload["start"] = normalize_datetime(booking_payload["start"])
-                    
-                    if "end" in booking_payload:
-                        booking_payload["end"] = normalize_datetime(booking_payload["end"])
-                    
-                    # Normalize timezone: convert common abbreviations to IANA timezone
-                    if "timezone" in booking_payload:
-                        tz = booking_payload["timezone"].upper()
-                        tz_map = {
-                            "IST": "Asia/Kolkata",
-                            "PST": "America/Los_Angeles",
-                            "EST": "America/New_York",
-                            "GMT": "UTC",
-                            "UTC": "UTC"
-                        }
-                        if tz in tz_map:
-                            booking_payload["timezone"] = tz_map[tz]
-                    
-                    # ALWAYS use authenticated user info if available (override any LLM-provided values)
-                    if session.get('authenticated'):
-                        authenticated_name = session.get('user_name', '')
-                        authenticated_email = session.get('user_email', '')
-                        if authenticated_name:
-                            booking_payload['name'] = authenticated_name
-                            print(f"[BOOKING] Using authenticated name: {authenticated_name}")
-                        if authenticated_email:
-                            booking_payload['email'] = authenticated_email
-                            print(f"[BOOKING] Using authenticated email: {authenticated_email}")
-                    
-                    print(f"[BOOKING] Detected booking payload: {booking_payload}")
-            except Exception as e:
-                print(f"[BOOKING] Error parsing booking marker: {e} | raw marker: {marker_part!r}")
-                # Fallback: keep full text, no booking payload
-                response_text = raw_response
-                booking_payload = None
-
-        # If we have booking data and an n8n webhook URL configured, trigger the workflow
-        if booking_payload:
-            if not N8N_WEBHOOK_URL:
-                print("[BOOKING] Booking payload present but N8N_WEBHOOK_URL is not set. Skipping webhook call.")
-            else:
-                try:
-                    print(f"[BOOKING] Sending booking payload to n8n: {N8N_WEBHOOK_URL}")
-                    n8n_response = requests.post(
-                        N8N_WEBHOOK_URL,
-                        json=booking_payload,
-                        timeout=10
-                    )
-                    print(f"[BOOKING] n8n response status: {n8n_response.status_code}")
-                    n8n_response.raise_for_status()
-                    # Try to parse JSON response from n8n (if any)
-                    try:
-                        booking_result = n8n_response.json()
-                    except Exception:
-                        booking_result = {"status": "success", "raw": n8n_response.text}
-                except Exception as e:
-                    print(f"[BOOKING] Error calling n8n webhook: {e}")
-                    booking_result = {"status": "error", "error": str(e)}
-
-        # Always return a successful chat response here; booking_result may be None
-        return jsonify({
-            'success': True,
-            'response': response_text,
-            'booking': booking_result
-        })
+        # Get response from LLM using this session's history
+        turn = chat_service.open_turn(session, question)
+        payload, status = chat_service.answer(session, turn)
+        return jsonify(payload), status
             
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
@@ -212,25 +110,54 @@ def chat():
             'error': str(e)
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream the chat reply as Server-Sent Events
+
+    Emits "data" events with {"delta": text} as the reply arrives, then a
+    "done" event with the same body /api/chat returns (or an "error" event).
+    """
+    data = request.json or {}
+    question = data.get('question', '').strip()
+    
+    if not question:
+        return jsonify({'error': 'No question provided'}), 400
+    
+    turn = chat_service.open_turn(session, question)
+    return Response(
+        stream_with_context(chat_service.stream_events(session, turn)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'llm_type': type(llm_client).__name__
-    })
+    return jsonify(chat_service.health_status())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics (all workers when METRICS_DIR is set)"""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/reset', methods=['POST'])
 def reset():
     """Reset conversation context (start a new conversation)"""
     try:
-        global llm_client
-        llm_client = get_llm_client()
+        chat_service.reset_conversation(session)
         return jsonify({'success': True})
     except Exception as e:
         print(f"Error resetting conversation: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/booking/<booking_id>', methods=['GET'])
+def booking_status(booking_id):
+    """Delivery status of a queued booking"""
+    payload, status = chat_service.booking_status(booking_id)
+    return jsonify(payload), status
+
 @app.route('/api/auth/google', methods=['POST'])
 def google_auth():
     """Verify Google ID token and create session"""
@@ -246,33 +173,9 @@ def google_auth():
         
         # Verify the token
         try:
-            idinfo = id_token.verify_oauth2_token(
-                token, 
-                google_requests.Request(), 
-                GOOGLE_CLIENT_ID
-            )
-            
-            # Get user info
-            user_email = idinfo.get('email')
-            user_name = idinfo.get('name', user_email.split('@')[0])
-            user_picture = idinfo.get('picture', '')
-            
-            # Store in session
-            session['user_email'] = user_email
-            session['user_name'] = user_name
-            session['user_picture'] = user_picture
-            session['authenticated'] = True
-            
-            print(f"[AUTH] User authenticated: {user_name} ({user_email})")
-            
-            return jsonify({
-                'success': True,
-                'user': {
-                    'name': user_name,
-                    'email': user_email,
-                    'picture': user_picture
-                }
-            })
+            idinfo = google_verifier.verify(token)
+            user = chat_service.sign_in(session, idinfo)
+            return jsonify({'success': True, 'user': user})
         except ValueError as e:
             print(f"[AUTH] Token verification failed: {e}")
             return jsonify({'error': 'Invalid token'}), 401
@@ -284,20 +187,7 @@ def google_auth():
 @app.route('/api/auth/user', methods=['GET'])
 def get_user():
     """Get current user info from session"""
-    if session.get('authenticated'):
-        return jsonify({
-            'success': True,
-            'user': {
-                'name': session.get('user_name'),
-                'email': session.get('user_email'),
-                'picture': session.get('user_picture')
-            }
-        })
-    else:
-        return jsonify({
-            'success': False,
-            'user': None
-        })
+    return jsonify(chat_service.current_user(session))
 
 @app.route('/api/auth/config', methods=['GET'])
 def auth_config():
@@ -309,7 +199,7 @@ def auth_config():
 @app.route('/api/auth/logout', methods=['POST'])
 def logout():
     """Logout user"""
-    session.clear()
+    chat_service.sign_out(session)
     return jsonify({'success': True})
 
 @app.route('/test')
@@ -317,7 +207,7 @@ def test():
     """Test route to verify Flask is working"""
     return jsonify({
         'message': 'Flask is working!',
-        'routes': ['/', '/api/chat', '/api/health', '/test']
+        'routes': ['/', '/api/chat', '/api/chat/stream', '/api/health', '/test']
     })
 
 @app.errorhandler(404)
@@ -326,10 +216,14 @@ def not_found(error):
     return jsonify({
         'error': 'Not Found',
         'message': 'The requested URL was not found on the server.',
-        'available_routes': ['/', '/api/chat', '/api/health', '/test']
+        'available_routes': ['/', '/api/chat', '/api/chat/stream', '/api/health', '/test']
     }), 404
 
 if __name__ == '__main__':
+    if '--profile-startup' in sys.argv:
+        from startup_profile import main
+        sys.exit(main([arg for arg in sys.argv[1:] if arg != '--profile-startup']))
+    start_warm_up()
     print("Starting Flask server...")
     print("Open http://localhost:5000 in your browser")
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,266 @@
+"""
+Speech recognition backends for the desktop voice bot
+
+A backend turns microphone audio into text. VoicePipeline feeds it each
+utterance frame by frame while the visitor is still talking:
+
+    stream = backend.start(sample_rate, sample_width)
+    partial, endpoint = stream.accept(frame)   # for every captured frame
+    text = stream.finish()                     # at the endpoint
+
+Backends (ASR_BACKEND):
+
+- google: speech_recognition's free Google Web Speech API. Audio is only
+  sent once the utterance has ended, one network round trip per question.
+- vosk: a local Kaldi model (pip install vosk), CPU only, no network. It
+  decodes frames as they arrive, so partial text is available while the
+  visitor speaks, and its own endpoint detection can end the utterance (and
+  start the LLM call) before the energy-based silence timeout does. Point
+  VOSK_MODEL_PATH at an unpacked model such as vosk-model-small-en-us-0.15
+  (about 40 MB); empty downloads the small English model on first use.
+
+WavSource stands in for the microphone, so recognition and the whole voice
+pipeline can be run from WAV files:
+
+    python asr.py --backend vosk question.wav
+"""
+import argparse
+import json
+import sys
+import time
+import wave
+
+from config import ASR_BACKEND, VOICE_END_SILENCE_SECONDS, VOSK_MODEL_PATH
+
+# Frames per read, as speech_recognition.Microphone uses
+DEFAULT_CHUNK = 1024
+
+
+class RecognitionStream:
+    """Recognition of one utterance; buffers the audio for finish()"""
+    def __init__(self, backend, sample_rate, sample_width):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self._frames = []
+
+    def accept(self, frame):
+        """Add a frame; returns (partial text, endpoint reached)"""
+        self._frames.append(frame)
+        return "", False
+
+    def finish(self):
+        """Final text of the utterance, or None"""
+        return self.backend.transcribe(b"".join(self._frames), self.sample_rate, self.sample_width)
+
+
+class ASRBackend:
+    """Base for speech recognition backends
+
+    Non-streaming backends only implement transcribe(); streaming ones return
+    their own RecognitionStream from start().
+    """
+    name = "base"
+    streaming = False
+    # Microphone sample rate the backend works best at (None: device default)
+    sample_rate = None
+
+    def start(self, sample_rate, sample_width):
+        return RecognitionStream(self, sample_rate, sample_width)
+
+    def transcribe(self, frame_data, sample_rate, sample_width):
+        """Text of a whole utterance (raw PCM), or None"""
+        stream = self.start(sample_rate, sample_width)
+        stream.accept(frame_data)
+        return stream.finish()
+
+
+class GoogleASR(ASRBackend):
+    """Google Web Speech API through speech_recognition (needs network)"""
+    name = "google"
+
+    def __init__(self, recognizer=None):
+        import speech_recognition as sr  # type: ignore
+        self._sr = sr
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def transcribe(self, frame_data, sample_rate, sample_width):
+        try:
+            audio = self._sr.AudioData(frame_data, sample_rate, sample_width)
+            return self.recognizer.recognize_google(audio)
+        except self._sr.UnknownValueError:
+            print("Could not understand audio. Please try again.")
+            return None
+        except self._sr.RequestError as e:
+            print(f"Error with speech recognition service: {e}")
+            return None
+
+
+class VoskStream(RecognitionStream):
+    def __init__(self, backend, recognizer, sample_rate, sample_width):
+        super().__init__(backend, sample_rate, sample_width)
+        self._recognizer = recognizer
+        self._final = None
+
+    def accept(self, frame):
+        if self._final is not None:
+            return self._final, True
+        if self._recognizer.AcceptWaveform(frame):
+            # Kaldi's endpointer found the end of the utterance
+            self._final = json.loads(self._recognizer.Result()).get("text", "")
+            return self._final, True
+        return json.loads(self._recognizer.PartialResult()).get("partial", ""), False
+
+    def finish(self):
+        if self._final is None:
+            self._final = json.loads(self._recognizer.FinalResult()).get("text", "")
+        return self._final or None
+
+
+class VoskASR(ASRBackend):
+    """Offline streaming recognition with a Vosk (Kaldi) model"""
+    name = "vosk"
+    streaming = True
+    # Vosk models are trained on 16 kHz audio; other rates are resampled
+    sample_rate = 16000
+
+    def __init__(self, model_path="", end_silence_seconds=None):
+        try:
+            import vosk  # type: ignore
+        except ImportError as e:
+            raise RuntimeError("ASR_BACKEND=vosk requires the vosk package: pip install vosk") from e
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        started_at = time.perf_counter()
+        self.model = vosk.Model(model_path) if model_path else vosk.Model(lang="en-us")
+        print(f"[ASR] Loaded Vosk model in {time.perf_counter() - started_at:.1f}s")
+        self.end_silence_seconds = end_silence_seconds
+
+    def start(self, sample_rate, sample_width):
+        if sample_width != 2:
+            raise ValueError("Vosk needs 16-bit audio")
+        recognizer = self._vosk.KaldiRecognizer(self.model, sample_rate)
+        if self.end_silence_seconds and hasattr(recognizer, "SetEndpointerDelays"):
+            # (max leading silence, trailing silence that ends an utterance, max length)
+            recognizer.SetEndpointerDelays(5.0, self.end_silence_seconds, 20.0)
+        return VoskStream(self, recognizer, sample_rate, sample_width)
+
+
+BACKENDS = {
+    "google": GoogleASR,
+    "vosk": VoskASR,
+}
+
+
+def get_asr_backend(name=ASR_BACKEND, recognizer=None):
+    """Create the configured speech recognition backend"""
+    if name not in BACKENDS:
+        raise ValueError(f"ASR_BACKEND must be one of {', '.join(BACKENDS)}, not {name!r}")
+    if name == "google":
+        return GoogleASR(recognizer)
+    return VoskASR(VOSK_MODEL_PATH, end_silence_seconds=VOICE_END_SILENCE_SECONDS)
+
+
+class WavSource:
+    """A speech_recognition.Microphone stand-in that plays a WAV file
+
+    Mono 16-bit PCM. After the file, it returns silence (trailing_silence
+    seconds, then forever unless loop_silence is False, when reading raises
+    EOFError). With realtime, reads are paced like a live microphone.
+    """
+    def __init__(self, path, chunk=DEFAULT_CHUNK, realtime=False, trailing_silence=1.0,
+                 leading_silence=0.0, loop_silence=True):
+        with wave.open(path, "rb") as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise ValueError(f"{path}: expected mono 16-bit PCM")
+            self.SAMPLE_RATE = wav.getframerate()
+            self.SAMPLE_WIDTH = wav.getsampwidth()
+            audio = wav.readframes(wav.getnframes())
+        self.CHUNK = chunk
+        silence = b"\x00\x00"
+        self._audio = (silence * int(leading_silence * self.SAMPLE_RATE) + audio
+                       + silence * int(trailing_silence * self.SAMPLE_RATE))
+        self.duration = len(self._audio) / (self.SAMPLE_RATE * self.SAMPLE_WIDTH)
+        # Seconds into the stream where the file's own audio ends
+        self.speech_end = (len(audio) / self.SAMPLE_WIDTH) / self.SAMPLE_RATE + leading_silence
+        self.realtime = realtime
+        self.loop_silence = loop_silence
+        self.stream = self
+        self._position = 0
+        self._started_at = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def read(self, frames, exception_on_overflow=False):
+        size = frames * self.SAMPLE_WIDTH
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        if self._position >= len(self._audio) and not self.loop_silence:
+            raise EOFError("End of WAV file")
+        frame = self._audio[self._position:self._position + size]
+        frame += b"\x00" * (size - len(frame))
+        self._position += size
+        if self.realtime:
+            due = self._started_at + self._position / (self.SAMPLE_RATE * self.SAMPLE_WIDTH)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return frame
+
+
+def transcribe_file(backend, path, chunk=DEFAULT_CHUNK, show_partials=True):
+    """Recognize a WAV file frame by frame, as the pipeline would
+
+    Returns {"text", "seconds" (audio length), "speech_end_s" (where the
+    file's audio ends), "endpoint_s" (audio time at which the backend found
+    the endpoint, or None) and "decode_s" (wall time)}.
+    """
+    source = WavSource(path, chunk=chunk, trailing_silence=1.0, loop_silence=False)
+    stream = backend.start(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+    started_at = time.perf_counter()
+    endpoint_s = None
+    last_partial = ""
+    position = 0.0
+    while position < source.duration:
+        frame = source.read(chunk)
+        position += chunk / source.SAMPLE_RATE
+        partial, endpoint = stream.accept(frame)
+        if show_partials and partial and partial != last_partial:
+            print(f"  ... {partial}")
+            last_partial = partial
+        if endpoint:
+            endpoint_s = round(position, 3)
+            break
+    text = stream.finish()
+    return {
+        "text": text,
+        "seconds": round(source.duration, 3),
+        "speech_end_s": round(source.speech_end, 3),
+        "endpoint_s": endpoint_s,
+        "decode_s": round(time.perf_counter() - started_at, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe WAV files with a speech recognition backend")
+    parser.add_argument("files", nargs="+", help="mono 16-bit PCM WAV files")
+    parser.add_argument("--backend", default=ASR_BACKEND, choices=sorted(BACKENDS))
+    parser.add_argument("--json", action="store_true", help="print one JSON object per file")
+    args = parser.parse_args(argv)
+
+    backend = get_asr_backend(args.backend)
+    for path in args.files:
+        result = transcribe_file(backend, path, show_partials=not args.json)
+        if args.json:
+            print(json.dumps({"file": path, **result}))
+        else:
+            print(f"{path}: {result['text']!r} ({result['seconds']}s of audio decoded in {result['decode_s']}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
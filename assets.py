@@ -0,0 +1,279 @@
+"""
+Fingerprinted, precompressed static assets
+
+`python assets.py build` copies every file of static/ into STATIC_BUILD_DIR
+under a content-hashed name (style.css -> style.1a2b3c4d5e.css) and writes:
+
+- .gz (and .br, when the brotli package is installed) variants of text assets
+- animated WebP versions of the GIFs (needs ffmpeg on PATH); the GIF stays as
+  the fallback for browsers without animated WebP
+- manifest.json mapping each original name to its built names
+
+Templates call asset_url('style.css') (and webp_url('mp.gif') for the
+animated WebP variant of a GIF). With a manifest they get /assets/<hashed name>, served
+with a one-year immutable Cache-Control since the name changes with the
+content, an ETag, 304 replies to revalidation, and the smallest encoding the
+browser accepts. Without a build, everything points at plain /static/ as
+before, so development needs no build step.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+from config import STATIC_BUILD_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+# Relative to this file, not the working directory the server was started from
+BUILD_DIR = os.path.join(BASE_DIR, STATIC_BUILD_DIR)
+MANIFEST_NAME = "manifest.json"
+ASSET_ROUTE = "/assets"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+COMPRESSIBLE = {".css", ".js", ".html", ".svg", ".json", ".txt", ".map"}
+# Smaller variants are kept only when they save at least this fraction
+MIN_SAVING = 0.05
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # In order of preference
+
+CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".json": "application/json",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".ico": "image/x-icon",
+}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def hashed_name(name, digest):
+    root, ext = os.path.splitext(name)
+    return f"{root}.{digest}{ext}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _compressed_variants(data):
+    """{encoding suffix: bytes} of the variants worth keeping"""
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in variants.items()
+            if len(body) <= len(data) * (1 - MIN_SAVING)}
+
+
+def _transcode_webp(gif_path):
+    """Animated WebP bytes of a GIF, or None when ffmpeg is unavailable or fails"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    out = f"{gif_path}.webp.tmp"
+    try:
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-i", gif_path, "-c:v", "libwebp",
+             "-lossless", "0", "-q:v", "70", "-loop", "0", "-an", "-f", "webp", out],
+            check=True, timeout=300,
+        )
+        with open(out, "rb") as f:
+            return f.read()
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"[ASSETS] Could not transcode {gif_path} to WebP: {e}")
+        return None
+    finally:
+        if os.path.exists(out):
+            os.remove(out)
+
+
+def build(source=STATIC_DIR, target=BUILD_DIR):
+    """Build fingerprinted assets of source into target; returns the manifest"""
+    target = os.path.abspath(target)
+    manifest = {}
+    kept = {MANIFEST_NAME}
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != target]
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, source).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            built = hashed_name(name, content_hash(data))
+            entry = {"file": built, "size": len(data)}
+            outputs = {built: data}
+            ext = os.path.splitext(name)[1].lower()
+            if ext in COMPRESSIBLE:
+                for suffix, body in _compressed_variants(data).items():
+                    outputs[built + suffix] = body
+                    entry[suffix.lstrip(".")] = len(body)
+            elif ext == ".gif":
+                webp_name = hashed_name(os.path.splitext(name)[0] + ".webp", content_hash(data))
+                webp_path = os.path.join(target, webp_name)
+                if os.path.exists(webp_path):
+                    # Same GIF content as the last build: reuse the slow transcode
+                    entry["webp"] = webp_name
+                    kept.add(webp_name)
+                else:
+                    webp = _transcode_webp(path)
+                    if webp is not None and len(webp) < len(data):
+                        outputs[webp_name] = webp
+                        entry["webp"] = webp_name
+            for out_name, body in outputs.items():
+                out_path = os.path.join(target, out_name)
+                kept.add(out_name)
+                if not os.path.exists(out_path):
+                    _write(out_path, body)
+            manifest[name] = entry
+            variants = ", ".join(f"{k} {v}" for k, v in entry.items() if k in ("gz", "br"))
+            print(f"[ASSETS] {name} -> {built} ({len(data)} bytes{', ' + variants if variants else ''}"
+                  f"{', webp' if 'webp' in entry else ''})")
+
+    _write(os.path.join(target, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    # Drop outputs of earlier builds that no longer match any source file
+    for dirpath, _, filenames in os.walk(target):
+        for filename in filenames:
+            out_name = os.path.relpath(os.path.join(dirpath, filename), target).replace(os.sep, "/")
+            if out_name not in kept:
+                os.remove(os.path.join(dirpath, filename))
+    return manifest
+
+
+class AssetManifest:
+    """Lookup of built asset names, reloaded when manifest.json changes"""
+    def __init__(self, directory=BUILD_DIR):
+        self.directory = os.path.abspath(directory)
+        self.path = os.path.join(self.directory, MANIFEST_NAME)
+        self._entries = {}
+        self._files = set()
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            entries = {}
+            if mtime is not None:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        entries = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"[ASSETS] Could not read {self.path}: {e}")
+            self._entries = entries
+            self._files = {entry["file"] for entry in entries.values()}
+            self._files.update(entry["webp"] for entry in entries.values() if "webp" in entry)
+            self._mtime = mtime
+
+    def entry(self, name):
+        self._refresh()
+        return self._entries.get(name)
+
+    def is_built(self, filename):
+        self._refresh()
+        return filename in self._files
+
+
+asset_manifest = AssetManifest()
+
+
+def asset_url(name, static_url=None):
+    """URL of a static file: its fingerprinted build if there is one, else /static/<name>"""
+    entry = asset_manifest.entry(name)
+    if entry:
+        return f"{ASSET_ROUTE}/{entry['file']}"
+    return static_url(name) if static_url else f"/static/{name}"
+
+
+def webp_url(name):
+    """URL of the animated WebP build of a GIF, or '' if there is none"""
+    entry = asset_manifest.entry(name)
+    if entry and "webp" in entry:
+        return f"{ASSET_ROUTE}/{entry['webp']}"
+    return ""
+
+
+def _preferred_encoding(accept_encoding):
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    return [(encoding, suffix) for encoding, suffix in ENCODINGS if accepted.get(encoding, 0) > 0]
+
+
+def resolve_asset(filename, accept_encoding="", if_none_match=""):
+    """How to answer a request for a built asset
+
+    Returns None for unknown names, else (status, path, headers): 304 with no
+    path when the browser's copy is current, otherwise 200 and the file to send
+    (precompressed when the browser accepts it).
+    """
+    if not asset_manifest.is_built(filename):
+        return None
+    path = os.path.join(asset_manifest.directory, filename)
+    ext = os.path.splitext(filename)[1].lower()
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Content-Type": CONTENT_TYPES.get(ext, "application/octet-stream"),
+    }
+    encoding = None
+    if ext in COMPRESSIBLE:
+        headers["Vary"] = "Accept-Encoding"
+        for candidate, suffix in _preferred_encoding(accept_encoding):
+            if os.path.exists(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+    # The hash in the name identifies the content; each encoding gets its own tag
+    digest = os.path.splitext(os.path.splitext(filename)[0])[1].lstrip(".")
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+    headers["ETag"] = etag
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return 304, None, headers
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return 200, path, headers
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["build"]:
+        print("usage: python assets.py build")
+        sys.exit(2)
+    built = build()
+    print(f"[ASSETS] Built {len(built)} assets into {BUILD_DIR}"
+          + ("" if brotli else " (install brotli for .br variants)")
+          + ("" if shutil.which("ffmpeg") else " (install ffmpeg for WebP animations)"))
@@ -0,0 +1,243 @@
+"""
+Async (ASGI) serving mode for the AI Voice Bot web app
+
+Serves the same routes as app.py, but chat, auth and booking run on asyncio:
+LLM calls use the providers' async clients, so a single worker process can
+hold many in-flight conversations instead of one per sync worker.
+
+Run with:
+    uvicorn async_app:app
+    gunicorn -k uvicorn.workers.UvicornWorker async_app:app
+
+The chat, booking and auth flow is chat_service.py, shared with app.py, so
+both modes behave identically. Its blocking parts (SQLite conversation
+store, booking queue, server-side sessions) run in threads here.
+"""
+import asyncio
+import time
+
+from quart import Quart, Response, abort, g, render_template, request, jsonify, send_file, session, stream_with_context, url_for
+from config import (
+    GOOGLE_CLIENT_ID,
+    SECRET_KEY,
+    METRICS_ENABLED,
+)
+import chat_service
+from chat_service import start_background_work, start_warm_up
+from metrics import (
+    REGISTRY,
+    HTTP_REQUESTS,
+    HTTP_REQUEST_SECONDS,
+    HTTP_IN_FLIGHT,
+)
+from google_verifier import google_verifier
+import server_session
+from assets import asset_url, resolve_asset, webp_url
+
+app = Quart(__name__, template_folder='templates', static_folder='static')
+app.secret_key = SECRET_KEY
+server_session.install_async(app)
+
+@app.before_serving
+async def begin_warm_up():
+    # Provider SDKs load in the background instead of delaying the first request
+    start_warm_up()
+
+@app.before_request
+async def start_request_metrics():
+    start_background_work()
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_started_at = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(route=g.metrics_route)
+
+@app.after_request
+async def count_request(response):
+    HTTP_REQUESTS.inc(route=g.get('metrics_route', 'unmatched'), method=request.method,
+                      status=response.status_code)
+    return response
+
+# Same CORS policy as CORS(app, supports_credentials=True) in app.py: any
+# origin is echoed back (a credentialed response can't use "*") with
+# credentials allowed, and preflights get the requested headers
+CORS_METHODS = 'DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT'
+
+@app.after_request
+async def add_cors_headers(response):
+    origin = request.headers.get('Origin')
+    if not origin:
+        return response
+    response.headers['Access-Control-Allow-Origin'] = origin
+    response.headers['Access-Control-Allow-Credentials'] = 'true'
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        requested_headers = request.headers.get('Access-Control-Request-Headers')
+        if requested_headers:
+            response.headers['Access-Control-Allow-Headers'] = requested_headers
+        response.headers['Access-Control-Allow-Methods'] = CORS_METHODS
+    response.vary.add('Origin')
+    return response
+
+@app.teardown_request
+async def finish_request_metrics(exc=None):
+    route = g.pop('metrics_route', None)
+    if route is None:
+        return
+    HTTP_IN_FLIGHT.dec(route=route)
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started_at, route=route)
+
+@app.context_processor
+async def asset_helpers():
+    return {
+        'asset_url': lambda name: asset_url(name, lambda n: url_for('static', filename=n)),
+        'webp_url': webp_url,
+    }
+
+@app.route('/assets/<path:filename>')
+async def built_asset(filename):
+    """Fingerprinted static file from `python assets.py build`"""
+    resolved = resolve_asset(filename, request.headers.get('Accept-Encoding', ''),
+                             request.headers.get('If-None-Match', ''))
+    if resolved is None:
+        abort(404)
+    status, path, headers = resolved
+    if status == 304:
+        return Response('', status=304, headers=headers)
+    response = await send_file(path, mimetype=headers['Content-Type'], add_etags=False)
+    response.headers.pop('Content-Disposition', None)
+    # Quart's default 12 hour Expires would contradict the immutable Cache-Control
+    response.headers.pop('Expires', None)
+    response.headers.update(headers)
+    return response
+
+@app.route('/')
+async def index():
+    """Main page"""
+    try:
+        return await render_template('index.html')
+    except Exception as e:
+        print(f"Error rendering template: {e}")
+        return f"Error loading page: {str(e)}", 500
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    """Handle chat requests"""
+    try:
+        data = await request.get_json()
+        question = data.get('question', '').strip()
+
+        if not question:
+            return jsonify({'error': 'No question provided'}), 400
+
+        # Get response from LLM using this session's history
+        turn = await chat_service.aopen_turn(session, question)
+        payload, status = await chat_service.aanswer(session, turn)
+        return jsonify(payload), status
+
+    except Exception as e:
+        print(f"Error in chat endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Stream the chat reply as Server-Sent Events (see app.chat_stream)"""
+    data = await request.get_json() or {}
+    question = data.get('question', '').strip()
+
+    if not question:
+        return jsonify({'error': 'No question provided'}), 400
+
+    turn = await chat_service.aopen_turn(session, question)
+
+    @stream_with_context
+    async def generate():
+        async for event in chat_service.astream_events(session, turn):
+            yield event
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/health', methods=['GET'])
+async def health():
+    """Health check endpoint"""
+    return jsonify({**chat_service.health_status(), 'mode': 'async'})
+
+@app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    """Prometheus metrics (all workers when METRICS_DIR is set)"""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/reset', methods=['POST'])
+async def reset():
+    """Reset conversation context (start a new conversation)"""
+    try:
+        await server_session.aload(session)
+        await asyncio.to_thread(chat_service.reset_conversation, session)
+        return jsonify({'success': True})
+    except Exception as e:
+        print(f"Error resetting conversation: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/booking/<booking_id>', methods=['GET'])
+async def booking_status(booking_id):
+    """Delivery status of a queued booking"""
+    payload, status = await asyncio.to_thread(chat_service.booking_status, booking_id)
+    return jsonify(payload), status
+
+@app.route('/api/auth/google', methods=['POST'])
+async def google_auth():
+    """Verify Google ID token and create session"""
+    try:
+        data = await request.get_json()
+        token = data.get('token', '').strip()
+
+        if not token:
+            return jsonify({'error': 'No token provided'}), 400
+
+        if not GOOGLE_CLIENT_ID:
+            return jsonify({'error': 'Google OAuth not configured'}), 500
+
+        # Verify the token (google-auth is blocking, so keep it off the event loop)
+        try:
+            idinfo = await asyncio.to_thread(google_verifier.verify, token)
+            await server_session.aload(session)
+            user = chat_service.sign_in(session, idinfo)
+            return jsonify({'success': True, 'user': user})
+        except ValueError as e:
+            print(f"[AUTH] Token verification failed: {e}")
+            return jsonify({'error': 'Invalid token'}), 401
+
+    except Exception as e:
+        print(f"Error in Google auth: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/auth/user', methods=['GET'])
+async def get_user():
+    """Get current user info from session"""
+    await server_session.aload(session)
+    return jsonify(chat_service.current_user(session))
+
+@app.route('/api/auth/config', methods=['GET'])
+async def auth_config():
+    """Get Google OAuth2 client ID for frontend"""
+    return jsonify({
+        'googleClientId': GOOGLE_CLIENT_ID
+    })
+
+@app.route('/api/auth/logout', methods=['POST'])
+async def logout():
+    """Logout user"""
+    await server_session.aload(session)
+    await asyncio.to_thread(chat_service.sign_out, session)
+    return jsonify({'success': True})
+
+if __name__ == '__main__':
+    print("Starting async server...")
+    print("Open http://localhost:5000 in your browser")
+    app.run(host='0.0.0.0', port=5000)
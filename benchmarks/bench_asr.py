@@ -0,0 +1,98 @@
+"""
+Accuracy and latency of the speech recognition backends on WAV fixtures
+
+Each fixture is a mono 16-bit WAV file (e.g. a recorded kiosk question) with
+the expected transcript next to it in a .txt file of the same name:
+
+    fixtures/life_story.wav
+    fixtures/life_story.txt    "tell me about your life story"
+
+Every file is streamed through each backend frame by frame, as the voice
+pipeline does (asr.transcribe_file), and the report gives per backend:
+
+- word error rate against the transcripts
+- real-time factor (decode time / audio length)
+- endpoint delay: audio seconds between the end of the recording and the
+  backend's own endpoint (streaming backends only; negative means the
+  utterance was ended during the recording's trailing silence)
+
+    python benchmarks/bench_asr.py fixtures/ --backend vosk --backend google
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from asr import BACKENDS, get_asr_backend, transcribe_file  # noqa: E402
+
+
+def word_errors(expected, actual):
+    """(edit distance in words, words expected)"""
+    ref = expected.lower().split()
+    hyp = (actual or "").lower().split()
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (ref_word != hyp_word))
+    return row[-1], len(ref)
+
+
+def run(backend, fixtures):
+    errors = words = 0
+    audio_s = decode_s = 0.0
+    delays, files = [], []
+    for wav_path, expected in fixtures:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = transcribe_file(backend, wav_path, show_partials=False)
+        file_errors, file_words = word_errors(expected, result["text"])
+        errors += file_errors
+        words += file_words
+        audio_s += result["seconds"]
+        decode_s += result["decode_s"]
+        if result["endpoint_s"] is not None:
+            delays.append(result["endpoint_s"] - result["speech_end_s"])
+        files.append({"file": os.path.basename(wav_path), "text": result["text"], "errors": file_errors})
+    return {
+        "files": len(fixtures),
+        "wer": round(errors / words, 3) if words else None,
+        "real_time_factor": round(decode_s / audio_s, 3) if audio_s else None,
+        "endpoint_delay_s": round(sum(delays) / len(delays), 3) if delays else None,
+        "results": files,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WER and latency of ASR backends on WAV fixtures")
+    parser.add_argument("fixtures", help="directory of .wav files with .txt transcripts")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS),
+                        help="backend to run (repeatable; default: all that can be loaded)")
+    args = parser.parse_args()
+
+    fixtures = []
+    for wav_path in sorted(glob.glob(os.path.join(args.fixtures, "*.wav"))):
+        txt_path = os.path.splitext(wav_path)[0] + ".txt"
+        if os.path.exists(txt_path):
+            with open(txt_path, encoding="utf-8") as f:
+                fixtures.append((wav_path, f.read().strip()))
+    if not fixtures:
+        sys.exit(f"No .wav files with .txt transcripts in {args.fixtures}")
+
+    report = {}
+    for name in args.backend or sorted(BACKENDS):
+        try:
+            backend = get_asr_backend(name)
+        except Exception as e:
+            report[name] = {"error": str(e)}
+            continue
+        report[name] = run(backend, fixtures)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
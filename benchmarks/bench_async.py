@@ -0,0 +1,124 @@
+"""
+Load benchmark: sync (gunicorn app:app) vs async (async_app:app) serving
+
+Starts the stub LLM, then each serving mode as a subprocess pointed at it,
+and drives concurrent chat sessions through /api/chat. Prints one JSON
+document with throughput and latency percentiles per mode.
+
+    python benchmarks/bench_async.py --concurrency 50 --requests 4 --latency 1.0
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_llm import start_stub_server  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    # What the Procfile runs today: one sync worker
+    "sync": ["gunicorn", "-w", "1", "app:app"],
+    "async": ["gunicorn", "-w", "1", "-k", "uvicorn.workers.UvicornWorker", "async_app:app"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_session(base_url, requests_per_session, timeout):
+    """One simulated visitor: its own cookie jar, several questions in a row"""
+    latencies, errors = [], 0
+    with requests.Session() as http:
+        for _ in range(requests_per_session):
+            start = time.perf_counter()
+            try:
+                r = http.post(f"{base_url}/api/chat", json={"question": "What's your life story?"}, timeout=timeout)
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except requests.RequestException:
+                errors += 1
+    return latencies, errors
+
+
+def bench_mode(name, stub_url, args):
+    port = free_port()
+    env = dict(os.environ, OPENAI_API_KEY="stub", OPENAI_BASE_URL=stub_url, GROQ_API_KEY="",
+               N8N_WEBHOOK_URL="")
+    cmd = MODES[name] + ["-b", f"127.0.0.1:{port}", "--timeout", "120"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_for(f"{base_url}/api/health")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(
+                lambda _: run_session(base_url, args.requests, args.timeout),
+                range(args.concurrency),
+            ))
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    latencies = [lat for lats, _ in results for lat in lats]
+    errors = sum(err for _, err in results)
+    return {
+        "mode": name,
+        "concurrency": args.concurrency,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async serving modes")
+    parser.add_argument("--concurrency", type=int, default=50, help="simultaneous sessions")
+    parser.add_argument("--requests", type=int, default=4, help="requests per session")
+    parser.add_argument("--latency", type=float, default=1.0, help="stub LLM time to first token (s)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency=args.latency, tokens_per_second=1000)
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    report = {"stub_latency_s": args.latency, "results": [bench_mode(m, stub_url, args) for m in args.modes]}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
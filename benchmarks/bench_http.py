@@ -0,0 +1,164 @@
+"""
+Micro-benchmark: fresh vs reused outbound connections (http_transport)
+
+Starts a local keep-alive HTTP server and an HTTPS one with a throwaway
+self-signed certificate. Sends the same small JSON POST (like an n8n webhook
+call) many times through:
+
+    fresh          requests.post(): a new connection (and TLS handshake) per call
+    pooled         http_transport.session(): kept-alive connections from the shared pools
+    httpx_fresh    a new httpx client per call (plain HTTP only)
+    httpx_shared   http_transport.sdk_http_client(), as the LLM SDKs use it (plain HTTP only)
+
+Prints one JSON document with mean/p50/p95 latency per client and scheme,
+plus the transport's connection reuse stats.
+
+    python benchmarks/bench_http.py --requests 500 --threads 4
+"""
+import argparse
+import datetime
+import ipaddress
+import json
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_async import ROOT, percentile  # noqa: E402
+
+sys.path.insert(0, ROOT)
+import http_transport  # noqa: E402
+
+PAYLOAD = {"name": "Bench", "email": "bench@example.com", "start": "2026-01-01T10:00:00"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    # Headers and body go out in separate writes; without TCP_NODELAY a reused
+    # connection stalls ~40 ms on delayed ACKs, which real servers don't
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def self_signed_cert(directory):
+    """(cert_path, key_path) of a certificate for 127.0.0.1"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def start_server(tls=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    if tls:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*tls)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scheme = "https" if tls else "http"
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/webhook"
+
+
+def measure(call, total, threads):
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        return time.perf_counter() - start
+
+    call()  # Not counted: lets the pooled clients open their first connection
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fresh vs reused outbound HTTP connections")
+    parser.add_argument("--requests", type=int, default=300, help="requests per client and scheme")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent callers")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="voicebot-bench-http-")
+    cert_path, key_path = self_signed_cert(workdir)
+    http_server, http_url = start_server()
+    https_server, https_url = start_server((cert_path, key_path))
+    results = {}
+    for scheme, url in (("http", http_url), ("https", https_url)):
+        verify = cert_path if scheme == "https" else True
+        results[scheme] = {
+            "fresh": measure(lambda: requests.post(url, json=PAYLOAD, timeout=10, verify=verify).json(),
+                             args.requests, args.threads),
+            "pooled": measure(
+                lambda: http_transport.session().post(url, json=PAYLOAD, timeout=10, verify=verify).json(),
+                args.requests, args.threads),
+        }
+
+    def httpx_fresh():
+        with httpx.Client() as client:
+            client.post(http_url, json=PAYLOAD).json()
+
+    shared = http_transport.sdk_http_client(httpx.Client)
+    results["http"]["httpx_fresh"] = measure(httpx_fresh, args.requests, args.threads)
+    results["http"]["httpx_shared"] = measure(lambda: shared.post(http_url, json=PAYLOAD).json(),
+                                              args.requests, args.threads)
+    for scheme in results.values():
+        for fresh, pooled in (("fresh", "pooled"), ("httpx_fresh", "httpx_shared")):
+            if fresh in scheme:
+                scheme[f"{pooled}_speedup"] = round(scheme[fresh]["mean_ms"] / scheme[pooled]["mean_ms"], 2)
+    results["transport_stats"] = http_transport.stats()
+    print(json.dumps(results, indent=2))
+    http_server.shutdown()
+    https_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Offline load test of the web app against local stub LLM and n8n servers
+
+Starts the stub LLM (benchmarks/stub_llm.py) and stub n8n webhook
+(benchmarks/stub_n8n.py), runs the app under gunicorn pointed at them, and
+drives concurrent simulated visitors through a mix of flows:
+
+    chat     several /api/chat turns (first turns repeat, as real visitors do)
+    stream   /api/chat/stream turns (time to first event and to the end)
+    auth     /api/auth/config and /api/auth/user lookups
+    booking  a booking request, then /api/booking/<id> polling until n8n has it
+
+Reports RPS, p50/p95/p99 latency per flow step and the memory of every
+gunicorn worker, as one JSON document (--output writes it to a file). Pass
+a previous report with --compare to print the change of each figure, e.g.
+to check a commit for regressions:
+
+    python benchmarks/bench_load.py --output before.json
+    python benchmarks/bench_load.py --compare before.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_async import ROOT, free_port, percentile, wait_for  # noqa: E402
+from stub_llm import start_stub_server  # noqa: E402
+from stub_n8n import start_stub_n8n  # noqa: E402
+
+QUESTIONS = [
+    "What's your life story?",
+    "What's your number one superpower?",
+    "What are the top 3 areas you'd like to grow in?",
+    "What misconception do your coworkers have about you?",
+    "How do you push your boundaries and limits?",
+    "What are you working on these days?",
+]
+BOOKING_QUESTION = "Can I book a meeting with you tomorrow at 3pm UTC?"
+FLOWS = ("chat", "stream", "auth", "booking")
+
+
+class Recorder:
+    """Thread-safe latency samples and error counts per flow step"""
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, step, seconds):
+        with self._lock:
+            self.samples.setdefault(step, []).append(seconds)
+
+    def error(self, step):
+        with self._lock:
+            self.errors[step] = self.errors.get(step, 0) + 1
+
+    def timed(self, step, http, method, url, **kwargs):
+        """Send one request; record its latency, or an error. Returns the response or None"""
+        start = time.perf_counter()
+        try:
+            response = http.request(method, url, **kwargs)
+            response.raise_for_status()
+        except requests.RequestException:
+            self.error(step)
+            return None
+        self.add(step, time.perf_counter() - start)
+        return response
+
+
+def chat_flow(base_url, http, rec, turns, rng, timeout):
+    for _ in range(turns):
+        rec.timed("chat", http, "POST", f"{base_url}/api/chat",
+                  json={"question": rng.choice(QUESTIONS)}, timeout=timeout)
+
+
+def stream_flow(base_url, http, rec, turns, rng, timeout):
+    for _ in range(turns):
+        start = time.perf_counter()
+        try:
+            with http.post(f"{base_url}/api/chat/stream", json={"question": rng.choice(QUESTIONS)},
+                           stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                first = None
+                done = False
+                for line in response.iter_lines(decode_unicode=True):
+                    if first is None and line.startswith("data:"):
+                        first = time.perf_counter() - start
+                    done = done or line == "event: done"
+        except requests.RequestException:
+            rec.error("stream")
+            continue
+        if not done:
+            rec.error("stream")
+            continue
+        rec.add("stream_first_event", first)
+        rec.add("stream", time.perf_counter() - start)
+
+
+def auth_flow(base_url, http, rec, turns, rng, timeout):
+    for _ in range(turns):
+        rec.timed("auth_config", http, "GET", f"{base_url}/api/auth/config", timeout=timeout)
+        rec.timed("auth_user", http, "GET", f"{base_url}/api/auth/user", timeout=timeout)
+
+
+def booking_flow(base_url, http, rec, turns, rng, timeout):
+    response = rec.timed("booking_chat", http, "POST", f"{base_url}/api/chat",
+                         json={"question": BOOKING_QUESTION}, timeout=timeout)
+    booking = (response.json().get("booking") or {}) if response is not None else {}
+    if not booking.get("id"):
+        rec.error("booking_delivery")
+        return
+    # Time from the chat reply until n8n has the booking
+    start = time.perf_counter()
+    deadline = start + timeout
+    while time.perf_counter() < deadline:
+        time.sleep(0.05)
+        try:
+            status = http.get(f"{base_url}/api/booking/{booking['id']}", timeout=timeout).json()
+        except (requests.RequestException, ValueError):
+            continue
+        state = (status.get("booking") or {}).get("status")
+        if state == "sent":
+            rec.add("booking_delivery", time.perf_counter() - start)
+            return
+        if state == "failed":
+            break
+    rec.error("booking_delivery")
+
+
+FLOW_FUNCTIONS = {"chat": chat_flow, "stream": stream_flow, "auth": auth_flow, "booking": booking_flow}
+
+
+def run_session(base_url, flow, rec, turns, seed, timeout):
+    """One simulated visitor with its own cookie jar"""
+    with requests.Session() as http:
+        FLOW_FUNCTIONS[flow](base_url, http, rec, turns, random.Random(seed), timeout)
+
+
+def worker_pids(master_pid):
+    """Child process ids of the gunicorn master (Linux /proc)"""
+    pids = []
+    for task in os.listdir(f"/proc/{master_pid}/task"):
+        try:
+            with open(f"/proc/{master_pid}/task/{task}/children") as f:
+                pids.extend(int(pid) for pid in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def pss_mb(pid):
+    """Proportional set size: shared pages (e.g. from a preloading master) count once in total"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemorySampler(threading.Thread):
+    """Tracks start, peak and end RSS (and end PSS) of each worker while the load runs"""
+    def __init__(self, master_pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.workers = {}
+        self.pss = {}
+        self.stopped = threading.Event()
+
+    def sample(self):
+        if not os.path.isdir("/proc"):
+            return
+        for pid in worker_pids(self.master_pid):
+            rss = rss_mb(pid)
+            if rss is None:
+                continue
+            entry = self.workers.setdefault(pid, {"start": rss, "peak": rss, "end": rss})
+            entry["peak"] = max(entry["peak"], rss)
+            entry["end"] = rss
+            self.pss[pid] = pss_mb(pid)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def report(self):
+        return [
+            {"pid": pid, **{f"rss_mb_{k}": round(v, 1) for k, v in entry.items()},
+             "pss_mb_end": round(self.pss[pid], 1) if self.pss.get(pid) is not None else None}
+            for pid, entry in sorted(self.workers.items())
+        ]
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in FLOWS:
+            raise argparse.ArgumentTypeError(f"unknown flow {name!r} (choose from {', '.join(FLOWS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def compare(report, baseline):
+    """Lines describing how report differs from baseline"""
+    lines = [f"Compared with {baseline.get('commit') or 'baseline'}:"]
+
+    def delta(label, new, old, higher_is_better=False):
+        if new is None or old in (None, 0):
+            return
+        change = (new - old) / old * 100
+        worse = change < 0 if higher_is_better else change > 0
+        flag = "  <-- worse" if worse and abs(change) >= 10 else ""
+        lines.append(f"  {label:<32} {old:>10} -> {new:<10} ({change:+.1f}%){flag}")
+
+    delta("rps", report["rps"], baseline.get("rps"), higher_is_better=True)
+    delta("startup_s", report.get("startup_s"), baseline.get("startup_s"))
+    for step, stats in report["steps"].items():
+        old = baseline.get("steps", {}).get(step, {})
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            delta(f"{step} {key}", stats.get(key), old.get(key))
+    peak = max((w["rss_mb_peak"] for w in report["memory"]), default=None)
+    old_peak = max((w["rss_mb_peak"] for w in baseline.get("memory", [])), default=None)
+    delta("peak worker rss_mb", peak, old_peak)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web app against stub LLM and n8n servers")
+    parser.add_argument("--app", default="app:app", help="WSGI/ASGI app, e.g. async_app:app")
+    parser.add_argument("--profile", choices=["sync", "gthread", "async"],
+                        help="serve with gunicorn.conf.py and this SERVER_PROFILE (ignores --app, --threads, "
+                             "--worker-class)")
+    parser.add_argument("--workers", type=int, default=None, help="gunicorn workers (default 2, or the profile's)")
+    parser.add_argument("--threads", type=int, default=1, help="threads per worker (gthread)")
+    parser.add_argument("--worker-class", default=None, help="gunicorn worker class")
+    parser.add_argument("--sessions", type=int, default=200, help="simulated visitors in total")
+    parser.add_argument("--concurrency", type=int, default=20, help="visitors active at once")
+    parser.add_argument("--turns", type=int, default=3, help="steps per visitor")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=5,stream=2,auth=2,booking=1"),
+                        help="relative weight of each flow, e.g. chat=5,stream=2,auth=2,booking=1")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--n8n-latency", type=float, default=0.1)
+    parser.add_argument("--n8n-failure-rate", type=float, default=0.0)
+    parser.add_argument("--store", default="sqlite", choices=["memory", "sqlite"],
+                        help="CONVERSATION_STORE (memory only with --workers 1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args()
+    if args.store == "memory" and args.workers != 1:
+        parser.error("--store memory gives each worker its own conversations; use it with --workers 1")
+
+    llm = start_stub_server(latency=args.llm_latency, tokens_per_second=args.tokens_per_second)
+    n8n = start_stub_n8n(latency=args.n8n_latency, failure_rate=args.n8n_failure_rate)
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="voicebot-bench-")
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="stub",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{llm.server_address[1]}/v1",
+        GROQ_API_KEY="",
+        N8N_WEBHOOK_URL=f"http://127.0.0.1:{n8n.server_address[1]}/webhook",
+        BOOKING_DB_PATH=os.path.join(workdir, "bookings.db"),
+        BOOKING_RETRY_BASE_SECONDS="0.2",
+        CONVERSATION_STORE=args.store,
+        CONVERSATION_DB_PATH=os.path.join(workdir, "conversations.db"),
+        SEMANTIC_CACHE_PATH="",
+        METRICS_DIR=os.path.join(workdir, "metrics"),
+    )
+    if args.profile:
+        env["SERVER_PROFILE"] = args.profile
+        cmd = ["gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}"]
+        if args.workers:
+            cmd += ["-w", str(args.workers)]
+    else:
+        cmd = ["gunicorn", "-w", str(args.workers or 2), "--threads", str(args.threads),
+               "-b", f"127.0.0.1:{port}", "--timeout", "120"]
+        if args.worker_class:
+            cmd += ["-k", args.worker_class]
+        cmd.append(args.app)
+    launched_at = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    rng = random.Random(args.seed)
+    flows = rng.choices(list(args.mix), weights=list(args.mix.values()), k=args.sessions)
+    rec = Recorder()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for(f"{base_url}/api/health")
+        startup = time.perf_counter() - launched_at
+        sampler = MemorySampler(proc.pid)
+        sampler.sample()
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(
+                lambda item: run_session(base_url, item[1], rec, args.turns, args.seed + item[0], args.timeout),
+                enumerate(flows),
+            ))
+        elapsed = time.perf_counter() - start
+        sampler.stopped.set()
+        sampler.sample()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+
+    # Steps that are not requests of their own (sub-timings and background delivery)
+    derived = {"stream_first_event", "booking_delivery"}
+    completed = sum(len(v) for step, v in rec.samples.items() if step not in derived)
+    errors = sum(n for step, n in rec.errors.items() if step not in derived)
+    report = {
+        "commit": git_commit(),
+        "app": args.app,
+        "config": {
+            "profile": args.profile, "workers": args.workers or (None if args.profile else 2),
+            "threads": args.threads, "worker_class": args.worker_class,
+            "sessions": args.sessions, "concurrency": args.concurrency, "turns": args.turns,
+            "mix": args.mix, "llm_latency_s": args.llm_latency, "n8n_latency_s": args.n8n_latency,
+            "n8n_failure_rate": args.n8n_failure_rate, "store": args.store,
+        },
+        "startup_s": round(startup, 3),
+        "elapsed_s": round(elapsed, 3),
+        "requests": completed + errors,
+        "errors": errors,
+        "rps": round(completed / elapsed, 2) if elapsed else None,
+        "steps": {step: {**summarize(v), "errors": rec.errors.get(step, 0)}
+                  for step, v in sorted(rec.samples.items())},
+        "step_errors": rec.errors,
+        "memory": sampler.report(),
+        "stub_llm_requests": llm.requests_served,
+        "n8n": n8n.stats(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare(report, json.load(f))), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Fuzz check and throughput of the streaming booking extractor
+
+Feeds every reply of benchmarks/booking_corpus.json to BookingExtractor in
+random chunkings (single characters, small and large random pieces) and
+checks, for each one:
+
+- the streamed visible text equals the blocking parse_booking_marker() text
+- no piece of the marker or of the booking JSON is ever shown
+- the booking payload matches the blocking one and the corpus expectation
+
+Then times both paths over the corpus. Exits non-zero on any mismatch.
+
+    python benchmarks/fuzz_booking.py --rounds 500
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from booking import BOOKING_MARKER, BookingExtractor, parse_booking_marker  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "booking_corpus.json")
+
+
+def random_chunks(text, rng):
+    """text split into pieces the way a provider might stream it"""
+    max_size = rng.choice((1, 3, 8, 40, len(text) or 1))
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, max_size)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def stream(chunks):
+    extractor = BookingExtractor()
+    shown = [extractor.feed(chunk) for chunk in chunks]
+    shown.append(extractor.flush())
+    response_text, payload = extractor.result()
+    return ''.join(shown), response_text, payload
+
+
+def check(case, rng):
+    """Error messages for one random chunking of a corpus case"""
+    reply = case["reply"]
+    errors = []
+    expected_text, expected_payload = parse_booking_marker(reply, None)
+    shown, response_text, payload = stream(random_chunks(reply, rng))
+    if shown.strip() != expected_text or response_text != expected_text:
+        errors.append(f"text mismatch: {shown!r} vs {expected_text!r}")
+    if BOOKING_MARKER in shown or "[[BOOK_" in shown or '"email"' in shown:
+        errors.append(f"marker leaked: {shown!r}")
+    if payload != expected_payload:
+        errors.append(f"payload mismatch: {payload!r} vs {expected_payload!r}")
+    if (payload is not None) != case["booking"]:
+        errors.append(f"expected booking={case['booking']}, got {payload!r}")
+    for field in ("timezone", "end"):
+        if payload is not None and field in case and payload[field] != case[field]:
+            errors.append(f"{field}: expected {case[field]!r}, got {payload[field]!r}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200, help="random chunkings per corpus reply")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as f:
+        corpus = json.load(f)
+    rng = random.Random(args.seed)
+    failures = 0
+    # The extractor logs every booking it sees; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for case in corpus:
+            for _ in range(args.rounds):
+                errors = check(case, rng)
+                if errors:
+                    failures += 1
+                    print(f"{case['name']}: {'; '.join(errors)}", file=sys.stderr)
+                    break
+
+        replies = [case["reply"] for case in corpus]
+        token_chunks = [random_chunks(reply, random.Random(i)) for i, reply in enumerate(replies)]
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for reply in replies:
+                parse_booking_marker(reply, None)
+        blocking = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for chunks in token_chunks:
+                stream(chunks)
+        streamed = time.perf_counter() - start
+
+    total = args.rounds * len(replies)
+    print(json.dumps({
+        "cases": len(corpus),
+        "rounds": args.rounds,
+        "failures": failures,
+        "blocking_replies_per_s": round(total / blocking),
+        "streamed_replies_per_s": round(total / streamed),
+    }, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
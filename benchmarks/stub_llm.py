@@ -0,0 +1,181 @@
+"""
+Local stand-in for the OpenAI/Groq chat-completions API
+
+Answers POST /v1/chat/completions (and /openai/v1/chat/completions, the Groq
+path) with a canned reply after a configurable delay, both as a single JSON
+body and as a streamed SSE response. Usage includes
+prompt_tokens_details.cached_tokens, simulating provider prefix caching
+(message prefixes seen before count, in 128-token steps from 1024 tokens).
+Questions mentioning "book" get a reply carrying a booking marker, so
+booking flows can be exercised end to end. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 so benchmarks cost no API credits.
+
+    python benchmarks/stub_llm.py --port 8900 --latency 0.5 --tokens-per-second 200
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOOKING_MARKER = "[[BOOK_INTERVIEW]]"
+
+DEFAULT_REPLY = (
+    "I was born and brought up in Indore, and my journey so far has been all about "
+    "curiosity and learning. I completed my B.Tech from VIT Pune, and along the way "
+    "I discovered how AI could make a real difference."
+)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Chat-completions handler; settings live on the server instance"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.requests_served += 1
+            self.request_number = self.server.requests_served
+
+        # Time to first token
+        time.sleep(self.server.latency)
+        reply = self._reply(body)
+        words = reply.split(" ")
+        if body.get("stream"):
+            self._stream(body, words, reply)
+        else:
+            time.sleep(len(words) / self.server.tokens_per_second)
+            self._complete(body, reply)
+
+    def _reply(self, body):
+        user_messages = [m for m in body.get("messages", []) if m.get("role") == "user"]
+        question = (user_messages[-1].get("content") or "") if user_messages else ""
+        if "book" not in question.lower():
+            return self.server.reply
+        # A distinct slot per request, so every booking gets its own idempotency key
+        slot = self.request_number
+        day, minute = 1 + slot // (24 * 60) % 28, slot % (24 * 60)
+        start = f"2030-01-{day:02d}T{minute // 60:02d}:{minute % 60:02d}"
+        payload = {"name": "Load Test", "email": "load.test@example.com", "start": start,
+                   "end": start, "timezone": "UTC", "notes": "benchmark booking"}
+        return f"Done, you're booked! {BOOKING_MARKER} {json.dumps(payload)}"
+
+    def _complete(self, body, reply):
+        payload = json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": self._usage(body, reply),
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body, words, reply):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        delay = 1.0 / self.server.tokens_per_second
+        for i, word in enumerate(words):
+            text = word if i == 0 else " " + word
+            self._write_chunk(self._sse(completion_id, body, {"content": text}, None))
+            time.sleep(delay)
+        self._write_chunk(self._sse(completion_id, body, {}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage_chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [],
+                "usage": self._usage(body, reply),
+            }
+            self._write_chunk(f"data: {json.dumps(usage_chunk)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _sse(self, completion_id, body, delta, finish_reason):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _usage(self, body, reply):
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        completion_tokens = len(reply) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": self._cached_tokens(messages)},
+        }
+
+    def _cached_tokens(self, messages):
+        """Tokens in the longest message prefix already seen by this server"""
+        cached = chars = 0
+        digest = hashlib.sha256()
+        with self.server.lock:
+            for message in messages:
+                chars += len(message.get("content") or "")
+                digest.update(json.dumps(message, sort_keys=True).encode())
+                key = digest.hexdigest()
+                if key in self.server.seen_prefixes:
+                    cached = chars // 4
+                self.server.seen_prefixes.add(key)
+        return cached // 128 * 128 if cached >= 1024 else 0
+
+
+def start_stub_server(port=0, latency=0.5, tokens_per_second=200, reply=DEFAULT_REPLY):
+    """Start the stub in a background thread and return the server"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.tokens_per_second = tokens_per_second
+    server.reply = reply
+    server.requests_served = 0
+    server.seen_prefixes = set()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    args = parser.parse_args()
+    stub = start_stub_server(args.port, args.latency, args.tokens_per_second)
+    print(f"Stub LLM listening on http://127.0.0.1:{stub.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
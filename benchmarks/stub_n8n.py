@@ -0,0 +1,86 @@
+"""
+Local stand-in for the n8n booking webhook
+
+Accepts POSTed bookings after a configurable delay, optionally failing a
+fraction of them with HTTP 503 so the booking queue's retries are exercised.
+Deliveries are counted per Idempotency-Key, so duplicates are visible.
+
+    python benchmarks/stub_n8n.py --port 8901 --latency 0.2 --failure-rate 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubN8NHandler(BaseHTTPRequestHandler):
+    """Webhook handler; settings and counters live on the server instance"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        time.sleep(self.server.latency)
+        if random.random() < self.server.failure_rate:
+            with self.server.lock:
+                self.server.failures += 1
+            self._reply(503, {"status": "unavailable"})
+            return
+        key = self.headers.get("Idempotency-Key", "")
+        with self.server.lock:
+            self.server.deliveries[key] = self.server.deliveries.get(key, 0) + 1
+        self._reply(200, {"status": "success", "eventId": key})
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubN8NServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency, failure_rate):
+        super().__init__(address, StubN8NHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.deliveries = {}  # Idempotency-Key -> successful deliveries
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "bookings": len(self.deliveries),
+                "duplicate_deliveries": sum(n - 1 for n in self.deliveries.values()),
+                "failed_attempts": self.failures,
+            }
+
+
+def start_stub_n8n(port=0, latency=0.2, failure_rate=0.0):
+    """Start the stub webhook in a background thread and return the server"""
+    server = StubN8NServer(("127.0.0.1", port), latency, failure_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per webhook call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    args = parser.parse_args()
+    stub = start_stub_n8n(args.port, args.latency, args.failure_rate)
+    print(f"Stub n8n webhook listening on http://127.0.0.1:{stub.server_address[1]}/webhook")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,432 @@
+"""
+Meeting booking helpers shared by the sync and async web apps
+
+The LLM signals a confirmed booking by ending its reply with a marker line:
+[[BOOK_INTERVIEW]] {"name": ..., "email": ..., "start": ..., "end": ..., ...}
+
+BookingExtractor consumes the reply chunk by chunk (a whole blocking reply is
+just one chunk). It passes the conversational text through and holds back
+anything that could be the marker. After the marker it tracks JSON nesting,
+so the payload is parsed the moment its closing brace arrives. The payload
+is then validated and normalized:
+- name, email, start and timezone are required, notes is optional
+- times become YYYY-MM-DDTHH:MM:SS, and end defaults to start + 30 minutes
+- the timezone becomes an IANA name, from an abbreviation ("IST"), an IANA
+  name in any case, a city ("new york"), or a whole-hour UTC offset ("GMT+2")
+
+benchmarks/fuzz_booking.py checks streamed and blocking extraction agree
+over a corpus of replies split at random points.
+"""
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+try:
+    import zoneinfo
+except ImportError:  # pragma: no cover - Python < 3.9
+    zoneinfo = None
+
+from intents import BOOKING, detect_intent
+
+
+# Marker the LLM appends (with booking JSON) when a meeting should be booked
+BOOKING_MARKER = "[[BOOK_INTERVIEW]]"  # Keep marker name for backward compatibility
+
+
+def is_booking_intent(question):
+    """True if the question looks like a request to book a meeting"""
+    return detect_intent(question).name == BOOKING
+
+
+def user_context(user_session, question, history=()):
+    """The authenticated user's info for booking-related turns, or None
+
+    user_session is the web framework's session mapping. The info is sent as
+    a separate message after the persona prompt and history (not inside the
+    question), so the shared prompt prefix stays identical for every user.
+    It is included while the question or a recent user turn is about booking.
+    """
+    user_email = user_session.get('user_email')
+    user_name = user_session.get('user_name')
+    is_authenticated = user_session.get('authenticated', False)
+    if not (is_authenticated and user_name and user_email):
+        return None
+
+    recent_questions = [m['content'] for m in history[-6:] if m.get('role') == 'user']
+    if not any(is_booking_intent(text) for text in [question] + recent_questions):
+        return None
+    print(f"[AUTH] Using authenticated user info for booking: {user_name} ({user_email})")
+    return f"[User Info: Name: {user_name}, Email: {user_email}]"
+
+
+class BookingError(ValueError):
+    """The booking JSON is malformed or fails validation"""
+
+
+# Default meeting length when the LLM gives no (valid) end time
+DEFAULT_MEETING_MINUTES = 30
+
+# A local time, optionally with a UTC offset ("Z", "+05:30", "-0400")
+_DATETIME = re.compile(
+    r"^\s*(\d{4})-(\d{1,2})-(\d{1,2})[T ](\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?"
+    r"\s*(Z|[+-]\d{1,2}(?::?\d{2})?)?\s*$",
+    re.IGNORECASE,
+)
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+# "UTC+2", "GMT+05:30", "+0530"
+_UTC_OFFSET = re.compile(r"^(?:(?:UTC|GMT)\s*)?([+-])\s*(\d{1,2})(?::?(\d{2}))?$", re.IGNORECASE)
+# A fixed offset that no IANA zone names, as resolve_timezone returns it
+_FIXED_OFFSET_ZONE = re.compile(r"^UTC([+-])(\d{2}):(\d{2})$")
+
+# Common abbreviations (ambiguous ones resolved the way visitors here usually mean them)
+TIMEZONE_ABBREVIATIONS = {
+    "IST": "Asia/Kolkata",
+    "PST": "America/Los_Angeles", "PDT": "America/Los_Angeles", "PT": "America/Los_Angeles",
+    "MST": "America/Denver", "MDT": "America/Denver", "MT": "America/Denver",
+    "CST": "America/Chicago", "CDT": "America/Chicago", "CT": "America/Chicago",
+    "EST": "America/New_York", "EDT": "America/New_York", "ET": "America/New_York",
+    "GMT": "UTC", "UTC": "UTC", "Z": "UTC",
+    "BST": "Europe/London", "WET": "Europe/Lisbon",
+    "CET": "Europe/Paris", "CEST": "Europe/Paris", "EET": "Europe/Athens", "EEST": "Europe/Athens",
+    "MSK": "Europe/Moscow", "GST": "Asia/Dubai", "PKT": "Asia/Karachi",
+    "SGT": "Asia/Singapore", "HKT": "Asia/Hong_Kong", "JST": "Asia/Tokyo", "KST": "Asia/Seoul",
+    "AEST": "Australia/Sydney", "AEDT": "Australia/Sydney", "NZST": "Pacific/Auckland",
+    "INDIA": "Asia/Kolkata",
+    # Spelled-out names
+    "INDIA STANDARD TIME": "Asia/Kolkata", "INDIAN STANDARD TIME": "Asia/Kolkata",
+    "INDIA TIME": "Asia/Kolkata", "INDIAN TIME": "Asia/Kolkata",
+    "PACIFIC TIME": "America/Los_Angeles", "PACIFIC STANDARD TIME": "America/Los_Angeles",
+    "PACIFIC DAYLIGHT TIME": "America/Los_Angeles",
+    "MOUNTAIN TIME": "America/Denver", "MOUNTAIN STANDARD TIME": "America/Denver",
+    "MOUNTAIN DAYLIGHT TIME": "America/Denver",
+    "CENTRAL TIME": "America/Chicago", "CENTRAL STANDARD TIME": "America/Chicago",
+    "CENTRAL DAYLIGHT TIME": "America/Chicago",
+    "EASTERN TIME": "America/New_York", "EASTERN STANDARD TIME": "America/New_York",
+    "EASTERN DAYLIGHT TIME": "America/New_York",
+    "GREENWICH MEAN TIME": "UTC", "COORDINATED UNIVERSAL TIME": "UTC",
+    "BRITISH SUMMER TIME": "Europe/London", "UK TIME": "Europe/London",
+    "CENTRAL EUROPEAN TIME": "Europe/Paris", "CENTRAL EUROPEAN SUMMER TIME": "Europe/Paris",
+    "GULF STANDARD TIME": "Asia/Dubai", "SINGAPORE TIME": "Asia/Singapore",
+    "JAPAN STANDARD TIME": "Asia/Tokyo", "AUSTRALIAN EASTERN STANDARD TIME": "Australia/Sydney",
+}
+
+
+@lru_cache(maxsize=1)
+def _zone_index():
+    """Lookup of lowercased IANA names and their city part, built on first use"""
+    index = {}
+    if zoneinfo is None:
+        return index
+    try:
+        zones = zoneinfo.available_timezones()
+    except Exception:
+        return index
+    for zone in sorted(zones):
+        if zone.startswith(("posix/", "right/")):
+            continue
+        index[zone.lower()] = zone
+        city = zone.rsplit("/", 1)[-1].replace("_", " ").lower()
+        # Prefer canonical Area/City names over legacy aliases for the same city
+        if "/" in zone and not zone.startswith("Etc/"):
+            index.setdefault(city, zone)
+    return index
+
+
+def parse_utc_offset(text):
+    """UTC offset as a timedelta ("UTC+05:30", "GMT-3", "+0530", "Z"), or None"""
+    text = str(text).strip()
+    if text.upper() == "Z":
+        return timedelta(0)
+    match = _UTC_OFFSET.match(text)
+    if not match:
+        return None
+    sign, hours, minutes = match.group(1), int(match.group(2)), int(match.group(3) or 0)
+    if hours > 14 or minutes >= 60:
+        return None
+    offset = timedelta(hours=hours, minutes=minutes)
+    return -offset if sign == "-" else offset
+
+
+def offset_zone(offset):
+    """Zone name for a fixed UTC offset
+
+    Whole hours are IANA Etc/GMT zones; other offsets (India's +05:30) have
+    none and are named "UTC+05:30" (validate_booking converts those times to UTC).
+    """
+    minutes = int(offset.total_seconds()) // 60
+    if minutes == 0:
+        return "UTC"
+    sign = "+" if minutes > 0 else "-"
+    hours, rest = divmod(abs(minutes), 60)
+    if rest == 0:
+        # Etc/GMT zones have inverted signs: UTC+2 is Etc/GMT-2
+        return f"Etc/GMT{'-' if sign == '+' else '+'}{hours}"
+    return f"UTC{sign}{hours:02d}:{rest:02d}"
+
+
+@lru_cache(maxsize=512)
+def resolve_timezone(value):
+    """Zone name for a timezone as a visitor or LLM may write it, or None
+
+    An IANA name, or "UTC+HH:MM" for a fixed offset no IANA zone covers.
+    """
+    text = " ".join(str(value).strip().split())
+    if not text:
+        return None
+    abbreviation = TIMEZONE_ABBREVIATIONS.get(text.upper())
+    if abbreviation:
+        return abbreviation
+    offset = parse_utc_offset(text)
+    if offset is not None:
+        return offset_zone(offset)
+    key = text.lower()
+    index = _zone_index()
+    return index.get(key) or index.get(key.replace(" ", "_")) or index.get(key.replace("_", " "))
+
+
+def zone_info(name):
+    """tzinfo for a name returned by resolve_timezone, or None if unavailable"""
+    fixed = _FIXED_OFFSET_ZONE.match(name)
+    if fixed:
+        offset = timedelta(hours=int(fixed.group(2)), minutes=int(fixed.group(3)))
+        return timezone(-offset if fixed.group(1) == "-" else offset)
+    if name == "UTC":
+        return timezone.utc
+    if zoneinfo is None:
+        return None
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except Exception:
+        return None
+
+
+def parse_datetime(value):
+    """(naive datetime, UTC offset or None) of 'YYYY-MM-DDTHH:MM[:SS][offset]'; BookingError if invalid"""
+    match = _DATETIME.match(str(value))
+    if not match:
+        raise BookingError(f"invalid datetime {value!r}")
+    year, month, day, hour, minute, second = (int(part or 0) for part in match.groups()[:6])
+    offset = None
+    if match.group(7):
+        offset = parse_utc_offset(match.group(7))
+        if offset is None:
+            raise BookingError(f"invalid UTC offset in {value!r}")
+    try:
+        parsed = datetime(year, month, day, hour, minute, second)
+    except ValueError as e:
+        raise BookingError(f"invalid datetime {value!r}: {e}") from e
+    return parsed, offset
+
+
+def normalize_datetime(value):
+    """'YYYY-MM-DDTHH:MM[:SS]' (or with a space) as 'YYYY-MM-DDTHH:MM:SS'; BookingError if invalid
+
+    An offset, if any, is dropped; validate_booking applies it instead.
+    """
+    return parse_datetime(value)[0].strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _to_zone(moment, offset, tz):
+    """Wall-clock time in tz of moment, which is in offset (no conversion if either is unknown)"""
+    if offset is None or tz is None:
+        return moment
+    return moment.replace(tzinfo=timezone(offset)).astimezone(tz).replace(tzinfo=None)
+
+
+def validate_booking(payload, user_session=None):
+    """Check and normalize a booking payload; returns a new dict or raises BookingError
+
+    Authenticated user info from user_session overrides the name/email the
+    LLM provided.
+    """
+    if not isinstance(payload, dict):
+        raise BookingError("booking payload is not a JSON object")
+    booking = {key: value for key, value in payload.items() if value is not None}
+
+    if user_session is not None and user_session.get('authenticated'):
+        if user_session.get('user_name'):
+            booking['name'] = user_session['user_name']
+        if user_session.get('user_email'):
+            booking['email'] = user_session['user_email']
+
+    for field in ("name", "email", "start"):
+        if not isinstance(booking.get(field), str) or not booking[field].strip():
+            raise BookingError(f"missing {field}")
+    booking["name"] = booking["name"].strip()
+    booking["email"] = booking["email"].strip()
+    if not _EMAIL.match(booking["email"]):
+        raise BookingError(f"invalid email {booking['email']!r}")
+
+    start, start_offset = parse_datetime(booking["start"])
+    try:
+        end, end_offset = parse_datetime(booking.get("end", ""))
+    except BookingError:
+        end, end_offset = None, None
+
+    # The timezone may be left out when the start time carries an offset
+    if isinstance(booking.get("timezone"), str) and booking["timezone"].strip():
+        zone = resolve_timezone(booking["timezone"])
+        if zone is None:
+            raise BookingError(f"unknown timezone {booking['timezone']!r}")
+    elif start_offset is not None:
+        zone = offset_zone(start_offset)
+    else:
+        raise BookingError("missing timezone")
+    tz = zone_info(zone)
+    if _FIXED_OFFSET_ZONE.match(zone):
+        # No IANA zone has this offset and calendars want IANA names: times
+        # without an offset of their own are in it, and all are sent in UTC
+        zone_offset = tz.utcoffset(None)
+        start_offset = zone_offset if start_offset is None else start_offset
+        end_offset = zone_offset if end_offset is None else end_offset
+        tz, zone = timezone.utc, "UTC"
+    start = _to_zone(start, start_offset, tz)
+    if end is not None:
+        end = _to_zone(end, end_offset, tz)
+    if end is None or end <= start:
+        end = start + timedelta(minutes=DEFAULT_MEETING_MINUTES)
+    booking["start"] = start.strftime("%Y-%m-%dT%H:%M:%S")
+    booking["end"] = end.strftime("%Y-%m-%dT%H:%M:%S")
+    booking["timezone"] = zone
+
+    if "notes" in booking and not isinstance(booking["notes"], str):
+        booking["notes"] = str(booking["notes"])
+    return booking
+
+
+class BookingExtractor:
+    """Incremental extractor of the booking marker and its JSON payload
+
+    feed() each chunk as it arrives and show what it returns; call flush() at
+    the end of the reply, then result() for (response_text, booking_payload).
+    """
+    def __init__(self, marker=BOOKING_MARKER):
+        self.marker = marker
+        self.marker_seen = False
+        self.payload = None   # raw JSON object once it is complete
+        self.error = None     # why there is no payload, if the marker was seen
+        self._pending = ''    # held back text that may be the start of the marker
+        self._visible = []    # everything shown so far
+        self._json = []       # characters of the JSON object so far
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._json_done = False
+
+    def feed(self, chunk):
+        """Add a chunk and return the text that is safe to show"""
+        if self.marker_seen:
+            self._consume_json(chunk)
+            return ''
+        self._pending += chunk
+        idx = self._pending.find(self.marker)
+        if idx != -1:
+            self.marker_seen = True
+            visible = self._pending[:idx].rstrip()
+            rest = self._pending[idx + len(self.marker):]
+            self._pending = ''
+            self._visible.append(visible)
+            self._consume_json(rest)
+            return visible
+        # Keep the longest suffix that is a prefix of the marker
+        keep = 0
+        for size in range(min(len(self.marker) - 1, len(self._pending)), 0, -1):
+            if self.marker.startswith(self._pending[-size:]):
+                keep = size
+                break
+        visible = self._pending[:len(self._pending) - keep]
+        self._pending = self._pending[len(self._pending) - keep:]
+        self._visible.append(visible)
+        return visible
+
+    def flush(self):
+        """Return any held-back text once the stream has ended"""
+        visible = '' if self.marker_seen else self._pending
+        self._pending = ''
+        self._visible.append(visible)
+        if self.marker_seen and not self._json_done and self.error is None:
+            self.error = "booking JSON is incomplete" if self._json else "no JSON after the marker"
+        return visible
+
+    @property
+    def payload_ready(self):
+        """True as soon as the booking JSON has been completely received"""
+        return self.payload is not None
+
+    def _consume_json(self, text):
+        if self._json_done:
+            return
+        start = 0
+        if self._depth == 0:
+            # Skip whatever separates the marker from the JSON object
+            start = text.find('{')
+            if start == -1:
+                return
+        for i in range(start, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._json.append(text[start:i + 1])
+                    self._finish_json()
+                    return
+        self._json.append(text[start:])
+
+    def _finish_json(self):
+        self._json_done = True
+        try:
+            self.payload = json.loads(''.join(self._json))
+        except ValueError as e:
+            self.error = f"invalid booking JSON: {e}"
+
+    def result(self, user_session=None):
+        """(response_text, booking_payload) for the whole reply
+
+        booking_payload is None when there is no marker or its JSON is
+        invalid (then error says why); the marker and JSON are never part of
+        response_text.
+        """
+        response_text = ''.join(self._visible).strip()
+        if not self.marker_seen:
+            return response_text, None
+        if self.payload is None:
+            print(f"[BOOKING] Ignoring booking marker: {self.error}")
+            return response_text, None
+        try:
+            booking = validate_booking(self.payload, user_session)
+        except BookingError as e:
+            self.error = str(e)
+            print(f"[BOOKING] Invalid booking payload: {e} | {self.payload!r}")
+            return response_text, None
+        print(f"[BOOKING] Detected booking payload: {booking}")
+        return response_text, booking
+
+
+def parse_booking_marker(raw_response, user_session):
+    """Strip the booking marker from an LLM reply and extract the booking payload
+
+    Returns (response_text, booking_payload); booking_payload is None when the
+    reply contains no (valid) booking. Authenticated user info from
+    user_session overrides the name/email the LLM provided.
+    """
+    return extract_booking(raw_response).result(user_session)
+
+
+def extract_booking(raw_response):
+    """BookingExtractor that has consumed a whole reply"""
+    extractor = BookingExtractor()
+    extractor.feed(raw_response)
+    extractor.flush()
+    return extractor
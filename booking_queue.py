@@ -0,0 +1,264 @@
+"""
+Background dispatch of meeting bookings to the n8n webhook
+
+Bookings are written to a local SQLite queue and delivered by a small pool of
+worker threads, so the chat reply never waits on n8n and a failed delivery is
+retried with exponential backoff instead of being lost. Each booking's id is
+an idempotency key derived from its payload: the same booking enqueued twice
+is stored (and sent) once, and n8n receives the key in an Idempotency-Key
+header.
+
+Several gunicorn workers can share one queue file; a row is claimed with a
+conditional UPDATE so only one worker sends it.
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import http_transport
+from config import (
+    N8N_WEBHOOK_URL,
+    BOOKING_DB_PATH,
+    BOOKING_WORKERS,
+    BOOKING_MAX_ATTEMPTS,
+    BOOKING_RETRY_BASE_SECONDS,
+)
+from metrics import BOOKING_DELIVERIES, BOOKING_DELIVERY_SECONDS
+
+# Booking states
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Longest wait between retries
+MAX_RETRY_DELAY_SECONDS = 300
+# A "sending" row older than this is assumed orphaned (worker died) and retried
+SENDING_LEASE_SECONDS = 60
+
+
+def booking_id_for(payload):
+    """Idempotency key: a hash of the payload's canonical JSON"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class BookingDispatcher:
+    """Persistent booking queue with a retrying worker pool"""
+    def __init__(self, webhook_url, path="bookings.db", workers=2,
+                 max_attempts=6, retry_base_seconds=2.0, timeout=10):
+        self.webhook_url = webhook_url
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.timeout = timeout
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS bookings ("
+            " id TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL,"
+            " last_error TEXT,"
+            " result TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS bookings_due ON bookings (status, next_attempt_at)"
+        )
+        conn.commit()
+
+    def _connection(self):
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, payload):
+        """Queue a booking for delivery and return its id
+
+        Enqueueing an identical payload again returns the existing id; a
+        pending or sent booking is left alone, a failed one is retried afresh.
+        """
+        booking_id = booking_id_for(payload)
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR IGNORE INTO bookings"
+            " (id, payload, status, next_attempt_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (booking_id, json.dumps(payload), PENDING, now, now, now),
+        )
+        conn.execute(
+            "UPDATE bookings SET status = ?, attempts = 0, last_error = NULL,"
+            " next_attempt_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (PENDING, now, now, booking_id, FAILED),
+        )
+        conn.commit()
+        self.start()
+        self._wake.set()
+        return booking_id
+
+    def get(self, booking_id):
+        """Return a booking's delivery status, or None if unknown"""
+        row = self._connection().execute(
+            "SELECT status, attempts, last_error, result, created_at, updated_at"
+            " FROM bookings WHERE id = ?",
+            (booking_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        status, attempts, last_error, result, created_at, updated_at = row
+        return {
+            "id": booking_id,
+            # Claimed rows are still pending from the user's point of view
+            "status": PENDING if status == SENDING else status,
+            "attempts": attempts,
+            "error": last_error,
+            "result": json.loads(result) if result else None,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def start(self):
+        """Start the worker threads (again, if this process was forked)"""
+        if self._pid == os.getpid() and self._threads:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._threads:
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"booking-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the workers; undelivered bookings stay queued for the next start"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _worker(self):
+        while not self._stop.is_set():
+            booking = self._claim()
+            if booking is None:
+                # Sleep until new work arrives or the next retry may be due
+                self._wake.wait(self._seconds_until_due())
+                self._wake.clear()
+                continue
+            self._deliver(*booking)
+
+    def _seconds_until_due(self):
+        row = self._connection().execute(
+            "SELECT MIN(next_attempt_at) FROM bookings WHERE status = ?", (PENDING,)
+        ).fetchone()
+        if row[0] is None:
+            return SENDING_LEASE_SECONDS
+        return min(max(row[0] - time.time(), 0.05), SENDING_LEASE_SECONDS)
+
+    def _claim(self):
+        """Atomically take one due booking; returns (id, payload, attempts) or None"""
+        now = time.time()
+        conn = self._connection()
+        candidates = conn.execute(
+            "SELECT id, payload, attempts, status FROM bookings"
+            " WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND updated_at <= ?)"
+            " ORDER BY next_attempt_at LIMIT 5",
+            (PENDING, now, SENDING, now - SENDING_LEASE_SECONDS),
+        ).fetchall()
+        for booking_id, payload, attempts, status in candidates:
+            claimed = conn.execute(
+                "UPDATE bookings SET status = ?, updated_at = ?"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (SENDING, now, booking_id, status, attempts),
+            ).rowcount
+            conn.commit()
+            if claimed:
+                return booking_id, json.loads(payload), attempts
+        return None
+
+    def _deliver(self, booking_id, payload, attempts):
+        attempts += 1
+        try:
+            print(f"[BOOKING] Sending booking {booking_id} to n8n (attempt {attempts})")
+            with BOOKING_DELIVERY_SECONDS.time():
+                n8n_response = http_transport.session().post(
+                    self.webhook_url,
+                    json=payload,
+                    headers={"Idempotency-Key": booking_id},
+                    timeout=self.timeout,
+                )
+            print(f"[BOOKING] n8n response status: {n8n_response.status_code}")
+            n8n_response.raise_for_status()
+            # Try to parse JSON response from n8n (if any)
+            try:
+                result = n8n_response.json()
+            except Exception:
+                result = {"status": "success", "raw": n8n_response.text}
+        except Exception as e:
+            print(f"[BOOKING] Error calling n8n webhook: {e}")
+            self._retry_later(booking_id, attempts, str(e))
+            return
+        BOOKING_DELIVERIES.inc(outcome="sent")
+        conn = self._connection()
+        conn.execute(
+            "UPDATE bookings SET status = ?, attempts = ?, result = ?, last_error = NULL,"
+            " updated_at = ? WHERE id = ?",
+            (SENT, attempts, json.dumps(result), time.time(), booking_id),
+        )
+        conn.commit()
+
+    def _retry_later(self, booking_id, attempts, error):
+        now = time.time()
+        if attempts >= self.max_attempts:
+            status, next_attempt_at = FAILED, now
+            print(f"[BOOKING] Giving up on booking {booking_id} after {attempts} attempts")
+            BOOKING_DELIVERIES.inc(outcome="failed")
+        else:
+            BOOKING_DELIVERIES.inc(outcome="retry")
+            # Exponential backoff with jitter so workers don't retry in lockstep
+            delay = min(self.retry_base_seconds * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+            status, next_attempt_at = PENDING, now + delay * random.uniform(0.8, 1.2)
+        conn = self._connection()
+        conn.execute(
+            "UPDATE bookings SET status = ?, attempts = ?, last_error = ?,"
+            " next_attempt_at = ?, updated_at = ? WHERE id = ?",
+            (status, attempts, error, next_attempt_at, now, booking_id),
+        )
+        conn.commit()
+
+
+def get_booking_dispatcher():
+    """Create the dispatcher for N8N_WEBHOOK_URL, or None when it is not set"""
+    if not N8N_WEBHOOK_URL:
+        return None
+    return BookingDispatcher(
+        N8N_WEBHOOK_URL,
+        path=BOOKING_DB_PATH,
+        workers=BOOKING_WORKERS,
+        max_attempts=BOOKING_MAX_ATTEMPTS,
+        retry_base_seconds=BOOKING_RETRY_BASE_SECONDS,
+    )
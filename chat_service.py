@@ -0,0 +1,428 @@
+"""
+Chat, booking and auth flow shared by the Flask (app.py) and Quart
+(async_app.py) frontends
+
+The frontends only parse requests and shape responses; everything else
+happens here, once:
+
+    turn = open_turn(session, question)        # history, intent, cache lookup
+    payload, status = answer(session, turn)    # LLM call, history, booking
+    for message in stream_events(session, turn): ...   # the same, as SSE
+
+Each step has an async counterpart (aopen_turn, aanswer, astream_events)
+that awaits the providers' async clients and runs the blocking parts (the
+SQLite conversation store, booking queue and server-side session) in a
+thread, so they never stall the event loop.
+
+The process-wide clients (LLM, conversation store, caches, booking queue)
+and the per-worker startup hooks used by gunicorn.conf.py live here too.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+
+from config import (
+    GROQ_API_KEY,
+    GROQ_MODEL,
+    GROQ_BASE_URL,
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    OPENAI_BASE_URL,
+)
+from voice_bot import GroqClient, OpenAIClient, FallbackClient, is_fallback_reply, remember_turn
+from context_window import last_prompt_tokens, prompt_cache
+from conversation_store import get_conversation_store
+from booking import BookingExtractor, extract_booking, user_context
+from intents import RESET, canned_response, detect_intent
+from booking_queue import get_booking_dispatcher
+from response_cache import get_response_cache
+from single_flight import get_single_flight
+from llm_router import build_router
+from google_verifier import google_verifier
+import server_session
+import http_transport
+from metrics import (
+    REGISTRY,
+    CHAT_STAGE_SECONDS,
+    LLM_IN_FLIGHT,
+    INTENTS,
+)
+
+
+def get_llm_client():
+    """Initialize the LLM client based on configuration
+
+    Every provider with an API key is wrapped in an LLMRouter, which fails
+    over between them and uses FallbackClient only as a last resort.
+    """
+    providers = []
+    if GROQ_API_KEY:
+        try:
+            print(f"Initializing Groq client with model: {GROQ_MODEL}")
+            providers.append(("groq", GroqClient(GROQ_API_KEY, GROQ_MODEL, GROQ_BASE_URL)))
+        except Exception as e:
+            print(f"Error initializing Groq client: {e}")
+    if OPENAI_API_KEY:
+        try:
+            print(f"Initializing OpenAI client with model: {OPENAI_MODEL}")
+            providers.append(("openai", OpenAIClient(OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL)))
+        except Exception as e:
+            print(f"Error initializing OpenAI client: {e}")
+    if not providers:
+        print("No API keys found. Using fallback client.")
+        return FallbackClient()
+    return build_router(providers, FallbackClient())
+
+try:
+    llm_client = get_llm_client()
+    print(f"LLM client initialized: {type(llm_client).__name__}")
+except Exception as e:
+    print(f"Critical error initializing LLM client: {e}")
+    llm_client = FallbackClient()
+
+# Conversation history lives server-side, keyed by a per-session id
+conversation_store = get_conversation_store()
+
+# Answers to repeated first-turn questions are served from memory
+response_cache = get_response_cache(llm_client)
+
+# Identical questions asked while one is being answered share its reply
+single_flight = get_single_flight(llm_client)
+
+# Bookings are delivered to n8n in the background (None when n8n is not configured)
+booking_dispatcher = get_booking_dispatcher()
+
+
+# Worker lifecycle
+
+def start_background_work():
+    """Start this process's background threads (no-op once they are running)
+
+    Not done at import: a preloading server imports the app in its master
+    process, whose threads would not survive the fork into workers.
+    """
+    REGISTRY.start()
+    if booking_dispatcher is not None:
+        # Resume any deliveries left over from a previous run
+        booking_dispatcher.start()
+
+def warm_up():
+    """Import the provider SDKs and auth/HTTP libraries before a request needs them"""
+    started_at = time.perf_counter()
+    for client in (llm_client, google_verifier):
+        if hasattr(client, 'warm_up'):
+            try:
+                client.warm_up()
+            except Exception as e:
+                print(f"[STARTUP] Warm-up of {type(client).__name__} failed: {e}")
+    # Pools for the n8n webhook, Google certs and the Hugging Face API
+    http_transport.session()
+    print(f"[STARTUP] Warm-up finished in {time.perf_counter() - started_at:.2f}s")
+
+_warm_up_pid = None
+
+def start_warm_up():
+    """Run warm_up() in a background thread, once per process"""
+    global _warm_up_pid
+    if _warm_up_pid == os.getpid():
+        return
+    _warm_up_pid = os.getpid()
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+def init_worker(reconnect=False, warm=True):
+    """Per-worker setup, called by gunicorn.conf.py once the app is loaded
+
+    reconnect replaces network clients created in a preloading master, so
+    workers never share its sockets or thread pools; warm starts the
+    background warm-up.
+    """
+    if reconnect:
+        for client in (llm_client, google_verifier):
+            if hasattr(client, 'reconnect'):
+                client.reconnect()
+    start_background_work()
+    if warm:
+        start_warm_up()
+
+def shutdown_worker(timeout=30):
+    """Let in-flight LLM calls and booking deliveries finish before the worker exits"""
+    if hasattr(llm_client, 'close') and not llm_client.close(timeout):
+        print("[SERVER] LLM calls still running at shutdown")
+    if booking_dispatcher is not None:
+        booking_dispatcher.stop()
+    REGISTRY.flush()
+
+
+# Chat
+
+def get_conversation_id(session):
+    """Return the caller's conversation id, creating one if needed"""
+    conversation_id = session.get('conversation_id')
+    if not conversation_id:
+        conversation_id = uuid.uuid4().hex
+        session['conversation_id'] = conversation_id
+    return conversation_id
+
+class ChatTurn:
+    """One question being answered, from lookup to the saved history"""
+    def __init__(self, question, conversation_id, history):
+        self.question = question
+        self.conversation_id = conversation_id
+        self.history = history
+        self.intent = None
+        self.context = None
+        self.cache_key = None
+        # Canned or cached answer: no LLM call needed
+        self.ready_response = None
+
+def _begin_turn(session, question, conversation_id, history):
+    turn = ChatTurn(question, conversation_id, history)
+    with CHAT_STAGE_SECONDS.time(stage="intent"):
+        turn.intent = detect_intent(question)
+        INTENTS.inc(intent=turn.intent.name)
+        turn.context = user_context(session, question, history)
+        # Context-free questions may already have a cached answer
+        turn.cache_key = response_cache.key_for(question, history)
+    # Greetings, goodbyes and resets get a canned reply without the LLM
+    turn.ready_response = canned_response(turn.intent)
+    if turn.intent.name == RESET:
+        history.clear()
+    elif not turn.ready_response:
+        with CHAT_STAGE_SECONDS.time(stage="cache"):
+            turn.ready_response = response_cache.get(turn.cache_key, question)
+    if turn.ready_response and turn.intent.name != RESET:
+        remember_turn(history, question, turn.ready_response)
+    return turn
+
+def open_turn(session, question):
+    """Load the caller's conversation and look for an answer that needs no LLM call
+
+    Called before a streamed response starts: the session cookie cannot be
+    updated once the response headers have been sent.
+    """
+    conversation_id = get_conversation_id(session)
+    history = conversation_store.get(conversation_id)
+    return _begin_turn(session, question, conversation_id, history)
+
+async def aopen_turn(session, question):
+    """Async version of open_turn"""
+    await server_session.aload(session)
+    conversation_id = get_conversation_id(session)
+    history = await asyncio.to_thread(conversation_store.get, conversation_id)
+    return _begin_turn(session, question, conversation_id, history)
+
+def send_booking(booking_payload):
+    """Queue a booking for background delivery to n8n and return its status"""
+    if booking_dispatcher is None:
+        print("[BOOKING] Booking payload present but N8N_WEBHOOK_URL is not set. Skipping webhook call.")
+        return None
+    booking_id = booking_dispatcher.enqueue(booking_payload)
+    print(f"[BOOKING] Queued booking {booking_id}")
+    return {"status": "pending", "id": booking_id}
+
+def handle_booking_marker(session, raw_response, extractor=None):
+    """Strip the booking marker from an LLM reply and trigger the booking workflow
+
+    Returns (response_text, booking_result); booking_result is None when the
+    reply contains no booking, and {"status": "invalid", "error": ...} when
+    the LLM confirmed a booking whose details don't validate, so the visitor
+    learns it was not made. Streamed replies pass the BookingExtractor that
+    already consumed them, so only validation is left to do.
+    """
+    with CHAT_STAGE_SECONDS.time(stage="marker_parse"):
+        if extractor is None:
+            extractor = extract_booking(raw_response)
+        response_text, booking_payload = extractor.result(session)
+    if extractor.marker_seen and not booking_payload:
+        return response_text, {"status": "invalid", "error": extractor.error}
+    if not booking_payload:
+        return response_text, None
+    with CHAT_STAGE_SECONDS.time(stage="webhook"):
+        booking_result = send_booking(booking_payload)
+    return response_text, booking_result
+
+def finish_turn(session, turn, raw_response, extractor=None):
+    """Cache and save a complete reply and handle its booking
+
+    Returns (payload, HTTP status) of the /api/chat response.
+    """
+    if not raw_response:
+        return {'success': False, 'error': 'Failed to generate response'}, 500
+    # The offline fallback's canned replies (every provider failing) are not
+    # answers to keep: cached, they would outlive the outage
+    if not turn.ready_response and not is_fallback_reply(raw_response):
+        response_cache.put(turn.cache_key, raw_response, turn.question)
+    conversation_store.save(turn.conversation_id, turn.history)
+    response_text, booking_result = handle_booking_marker(session, raw_response, extractor)
+    # Always a successful chat response here; booking_result may be None
+    return {
+        'success': True,
+        'response': response_text,
+        'booking': booking_result,
+        'intent': turn.intent.name,
+        'prompt_tokens': last_prompt_tokens(turn.history)
+    }, 200
+
+def answer(session, turn):
+    """Answer a turn in one piece; returns (payload, HTTP status)"""
+    raw_response = turn.ready_response
+    if not raw_response:
+        with CHAT_STAGE_SECONDS.time(stage="llm"), LLM_IN_FLIGHT.track_inprogress():
+            raw_response = single_flight.get_response(turn.question, turn.history, turn.context)
+    return finish_turn(session, turn, raw_response)
+
+async def aanswer(session, turn):
+    """Async version of answer"""
+    raw_response = turn.ready_response
+    if not raw_response:
+        with CHAT_STAGE_SECONDS.time(stage="llm"), LLM_IN_FLIGHT.track_inprogress():
+            raw_response = await single_flight.aget_response(turn.question, turn.history, turn.context)
+    return await asyncio.to_thread(finish_turn, session, turn, raw_response)
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event with a JSON payload"""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+class _ReplyStream:
+    """Turns reply chunks into "delta" events, holding back the booking marker"""
+    def __init__(self, turn):
+        self.turn = turn
+        self.parts = []
+        self.extractor = BookingExtractor()
+        self.started_at = time.perf_counter()
+
+    def feed(self, chunk):
+        if not self.parts and not self.turn.ready_response:
+            CHAT_STAGE_SECONDS.observe(time.perf_counter() - self.started_at, stage="llm_first_chunk")
+        self.parts.append(chunk)
+        visible = self.extractor.feed(chunk)
+        return sse_event({'delta': visible}) if visible else None
+
+    def flush(self):
+        if not self.turn.ready_response:
+            CHAT_STAGE_SECONDS.observe(time.perf_counter() - self.started_at, stage="llm")
+        visible = self.extractor.flush()
+        return sse_event({'delta': visible}) if visible else None
+
+    def done(self, payload, status):
+        return sse_event(payload, event='done' if status == 200 else 'error')
+
+def stream_events(session, turn):
+    """Answer a turn as Server-Sent Events
+
+    Yields "data" events with {"delta": text} as the reply arrives, then a
+    "done" event with the same body /api/chat returns (or an "error" event).
+    """
+    try:
+        reply = _ReplyStream(turn)
+        if turn.ready_response:
+            event = reply.feed(turn.ready_response)
+            if event:
+                yield event
+        else:
+            with LLM_IN_FLIGHT.track_inprogress():
+                for chunk in single_flight.stream_response(turn.question, turn.history, turn.context):
+                    event = reply.feed(chunk)
+                    if event:
+                        yield event
+        event = reply.flush()
+        if event:
+            yield event
+        # Booking handling runs once the full reply (and marker) is in
+        yield reply.done(*finish_turn(session, turn, ''.join(reply.parts), reply.extractor))
+    except Exception as e:
+        print(f"Error in chat stream: {e}")
+        yield sse_event({'success': False, 'error': str(e)}, event='error')
+
+async def astream_events(session, turn):
+    """Async version of stream_events"""
+    try:
+        reply = _ReplyStream(turn)
+        if turn.ready_response:
+            event = reply.feed(turn.ready_response)
+            if event:
+                yield event
+        else:
+            with LLM_IN_FLIGHT.track_inprogress():
+                async for chunk in single_flight.astream_response(turn.question, turn.history, turn.context):
+                    event = reply.feed(chunk)
+                    if event:
+                        yield event
+        event = reply.flush()
+        if event:
+            yield event
+        payload, status = await asyncio.to_thread(
+            finish_turn, session, turn, ''.join(reply.parts), reply.extractor)
+        yield reply.done(payload, status)
+    except Exception as e:
+        print(f"Error in chat stream: {e}")
+        yield sse_event({'success': False, 'error': str(e)}, event='error')
+
+def reset_conversation(session):
+    """Forget the caller's conversation history"""
+    conversation_id = session.get('conversation_id')
+    if conversation_id:
+        conversation_store.clear(conversation_id)
+
+def booking_status(booking_id):
+    """(payload, HTTP status) for a queued booking's delivery status"""
+    status = booking_dispatcher.get(booking_id) if booking_dispatcher else None
+    if status is None:
+        return {'success': False, 'error': 'Booking not found'}, 404
+    return {'success': True, 'booking': status}, 200
+
+def health_status():
+    """Body of the health endpoint"""
+    return {
+        'status': 'healthy',
+        'llm_type': type(llm_client).__name__,
+        'response_cache': response_cache.stats(),
+        'single_flight': single_flight.stats(),
+        'prompt_cache': prompt_cache.stats(),
+        'http_transport': http_transport.stats(),
+        'routing': llm_client.stats() if hasattr(llm_client, 'stats') else None
+    }
+
+
+# Auth
+
+def sign_in(session, idinfo):
+    """Store a verified Google identity in the session and return the user"""
+    user_email = idinfo.get('email')
+    user_name = idinfo.get('name', user_email.split('@')[0])
+    user_picture = idinfo.get('picture', '')
+
+    if hasattr(session, 'regenerate'):
+        # Server-side sessions: a session id known before login must not carry the login
+        session.regenerate()
+    session['user_email'] = user_email
+    session['user_name'] = user_name
+    session['user_picture'] = user_picture
+    session['authenticated'] = True
+
+    print(f"[AUTH] User authenticated: {user_name} ({user_email})")
+    return {'name': user_name, 'email': user_email, 'picture': user_picture}
+
+def current_user(session):
+    """Body of /api/auth/user"""
+    if session.get('authenticated'):
+        return {
+            'success': True,
+            'user': {
+                'name': session.get('user_name'),
+                'email': session.get('user_email'),
+                'picture': session.get('user_picture')
+            }
+        }
+    return {'success': False, 'user': None}
+
+def sign_out(session):
+    """Forget the user and their conversation"""
+    reset_conversation(session)
+    session.clear()
@@ -9,19 +9,85 @@ load_dotenv()
 # Groq API Configuration (Fast and free tier available)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")  # Fast and free models: llama-3.1-8b-instant, mixtral-8x7b-32768, gemma-7b-it
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None  # Optional override, e.g. a local stub for benchmarks
 
 # OpenAI API Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # Optional override, e.g. a local stub for benchmarks
+
+# Provider routing (when several API keys are set): hedge to the next provider if the
+# first hasn't answered after this long, and skip a provider after repeated failures
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "2.0"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
 
 # Free Alternative: Hugging Face (no API key needed for some models)
 USE_HUGGINGFACE = os.getenv("USE_HUGGINGFACE", "false").lower() == "true"
 # Using a smaller, faster model that works well for conversational AI
 HUGGINGFACE_MODEL = os.getenv("HUGGINGFACE_MODEL", "gpt2")
 
+# Conversation history storage for the web app: "memory" (per worker) or "sqlite" (shared by workers).
+# gunicorn.conf.py defaults to sqlite when it runs more than one worker, and refuses memory then
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory").lower()
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", "conversations.db")
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000"))
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", "3600"))  # Idle time before a conversation is forgotten
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))  # History tokens kept per conversation; older turns are summarized
+
+# Cache of answers to repeated first-turn questions (skips the LLM round trip)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# Near-duplicate question lookup (character n-gram TF-IDF, needs numpy)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.6"))  # Cosine similarity for a candidate answer; it must also pass the word check in semantic_index
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "semantic_index")  # Writes <path>.npy and <path>.json; empty disables persistence
+# Identical first-turn questions asked while one is being answered share that answer
+# (single_flight.py). SINGLE_FLIGHT_LOCK_DIR, a directory local to the host, extends
+# this across workers (empty: within each worker only)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_LOCK_DIR = os.getenv("SINGLE_FLIGHT_LOCK_DIR", "")
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "60"))  # Then a waiting request calls the LLM itself
+# Precomputed FAQ answers (python faq_index.py build): a memory-mapped index served
+# before the LLM on first turns and by the offline fallback
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "true").lower() == "true"
+FAQ_INDEX_PATH = os.getenv("FAQ_INDEX_PATH", "faq_index.bin")
+FAQ_JOURNAL_PATH = os.getenv("FAQ_JOURNAL_PATH", "faq_answers.jsonl")  # Answers so far; lets a build resume
+FAQ_CONCURRENCY = int(os.getenv("FAQ_CONCURRENCY", "4"))  # Provider requests in flight during a build
+FAQ_REQUESTS_PER_MINUTE = float(os.getenv("FAQ_REQUESTS_PER_MINUTE", "30"))  # Stay under the provider's rate limit
+
+# Prometheus metrics at /metrics. With several gunicorn workers, METRICS_DIR is a
+# directory they share so every scrape reports all workers (empty: this process only;
+# gunicorn.conf.py uses a temporary directory per run when it starts several workers)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
 # Voice settings
 VOICE_SPEED = int(os.getenv("VOICE_SPEED", "150"))  # Words per minute
 VOICE_VOLUME = float(os.getenv("VOICE_VOLUME", "0.9"))  # 0.0 to 1.0
+# Desktop voice loop (voice_pipeline.py)
+VOICE_CALIBRATION_SECONDS = float(os.getenv("VOICE_CALIBRATION_SECONDS", "0.5"))  # Ambient noise sampled once at start
+VOICE_END_SILENCE_SECONDS = float(os.getenv("VOICE_END_SILENCE_SECONDS", "0.5"))  # Silence that ends an utterance
+VOICE_MAX_PHRASE_SECONDS = float(os.getenv("VOICE_MAX_PHRASE_SECONDS", "10"))
+# Talking over the bot stops its reply; while it speaks, speech must be VOICE_BARGE_IN_RATIO
+# times louder than the threshold so the speakers don't interrupt it
+VOICE_BARGE_IN = os.getenv("VOICE_BARGE_IN", "true").lower() == "true"
+VOICE_BARGE_IN_RATIO = float(os.getenv("VOICE_BARGE_IN_RATIO", "2.0"))
+# Speech recognition (asr.py): "google" (Google Web Speech API, needs network) or
+# "vosk" (local, offline, streaming; pip install vosk)
+ASR_BACKEND = os.getenv("ASR_BACKEND", "google").lower()
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "")  # Unpacked model directory; empty downloads the small English model
+# Rendered speech is cached on disk (tts.py), keyed by text and voice settings
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "200"))
+# Pre-generated voice bot greetings (greetings.py), refreshed in the background when stale
+GREETING_POOL_PATH = os.getenv("GREETING_POOL_PATH", "greetings.json")
+GREETING_POOL_SIZE = int(os.getenv("GREETING_POOL_SIZE", "8"))
+GREETING_POOL_MAX_AGE_HOURS = float(os.getenv("GREETING_POOL_MAX_AGE_HOURS", "168"))
 
 # System prompt - Bot responds as the user (first person)
 SYSTEM_PROMPT = """You are an AI version of **Anant Gangwal**, a 22-year-old AI and Software Engineer. 
@@ -175,10 +241,58 @@ MEETING BOOKING BEHAVIOR (VERY IMPORTANT):
 
 # n8n / webhook configuration for automated workflows (e.g., booking meetings)
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "")
+# Bookings are queued locally and delivered to n8n in the background with retries
+BOOKING_DB_PATH = os.getenv("BOOKING_DB_PATH", "bookings.db")
+BOOKING_WORKERS = int(os.getenv("BOOKING_WORKERS", "2"))
+BOOKING_MAX_ATTEMPTS = int(os.getenv("BOOKING_MAX_ATTEMPTS", "6"))
+BOOKING_RETRY_BASE_SECONDS = float(os.getenv("BOOKING_RETRY_BASE_SECONDS", "2"))  # Doubles after each failed attempt
 
 # Google OAuth2 Configuration for user authentication
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:5000/auth/callback")
+# Google's ID-token signing certs are cached for as long as their Cache-Control allows;
+# an already verified token is accepted again from memory for up to this long
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_VERIFIED_TOKEN_TTL_SECONDS = int(os.getenv("GOOGLE_VERIFIED_TOKEN_TTL_SECONDS", "300"))
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 
+# Sessions: "cookie" (signed cookie holding the whole session, Flask's default) or a
+# server-side store: "sqlite" (shared by the workers of one host), "filesystem" or "redis"
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cookie").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_DIR = os.getenv("SESSION_DIR", "flask_session")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "86400"))  # Idle time before a session is forgotten
+
+# Static asset build (python assets.py build): fingerprinted, precompressed copies of
+# static/ plus a manifest; the app falls back to plain static/ files when it is missing.
+# A relative path is resolved against the project directory
+STATIC_BUILD_DIR = os.getenv("STATIC_BUILD_DIR", "static/dist")
+
+# Serving profile for gunicorn.conf.py: "gthread" (threaded sync workers, default),
+# "sync" (one request per worker) or "async" (uvicorn workers running async_app).
+# Workers default to a count sized from the CPUs (WEB_CONCURRENCY overrides it)
+SERVER_PROFILE = os.getenv("SERVER_PROFILE", "gthread").lower()
+SERVER_BIND = os.getenv("SERVER_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0: size by CPU count
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "8"))  # Per gthread worker; LLM calls mostly wait on I/O
+SERVER_PRELOAD = os.getenv("SERVER_PRELOAD", "true").lower() == "true"
+# Seconds a stopping worker gets to finish in-flight requests (streamed LLM replies included)
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", "120"))
+# Provider SDKs and auth libraries are imported after startup rather than at import:
+# "background" (a thread in each worker once it serves), "master" (in the preloading
+# master before forking: shared memory, slower boot) or "off" (on first use)
+SERVER_WARM_UP = os.getenv("SERVER_WARM_UP", "background").lower()
+
+# Outbound HTTP (http_transport.py): keep-alive connection pools shared by every
+# outbound call; pool sizes are per process
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))  # Hosts with a pool kept open
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # Kept-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+# Read timeout of the Groq/OpenAI SDK clients: long completions and pauses
+# between streamed tokens can exceed HTTP_READ_TIMEOUT (the SDKs default to 600 s)
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "600"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))  # Idle connections close after this
@@ -0,0 +1,278 @@
+"""
+Token-budgeted conversation context shared by the LLM clients
+
+Instead of keeping a fixed number of messages, history is kept under a token
+budget (CONTEXT_TOKEN_BUDGET). Each message's token count is computed once
+and cached on the message itself ("tokens"), so stored histories never need
+recounting. When a new turn pushes history over budget, the oldest turns are
+folded into a single rolling summary message at the start of the history.
+
+The summary is written by the LLM off the hot path: a cheap extractive
+placeholder is used immediately, and a background thread asks the LLM for a
+proper summary, which replaces the placeholder on the conversation's next
+request.
+
+Every request starts with the same byte-identical prefix (the persona
+prompt), followed by the history and, only then, per-user data such as the
+authenticated user's name and email. Providers that cache prompt prefixes
+(OpenAI, Groq) can then reuse the prefix across all users and turns. Its
+token count and hash are computed once at import, and prompt_cache counts
+the cached vs uncached prompt tokens providers report.
+
+Token counts use tiktoken when it is installed and a characters/4 estimate
+otherwise.
+"""
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SYSTEM_PROMPT, CONTEXT_TOKEN_BUDGET
+from metrics import LLM_TOKENS
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # pragma: no cover - optional dependency
+    _encoding = None
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Longest extractive placeholder summary, in characters
+PLACEHOLDER_MAX_CHARS = 1200
+
+SUMMARY_PREFIX = "Summary of our earlier conversation: "
+SUMMARY_REQUEST = (
+    "Summarize this earlier part of our conversation in under 100 words. "
+    "Keep names, email addresses, dates, times, timezones and anything about "
+    "booking a meeting. Reply with the summary only.\n\n"
+)
+
+
+def count_tokens(text):
+    """Number of tokens in text"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def message_tokens(message):
+    """Token count of a message, cached on the message"""
+    tokens = message.get("tokens")
+    if tokens is None:
+        tokens = count_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS
+        message["tokens"] = tokens
+    return tokens
+
+
+def _prefix_messages():
+    """The fixed start of every request (must not depend on the user or turn)"""
+    return ({"role": "system", "content": SYSTEM_PROMPT},)
+
+
+PROMPT_PREFIX = _prefix_messages()
+PREFIX_TOKENS = sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in PROMPT_PREFIX)
+PREFIX_HASH = hashlib.sha256(
+    json.dumps(PROMPT_PREFIX, sort_keys=True, ensure_ascii=False).encode("utf-8")
+).hexdigest()[:16]
+
+
+class PromptCacheStats:
+    """Cached vs uncached prompt tokens, from provider usage fields"""
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage):
+        prompt_tokens = _field(usage, "prompt_tokens") or 0
+        cached = _field(_field(usage, "prompt_tokens_details"), "cached_tokens") or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached
+        LLM_TOKENS.inc(prompt_tokens, kind="prompt")
+        LLM_TOKENS.inc(cached, kind="cached_prompt")
+        LLM_TOKENS.inc(_field(usage, "completion_tokens") or 0, kind="completion")
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            prompt_tokens, cached = self.prompt_tokens, self.cached_tokens
+            requests = self.requests
+        return {
+            "prefix_tokens": PREFIX_TOKENS,
+            "prefix_hash": PREFIX_HASH,
+            "requests": requests,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached,
+            "uncached_tokens": prompt_tokens - cached,
+            "cached_ratio": round(cached / prompt_tokens, 3) if prompt_tokens else 0.0,
+        }
+
+
+def _field(obj, name):
+    """Attribute or key of an SDK object / dict (None if missing)"""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+prompt_cache = PromptCacheStats()
+
+
+def record_usage(response):
+    """Record token usage of a completion or stream chunk, if it carries any
+
+    OpenAI reports usage on the response (and on the final stream chunk when
+    stream_options.include_usage is set); Groq streams report it in x_groq.
+    """
+    usage = _field(response, "usage") or _field(_field(response, "x_groq"), "usage")
+    if usage is not None:
+        prompt_cache.record(usage)
+
+
+def last_prompt_tokens(history):
+    """Prompt tokens sent for the latest turn in history (None if it was not sent)"""
+    for message in reversed(history):
+        if message.get("role") == "user":
+            return message.get("prompt_tokens")
+    return None
+
+
+class ContextWindow:
+    """Keeps conversation history under a token budget with a rolling summary"""
+    def __init__(self, budget_tokens=2000, summarizer=None):
+        self.budget_tokens = budget_tokens
+        # summarizer(text) -> summary string; called on a background thread
+        self.summarizer = summarizer
+        self._summaries = OrderedDict()  # summary_id -> finished summary text
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="context-summary")
+
+    def build(self, question, history, user_context=None):
+        """API messages for one request and their total prompt token count
+
+        Order: fixed prefix, history, user_context (if any), question.
+        """
+        self._apply_finished_summary(history)
+        messages = list(PROMPT_PREFIX)
+        prompt_tokens = PREFIX_TOKENS
+        for message in history:
+            messages.append({"role": message["role"], "content": message["content"]})
+            prompt_tokens += message_tokens(message)
+        if user_context:
+            messages.append({"role": "system", "content": user_context})
+            prompt_tokens += count_tokens(user_context) + MESSAGE_OVERHEAD_TOKENS
+        messages.append({"role": "user", "content": question})
+        prompt_tokens += count_tokens(question) + MESSAGE_OVERHEAD_TOKENS
+        return messages, prompt_tokens
+
+    def add_turn(self, history, question, answer, prompt_tokens=None):
+        """Append a completed exchange and fold old turns into the summary if over budget"""
+        user_message = {"role": "user", "content": question}
+        if prompt_tokens is not None:
+            user_message["prompt_tokens"] = prompt_tokens
+        history.append(user_message)
+        history.append({"role": "assistant", "content": answer})
+        for message in history[-2:]:
+            message_tokens(message)
+        self._compact(history)
+
+    def _compact(self, history):
+        summary = history[0] if history and history[0].get("summary") else None
+        turns = history[1:] if summary else history[:]
+        evicted = []
+        total = sum(message_tokens(m) for m in history)
+        # Always keep the latest exchange, even if it alone exceeds the budget
+        while total > self.budget_tokens and len(turns) > 2:
+            message = turns.pop(0)
+            total -= message_tokens(message)
+            evicted.append(message)
+        if not evicted:
+            return
+
+        previous = summary["content"][len(SUMMARY_PREFIX):] if summary else ""
+        transcript = "\n".join(
+            f"{'User' if m['role'] == 'user' else 'Me'}: {m['content']}" for m in evicted
+        )
+        placeholder = (previous + "\n" + self._extract(evicted)).strip()[-PLACEHOLDER_MAX_CHARS:]
+        new_summary = {
+            "role": "system",
+            "content": SUMMARY_PREFIX + placeholder,
+            "summary": True,
+            "pending": True,
+            "summary_id": uuid.uuid4().hex,
+            "source": (previous + "\n" + transcript).strip(),
+        }
+        message_tokens(new_summary)
+        history[:] = [new_summary] + turns
+        self._schedule(new_summary)
+
+    def _extract(self, messages):
+        """Cheap stand-in summary: the first sentence of each evicted message"""
+        lines = []
+        for m in messages:
+            first = m["content"].strip().split(". ")[0][:160]
+            lines.append(f"{'They asked' if m['role'] == 'user' else 'I said'}: {first}")
+        return " ".join(lines)
+
+    def _schedule(self, summary):
+        if self.summarizer is None:
+            return
+        summary_id = summary["summary_id"]
+        with self._lock:
+            if summary_id in self._in_flight or summary_id in self._summaries:
+                return
+            self._in_flight.add(summary_id)
+        self._executor.submit(self._summarize, summary_id, summary["source"])
+
+    def _summarize(self, summary_id, source):
+        try:
+            text = self.summarizer(SUMMARY_REQUEST + source)
+        except Exception as e:
+            print(f"[CONTEXT] Summary failed: {e}")
+            text = None
+        with self._lock:
+            self._in_flight.discard(summary_id)
+            if text:
+                self._summaries[summary_id] = text.strip()
+                while len(self._summaries) > 1000:
+                    self._summaries.popitem(last=False)
+
+    def _apply_finished_summary(self, history):
+        """Swap a pending placeholder for its finished LLM summary"""
+        if not history or not history[0].get("pending"):
+            return
+        summary = history[0]
+        with self._lock:
+            text = self._summaries.pop(summary["summary_id"], None)
+        if text is None:
+            # Possibly summarized in another worker (or lost on restart): ask here too
+            self._schedule(summary)
+            return
+        history[0] = {
+            "role": "system",
+            "content": SUMMARY_PREFIX + text,
+            "summary": True,
+        }
+        message_tokens(history[0])
+
+
+# Shared by all clients; the first LLM client created provides the summarizer
+context_window = ContextWindow(CONTEXT_TOKEN_BUDGET)
+print(f"[CONTEXT] Prompt prefix: {PREFIX_TOKENS} tokens, hash {PREFIX_HASH}")
+
+
+def register_summarizer(client):
+    """Use client to write rolling summaries unless another client already does"""
+    if context_window.summarizer is None:
+        context_window.summarizer = lambda text: client.get_response(text, [])
@@ -0,0 +1,155 @@
+"""
+Per-session conversation history storage for the web app
+
+Each browser session gets its own list of user/assistant messages, keyed by a
+session id. Two backends are available:
+
+- MemoryConversationStore: in-process LRU with a TTL, bounded in size
+- SQLiteConversationStore: a shared SQLite file usable across gunicorn workers
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    CONVERSATION_STORE,
+    CONVERSATION_DB_PATH,
+    CONVERSATION_MAX_SESSIONS,
+    CONVERSATION_TTL_SECONDS,
+)
+
+
+class MemoryConversationStore:
+    """In-memory conversation store with LRU eviction and idle expiry"""
+    def __init__(self, max_sessions=1000, ttl_seconds=3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # session_id -> (last_used, messages), least recently used first
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return a copy of the session's history (empty if unknown or expired)"""
+        now = time.time()
+        with self._lock:
+            entry = self._conversations.get(session_id)
+            if entry is None:
+                return []
+            last_used, messages = entry
+            if now - last_used > self.ttl_seconds:
+                del self._conversations[session_id]
+                return []
+            self._conversations.move_to_end(session_id)
+            return list(messages)
+
+    def save(self, session_id, messages):
+        """Store the session's history, evicting the least recently used sessions"""
+        now = time.time()
+        with self._lock:
+            self._conversations[session_id] = (now, list(messages))
+            self._conversations.move_to_end(session_id)
+            while len(self._conversations) > self.max_sessions:
+                self._conversations.popitem(last=False)
+
+    def clear(self, session_id):
+        """Forget a single session's history"""
+        with self._lock:
+            self._conversations.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._conversations)
+
+
+class SQLiteConversationStore:
+    """SQLite-backed conversation store shared by all workers on one host"""
+    # Expired rows are swept every N writes rather than on every request
+    SWEEP_EVERY = 200
+
+    def __init__(self, path="conversations.db", ttl_seconds=3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " session_id TEXT PRIMARY KEY,"
+            " messages TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS conversations_updated_at"
+            " ON conversations (updated_at)"
+        )
+        conn.commit()
+
+    def _connection(self):
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        # A connection must not cross a fork (e.g. from a preloading gunicorn master)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id):
+        """Return the session's history (empty if unknown or expired)"""
+        row = self._connection().execute(
+            "SELECT messages FROM conversations WHERE session_id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl_seconds),
+        ).fetchone()
+        if row is None:
+            return []
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return []
+
+    def save(self, session_id, messages):
+        """Store the session's history"""
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO conversations (session_id, messages, updated_at)"
+            " VALUES (?, ?, ?)",
+            (session_id, json.dumps(messages, separators=(",", ":")), time.time()),
+        )
+        conn.commit()
+        with self._writes_lock:
+            self._writes += 1
+            sweep = self._writes % self.SWEEP_EVERY == 0
+        if sweep:
+            self.sweep()
+
+    def clear(self, session_id):
+        """Forget a single session's history"""
+        conn = self._connection()
+        conn.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+        conn.commit()
+
+    def sweep(self):
+        """Delete all expired conversations"""
+        conn = self._connection()
+        conn.execute(
+            "DELETE FROM conversations WHERE updated_at <= ?",
+            (time.time() - self.ttl_seconds,),
+        )
+        conn.commit()
+
+    def __len__(self):
+        row = self._connection().execute("SELECT COUNT(*) FROM conversations").fetchone()
+        return row[0]
+
+
+def get_conversation_store():
+    """Create the conversation store selected by CONVERSATION_STORE"""
+    if CONVERSATION_STORE == "sqlite":
+        print(f"Using SQLite conversation store: {CONVERSATION_DB_PATH}")
+        return SQLiteConversationStore(CONVERSATION_DB_PATH, CONVERSATION_TTL_SECONDS)
+    return MemoryConversationStore(CONVERSATION_MAX_SESSIONS, CONVERSATION_TTL_SECONDS)
@@ -0,0 +1,340 @@
+"""
+Precomputed answers to the persona's frequently asked questions
+
+Most visitors ask the same few things (life story, superpower, growth
+areas, ...). A batch job answers a corpus of such questions ahead of time
+and writes the answers into a compact index file (FAQ_INDEX_PATH) that the
+web app memory-maps at startup, so a known first-turn question is answered
+without a provider call, and FallbackClient gives real answers instead of
+its keyword replies when no provider is reachable.
+
+    python faq_index.py build faq_corpus.txt --concurrency 4 --rpm 30
+
+The job sends requests concurrently, capped at --rpm requests per minute,
+and appends every answer to a journal (FAQ_JOURNAL_PATH) as it arrives. A
+rerun skips questions the journal already answers under the current
+SYSTEM_PROMPT hash: an interrupted job resumes where it stopped, corpus
+additions only cost the new questions, and a prompt change (detected by its
+hash) regenerates every answer. The index is rebuilt from the journal at the end
+(`python faq_index.py rebuild` does only that).
+
+Index file layout (little-endian):
+
+    header   8s magic, 16s prompt hash, I entry count
+    entries  count x (Q question hash, I offset, I question bytes, I answer bytes),
+             sorted by hash for binary search
+    data     UTF-8 normalized question followed by the answer, per entry
+
+Lookups use the normalized question (response_cache.normalize_question), so
+trivial rewordings match. Questions that normalize to fewer than
+MIN_KEY_WORDS words ("Who are you?" -> "who") are neither indexed nor looked
+up, so a bare "who?" or "what?" never gets a canned persona answer. An index
+built for another SYSTEM_PROMPT is not served, and FAQ_ENABLED=false turns
+lookups off.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import (
+    FAQ_CONCURRENCY,
+    FAQ_ENABLED,
+    FAQ_INDEX_PATH,
+    FAQ_JOURNAL_PATH,
+    FAQ_REQUESTS_PER_MINUTE,
+)
+from booking import BOOKING_MARKER, is_booking_intent
+from response_cache import normalize_question, prompt_hash
+
+_MAGIC = b"VBFAQ\x00\x01\x00"
+_HEADER = struct.Struct("<8s16sI")
+_ENTRY = struct.Struct("<QIII")
+# Shorter normalized questions are too vague to answer from the index
+MIN_KEY_WORDS = 2
+# Wait before retrying a failed question; doubles with each attempt
+RETRY_BASE_SECONDS = 1.0
+
+
+def faq_key(question):
+    """Normalized question used as the index key, or None if it is too vague"""
+    normalized = normalize_question(question)
+    if len(normalized.split()) < MIN_KEY_WORDS:
+        return None
+    return normalized
+
+
+def question_hash(normalized):
+    return int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def write_index(path, answers, system_prompt_hash):
+    """Write {normalized question: answer} as an index file (atomically)"""
+    entries = sorted((question_hash(question), question, answer) for question, answer in answers.items())
+    data = bytearray()
+    table = bytearray()
+    for key, question, answer in entries:
+        question_bytes, answer_bytes = question.encode("utf-8"), answer.encode("utf-8")
+        table += _ENTRY.pack(key, len(data), len(question_bytes), len(answer_bytes))
+        data += question_bytes + answer_bytes
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, system_prompt_hash.encode("ascii"), len(entries)))
+        f.write(table)
+        f.write(data)
+    os.replace(tmp, path)
+    return len(entries)
+
+
+class FAQIndex:
+    """Read-only, memory-mapped view of an index file
+
+    The mapping is shared by every worker forked from a preloading master,
+    and only the pages a lookup touches are read from disk.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, stored_hash, self.count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not an FAQ index")
+        self.prompt_hash = stored_hash.decode("ascii")
+        self._data_start = _HEADER.size + self.count * _ENTRY.size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, i):
+        return _ENTRY.unpack_from(self._map, _HEADER.size + i * _ENTRY.size)
+
+    def lookup(self, question):
+        """Precomputed answer for a question, or None"""
+        normalized = faq_key(question)
+        if normalized is None:
+            return None
+        key = question_hash(normalized)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        while low < self.count:
+            entry_key, offset, question_length, answer_length = self._entry(low)
+            if entry_key != key:
+                break
+            start = self._data_start + offset
+            if self._map[start:start + question_length].decode("utf-8") == normalized:
+                with self._lock:
+                    self.hits += 1
+                answer_start = start + question_length
+                return self._map[answer_start:answer_start + answer_length].decode("utf-8")
+            low += 1
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def stats(self):
+        return {"entries": self.count, "hits": self.hits, "misses": self.misses}
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_faq_index(path=FAQ_INDEX_PATH):
+    """The process-wide index, or None if there is none for the current SYSTEM_PROMPT"""
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+    with _index_lock:
+        if _index_loaded:
+            return _index
+        _index_loaded = True
+        if not FAQ_ENABLED or not path or not os.path.exists(path):
+            return None
+        try:
+            index = FAQIndex(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"[FAQ] Ignoring {path}: {e}")
+            return None
+        if index.prompt_hash != prompt_hash():
+            print(f"[FAQ] {path} was built for another system prompt; run python faq_index.py build")
+            return None
+        print(f"[FAQ] Loaded {len(index)} precomputed answers from {path}")
+        _index = index
+        return _index
+
+
+# Offline job
+
+def read_corpus(path):
+    """Questions from a text file (one per line, # comments) or a JSON list"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            questions = json.load(f)
+        else:
+            questions = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    return questions
+
+
+def corpus_keys(path):
+    """{index key: question} of the corpus, without questions too vague to index"""
+    keys = {}
+    for question in read_corpus(path):
+        key = faq_key(question)
+        if key is None:
+            print(f"[FAQ] Skipping {question!r}: fewer than {MIN_KEY_WORDS} words after normalization")
+        else:
+            keys.setdefault(key, question)
+    return keys
+
+
+def read_journal(path, system_prompt_hash):
+    """{normalized question: answer} of journal records made with this prompt hash"""
+    answers = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line cut off by an interrupted run
+                if record.get("prompt_hash") == system_prompt_hash and record.get("answer"):
+                    answers[record["question"]] = record["answer"]
+    except FileNotFoundError:
+        pass
+    return answers
+
+
+class RateLimiter:
+    """Spaces calls at least 60 / per_minute seconds apart across threads"""
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def answer_question(llm_client, question, limiter, attempts=3):
+    """Ask the provider, retrying failed calls with exponential backoff"""
+    for attempt in range(attempts):
+        limiter.wait()
+        try:
+            # A throwaway history: every answer is a first-turn answer
+            answer = llm_client.get_response(question, [])
+        except Exception as e:
+            print(f"[FAQ] {question!r}: {e}")
+            answer = None
+        if answer:
+            return answer.strip()
+        if attempt + 1 < attempts:
+            time.sleep(RETRY_BASE_SECONDS * 2 ** attempt)
+    return None
+
+
+def build(corpus_path, llm_client, index_path=FAQ_INDEX_PATH, journal_path=FAQ_JOURNAL_PATH,
+          concurrency=FAQ_CONCURRENCY, per_minute=FAQ_REQUESTS_PER_MINUTE):
+    """Answer the corpus questions missing from the journal, then write the index"""
+    system_prompt_hash = prompt_hash()
+    answered = read_journal(journal_path, system_prompt_hash)
+    corpus = corpus_keys(corpus_path)
+    # Booking replies depend on the visitor, so they are never precomputed
+    pending = {
+        key: question for key, question in corpus.items()
+        if key not in answered and not is_booking_intent(question)
+    }
+    print(f"[FAQ] {len(answered)} answers reused, {len(pending)} questions to ask")
+
+    limiter = RateLimiter(per_minute)
+    journal_lock = threading.Lock()
+    failed = 0
+    started_at = time.perf_counter()
+    with open(journal_path, "a", encoding="utf-8") as journal, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {
+            pool.submit(answer_question, llm_client, question, limiter): normalized
+            for normalized, question in pending.items()
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            normalized = futures[future]
+            answer = future.result()
+            if not answer or BOOKING_MARKER in answer:
+                failed += 1
+            else:
+                answered[normalized] = answer
+                with journal_lock:
+                    journal.write(json.dumps({
+                        "question": normalized,
+                        "asked": pending[normalized],
+                        "prompt_hash": system_prompt_hash,
+                        "model": getattr(llm_client, "model", type(llm_client).__name__),
+                        "answer": answer,
+                    }, ensure_ascii=False) + "\n")
+                    # Flushed per answer, so an interrupted run loses nothing
+                    journal.flush()
+            if done % 10 == 0 or done == len(futures):
+                print(f"[FAQ] {done}/{len(futures)} answered ({time.perf_counter() - started_at:.0f}s)")
+
+    # Only questions still in the corpus go into the index
+    entries = write_index(index_path, {q: a for q, a in answered.items() if q in corpus}, system_prompt_hash)
+    print(f"[FAQ] Wrote {entries} answers to {index_path} ({os.path.getsize(index_path)} bytes); "
+          f"{failed} questions failed and will be retried on the next run")
+    return failed == 0
+
+
+def rebuild(corpus_path, index_path=FAQ_INDEX_PATH, journal_path=FAQ_JOURNAL_PATH):
+    """Write the index from the journal without calling the provider"""
+    system_prompt_hash = prompt_hash()
+    corpus = corpus_keys(corpus_path)
+    answered = read_journal(journal_path, system_prompt_hash)
+    entries = write_index(index_path, {q: a for q, a in answered.items() if q in corpus}, system_prompt_hash)
+    print(f"[FAQ] Wrote {entries} answers to {index_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute answers to frequently asked questions")
+    parser.add_argument("command", choices=("build", "rebuild"),
+                        help="build: answer missing questions, then write the index; rebuild: index only")
+    parser.add_argument("corpus", nargs="?", default="faq_corpus.txt",
+                        help="questions, one per line (or a JSON list)")
+    parser.add_argument("--concurrency", type=int, default=FAQ_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=FAQ_REQUESTS_PER_MINUTE, help="provider requests per minute")
+    parser.add_argument("--index", default=FAQ_INDEX_PATH)
+    parser.add_argument("--journal", default=FAQ_JOURNAL_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        rebuild(args.corpus, args.index, args.journal)
+        return 0
+    # Imported here: voice_bot uses this module
+    from voice_bot import FallbackClient, initialize_llm
+    llm_client = initialize_llm()
+    if isinstance(llm_client, FallbackClient):
+        print("[FAQ] Set GROQ_API_KEY or OPENAI_API_KEY to precompute answers", file=sys.stderr)
+        return 1
+    ok = build(args.corpus, llm_client, args.index, args.journal, args.concurrency, args.rpm)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
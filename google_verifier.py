@@ -0,0 +1,188 @@
+"""
+Google ID-token verification with cached signing certs
+
+id_token.verify_oauth2_token() downloads Google's signing certs on every
+call, so each login pays an extra round trip to googleapis.com and a login
+burst becomes a burst of cert fetches. GoogleTokenVerifier instead:
+
+- keeps the cert set in memory until its Cache-Control max-age expires
+  (Google rotates keys slowly and publishes new ones ahead of use)
+- refreshes it once for all concurrent callers (single flight), and also
+  when a token names a key id it has not seen, at most once per minute
+- fetches through the shared keep-alive pools of http_transport
+- imports google-auth on first use rather than at app startup
+- remembers the claims of recently verified tokens by hash, so the same
+  token presented again (e.g. a retried login) is not verified twice
+
+Signature, audience, expiry and issuer checks are those of google-auth's
+jwt.decode; only where the certs come from changes. certs_url and session
+can point anywhere, so it can be exercised offline with locally generated
+keys.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import http_transport
+from config import GOOGLE_CLIENT_ID, GOOGLE_CERTS_URL, GOOGLE_VERIFIED_TOKEN_TTL_SECONDS
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Used when the cert response has no usable Cache-Control max-age
+DEFAULT_CERTS_MAX_AGE = 3600
+# Minimum time between refreshes triggered by an unknown key id
+UNKNOWN_KID_REFRESH_INTERVAL = 60
+# Verified tokens remembered at most
+MAX_VERIFIED_TOKENS = 10000
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def cache_lifetime(headers, default=DEFAULT_CERTS_MAX_AGE):
+    """Seconds a response may be cached, from its Cache-Control and Age headers"""
+    cache_control = headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    if not match:
+        return default
+    try:
+        age = int(headers.get("Age", 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
+
+
+class GoogleTokenVerifier:
+    """Verifies Google ID tokens against an in-memory cert cache"""
+    def __init__(self, client_id, certs_url=GOOGLE_CERTS_URL, session=None,
+                 verified_ttl_seconds=300, clock_skew_seconds=10, timeout=10):
+        self.client_id = client_id
+        self.certs_url = certs_url
+        self._session = session
+        self.verified_ttl_seconds = verified_ttl_seconds
+        self.clock_skew_seconds = clock_skew_seconds
+        self.timeout = timeout
+        self._certs = {}
+        self._certs_expire_at = 0.0
+        self._last_refresh = 0.0
+        self._refresh_lock = threading.Lock()
+        # sha256(token) -> (expires_at, claims), oldest first
+        self._verified = OrderedDict()
+        self._verified_lock = threading.Lock()
+        self.cert_fetches = 0
+
+    @property
+    def session(self):
+        return self._session or http_transport.session()
+
+    def reconnect(self):
+        """Reset locking state (in a worker forked from a preloaded server)"""
+        self._refresh_lock = threading.Lock()
+
+    def warm_up(self):
+        """Import google-auth and open the HTTP session ahead of the first login"""
+        from google.auth import jwt  # noqa: F401
+        http_transport.session()
+
+    def verify(self, token):
+        """Claims of a valid token for this client id; raises ValueError otherwise"""
+        if isinstance(token, bytes):
+            token = token.decode("utf-8")
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        claims = self._cached_claims(token_hash)
+        if claims is not None:
+            return claims
+
+        from google.auth import jwt
+        kid = jwt.decode_header(token).get("kid")
+        certs = self._get_certs()
+        if kid not in certs:
+            # Possibly a freshly rotated key: look again, but don't let bad tokens hammer Google
+            certs = self._get_certs(unknown_kid=True)
+            if kid not in certs:
+                raise ValueError(f"Certificate for key id {kid} not found")
+        claims = jwt.decode(
+            token,
+            certs={kid: certs[kid]},
+            audience=self.client_id,
+            clock_skew_in_seconds=self.clock_skew_seconds,
+        )
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')!r}")
+        self._remember(token_hash, claims)
+        return claims
+
+    def _cached_claims(self, token_hash):
+        now = time.time()
+        with self._verified_lock:
+            entry = self._verified.get(token_hash)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._verified[token_hash]
+                return None
+            return dict(entry[1])
+
+    def _remember(self, token_hash, claims):
+        if self.verified_ttl_seconds <= 0:
+            return
+        # Never past the token's own expiry
+        expires_at = min(time.time() + self.verified_ttl_seconds, float(claims.get("exp", 0)))
+        with self._verified_lock:
+            self._verified[token_hash] = (expires_at, dict(claims))
+            self._verified.move_to_end(token_hash)
+            while len(self._verified) > MAX_VERIFIED_TOKENS:
+                self._verified.popitem(last=False)
+
+    def _get_certs(self, unknown_kid=False):
+        """Current cert set, refreshed when expired (one fetch for all waiting callers)"""
+        certs = self._certs
+        if not unknown_kid and certs and time.time() < self._certs_expire_at:
+            return certs
+        with self._refresh_lock:
+            # Another caller may have refreshed while this one waited for the lock
+            now = time.time()
+            if unknown_kid:
+                if now - self._last_refresh < UNKNOWN_KID_REFRESH_INTERVAL:
+                    return self._certs
+            elif self._certs and now < self._certs_expire_at:
+                return self._certs
+            self._last_refresh = now
+            import requests
+            try:
+                self._fetch_certs()
+            except (requests.RequestException, ValueError) as e:
+                if not self._certs:
+                    raise ValueError(f"Could not fetch Google certs: {e}") from e
+                # Keep using the previous set rather than failing every login
+                print(f"[AUTH] Could not refresh Google certs, keeping cached set: {e}")
+                self._certs_expire_at = now + 60
+            return self._certs
+
+    def _fetch_certs(self):
+        response = self.session.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+        certs = response.json()
+        if not isinstance(certs, dict) or "keys" in certs:
+            raise ValueError("expected a {key id: x509 certificate} mapping")
+        now = time.time()
+        self.cert_fetches += 1
+        self._certs = certs
+        self._certs_expire_at = now + cache_lifetime(response.headers)
+
+    def stats(self):
+        return {
+            "cert_fetches": self.cert_fetches,
+            "certs": len(self._certs),
+            "certs_expire_in_s": max(0, round(self._certs_expire_at - time.time())),
+            "verified_tokens": len(self._verified),
+        }
+
+
+# Shared by all requests of a worker
+google_verifier = GoogleTokenVerifier(
+    GOOGLE_CLIENT_ID,
+    verified_ttl_seconds=GOOGLE_VERIFIED_TOKEN_TTL_SECONDS,
+)
@@ -0,0 +1,174 @@
+"""
+Pool of pre-generated greetings for the desktop voice bot
+
+VoiceBot used to ask the LLM for a greeting before it could say anything,
+a full provider round trip (or a timeout) before the first audio. Greetings
+are now generated ahead of time and kept in a local JSON file
+(GREETING_POOL_PATH); at startup one is picked at random, never the same
+as last time, and the bot speaks immediately.
+
+The pool is refreshed in a background thread when it is older than
+GREETING_POOL_MAX_AGE_HOURS, smaller than GREETING_POOL_SIZE, or was made
+for a different persona prompt (SYSTEM_PROMPT hash). Until a pool exists,
+the canned greeting is used. Generate one offline with:
+
+    python greetings.py --count 12
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from config import (
+    GREETING_POOL_MAX_AGE_HOURS,
+    GREETING_POOL_PATH,
+    GREETING_POOL_SIZE,
+)
+from intents import CANNED_RESPONSES, GREETING
+from response_cache import prompt_hash
+
+GREETING_PROMPT = (
+    "Give a warm, natural 1–2 sentence greeting in first person as me. "
+    "Do not mention being an AI or assistant. Keep it friendly and real."
+)
+
+
+def generate_greeting(llm_client):
+    """One greeting from the LLM, or None"""
+    try:
+        # A throwaway history, so the request doesn't become part of the conversation
+        greeting = llm_client.get_response(GREETING_PROMPT, [])
+    except Exception as e:
+        print(f"[GREETING] Generation failed: {e}")
+        return None
+    if greeting and isinstance(greeting, str):
+        return greeting.strip().strip('"')
+    return None
+
+
+class GreetingPool:
+    """Greetings persisted in a JSON file, picked at random"""
+    def __init__(self, path=GREETING_POOL_PATH, size=GREETING_POOL_SIZE,
+                 max_age_seconds=GREETING_POOL_MAX_AGE_HOURS * 3600):
+        self.path = path
+        self.size = size
+        self.max_age_seconds = max_age_seconds
+        self._prompt_hash = prompt_hash()
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {"greetings": []}
+        except (OSError, ValueError) as e:
+            print(f"[GREETING] Ignoring unreadable pool {self.path}: {e}")
+            return {"greetings": []}
+        if data.get("prompt_hash") != self._prompt_hash:
+            # Written for another persona: still better than nothing until
+            # the refresh replaces it, but counts as stale
+            data["generated_at"] = 0
+        return data
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    @property
+    def greetings(self):
+        return list(self._data.get("greetings", []))
+
+    def is_stale(self):
+        age = time.time() - self._data.get("generated_at", 0)
+        return len(self.greetings) < self.size or age > self.max_age_seconds
+
+    def pick(self):
+        """A random greeting other than the last one picked (no LLM call)"""
+        with self._lock:
+            greetings = self.greetings
+            last = self._data.get("last")
+            choices = [g for g in greetings if g != last] or greetings
+            if not choices:
+                return CANNED_RESPONSES[GREETING]
+            greeting = random.choice(choices)
+            self._data["last"] = greeting
+        try:
+            self._save()
+        except OSError:
+            pass  # Rotation is best effort
+        return greeting
+
+    def refresh(self, llm_client, count=None):
+        """Generate a new pool (blocking); keeps the old one if generation fails"""
+        count = count or self.size
+        started_at = time.perf_counter()
+        fresh = []
+        for _ in range(count * 2):
+            if len(fresh) >= count:
+                break
+            greeting = generate_greeting(llm_client)
+            if greeting and greeting not in fresh:
+                fresh.append(greeting)
+        if not fresh:
+            print("[GREETING] No greetings generated; keeping the current pool")
+            return False
+        with self._lock:
+            self._data = {
+                "prompt_hash": self._prompt_hash,
+                "model": getattr(llm_client, "model", type(llm_client).__name__),
+                "generated_at": time.time(),
+                "greetings": fresh,
+                "last": self._data.get("last"),
+            }
+            self._save()
+        print(f"[GREETING] Generated {len(fresh)} greetings in {time.perf_counter() - started_at:.1f}s")
+        return True
+
+    def refresh_in_background(self, llm_client):
+        """Start a refresh thread if the pool is stale (at most one at a time)"""
+        with self._lock:
+            if self._refreshing or not self.is_stale():
+                return None
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh(llm_client)
+            finally:
+                self._refreshing = False
+
+        thread = threading.Thread(target=run, name="greeting-refresh", daemon=True)
+        thread.start()
+        return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the voice bot's greeting pool")
+    parser.add_argument("--count", type=int, default=GREETING_POOL_SIZE, help="greetings to generate")
+    parser.add_argument("--path", default=GREETING_POOL_PATH)
+    args = parser.parse_args(argv)
+
+    # Imported here: voice_bot uses this module
+    from voice_bot import FallbackClient, initialize_llm
+    llm_client = initialize_llm()
+    if isinstance(llm_client, FallbackClient):
+        print("[GREETING] Set GROQ_API_KEY or OPENAI_API_KEY to generate greetings", file=sys.stderr)
+        return 1
+    pool = GreetingPool(args.path, size=args.count)
+    if not pool.refresh(llm_client, args.count):
+        return 1
+    for greeting in pool.greetings:
+        print(f"- {greeting}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+gunicorn serving profiles for the web app
+
+    gunicorn -c gunicorn.conf.py                         # SERVER_PROFILE=gthread
+    SERVER_PROFILE=async gunicorn -c gunicorn.conf.py
+
+Profiles (SERVER_PROFILE):
+
+- gthread (default): threaded workers running app:app. Chat requests spend
+  nearly all their time waiting on the LLM, so a few processes with
+  SERVER_THREADS threads each serve many concurrent visitors.
+- sync: app:app with one request per worker at a time; 2 x CPUs + 1 workers.
+- async: uvicorn workers running async_app:app, one event loop per CPU.
+
+With more than one worker, CONVERSATION_STORE defaults to sqlite (a memory
+store would give each worker its own copy of every conversation), and an
+explicit CONVERSATION_STORE=memory refuses to start. The response cache and
+semantic index stay per worker: they only hold answers, which any worker may
+serve, so a split only lowers their hit rate. With several workers and no
+METRICS_DIR, metrics snapshots go to a temporary directory for the run, so
+every scrape of /metrics covers all workers.
+
+The app is preloaded in the master (SERVER_PRELOAD), so it is imported once
+and the loaded modules and semantic index are shared copy-on-write by the
+workers, which also start faster. Each worker then replaces the network
+clients and thread pools it inherited (chat_service.init_worker) and starts its own
+background threads. The groq/openai SDKs and google-auth are not imported
+with the app: SERVER_WARM_UP=background loads them in a thread of each
+worker once it is serving, SERVER_WARM_UP=master in the master after it has
+bound the port and before it forks (less memory per worker, workers come up
+later).
+
+On shutdown or reload, workers stop accepting requests and get
+SERVER_GRACEFUL_TIMEOUT seconds to finish in-flight ones, streamed replies
+included, then wait for LLM calls still running and for booking deliveries
+(chat_service.shutdown_worker).
+"""
+import glob
+import os
+import shutil
+import tempfile
+
+import config
+from config import (
+    SERVER_BIND,
+    SERVER_GRACEFUL_TIMEOUT,
+    SERVER_PRELOAD,
+    SERVER_PROFILE,
+    SERVER_THREADS,
+    SERVER_TIMEOUT,
+    SERVER_WARM_UP,
+    SERVER_WORKERS,
+)
+
+PROFILES = {
+    "sync": {"app": "app:app", "worker_class": "sync"},
+    "gthread": {"app": "app:app", "worker_class": "gthread"},
+    "async": {"app": "async_app:app", "worker_class": "uvicorn.workers.UvicornWorker"},
+}
+
+
+def cpu_count():
+    """CPUs this process may run on (respects container CPU affinity)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def default_workers(profile, cpus):
+    if profile == "sync":
+        return 2 * cpus + 1
+    # Threads or an event loop provide the concurrency; one spare process
+    # keeps a worker available while another is restarting
+    return cpus + 1
+
+
+if SERVER_PROFILE not in PROFILES:
+    raise ValueError(f"SERVER_PROFILE must be one of {', '.join(PROFILES)}, not {SERVER_PROFILE!r}")
+if SERVER_WARM_UP not in ("background", "master", "off"):
+    raise ValueError(f"SERVER_WARM_UP must be background, master or off, not {SERVER_WARM_UP!r}")
+profile = PROFILES[SERVER_PROFILE]
+
+wsgi_app = profile["app"]
+worker_class = profile["worker_class"]
+workers = SERVER_WORKERS or default_workers(SERVER_PROFILE, cpu_count())
+# A visitor's turns land on any worker, so with several workers conversations
+# must live in a store they share. The workers inherit config from the master
+if workers > 1 and "CONVERSATION_STORE" not in os.environ:
+    os.environ["CONVERSATION_STORE"] = config.CONVERSATION_STORE = "sqlite"
+# Likewise /metrics would report only the worker that answered the scrape, so
+# the workers share snapshots in a directory made for this run (removed at exit)
+_own_metrics_dir = None
+if workers > 1 and config.METRICS_ENABLED and not config.METRICS_DIR:
+    _own_metrics_dir = tempfile.mkdtemp(prefix="voicebot-metrics-")
+    os.environ["METRICS_DIR"] = config.METRICS_DIR = _own_metrics_dir
+threads = SERVER_THREADS if SERVER_PROFILE == "gthread" else 1
+bind = SERVER_BIND
+preload_app = SERVER_PRELOAD
+timeout = SERVER_TIMEOUT
+graceful_timeout = SERVER_GRACEFUL_TIMEOUT
+# SSE streams and browser keep-alives reuse connections
+keepalive = 5
+
+
+def on_starting(server):
+    # Checked here as well, since -w on the command line overrides workers above
+    if server.cfg.workers > 1 and config.CONVERSATION_STORE == "memory":
+        raise RuntimeError(
+            f"CONVERSATION_STORE=memory keeps each worker's conversations to itself; "
+            f"use CONVERSATION_STORE=sqlite with {server.cfg.workers} workers, or run one worker")
+    if server.cfg.workers > 1 and config.METRICS_ENABLED and not config.METRICS_DIR:
+        server.log.warning("[SERVER] METRICS_DIR is empty: /metrics will report only the worker "
+                           "that answers each scrape")
+    # Snapshots of a previous run's workers would otherwise be summed into this one's counters
+    metrics_dir = config.METRICS_DIR
+    for path in glob.glob(os.path.join(metrics_dir, "metrics-*.json")) if metrics_dir else []:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    server.log.info(f"[SERVER] Profile {SERVER_PROFILE}: {workers} x {worker_class}"
+                    f"{f' ({threads} threads)' if threads > 1 else ''}, preload={preload_app}")
+
+
+def when_ready(server):
+    if SERVER_WARM_UP == "master" and server.cfg.preload_app:
+        from chat_service import warm_up
+        warm_up()
+
+
+def post_worker_init(worker):
+    from chat_service import init_worker
+    init_worker(reconnect=worker.cfg.preload_app, warm=SERVER_WARM_UP == "background")
+
+
+def worker_exit(server, worker):
+    from chat_service import shutdown_worker
+    shutdown_worker(timeout=graceful_timeout)
+
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(_own_metrics_dir, ignore_errors=True)
@@ -0,0 +1,217 @@
+"""
+Shared keep-alive HTTP transport for outbound calls
+
+Every outbound call goes through connection pools owned by this module
+instead of opening a fresh TCP+TLS connection:
+
+- session(): a requests.Session for the calling thread. All threads' sessions
+  share one urllib3 pool manager, with a pool of up to HTTP_POOL_SIZE
+  kept-alive connections for each of HTTP_POOL_HOSTS hosts. It is used by
+  the n8n webhook, the Hugging Face API and Google cert fetches. Requests
+  without an explicit timeout get (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT).
+- sdk_http_client(cls): the httpx client for an LLM SDK, e.g.
+  sdk_http_client(openai.DefaultHttpxClient), built with the same pool
+  limits and connect timeout, but LLM_READ_TIMEOUT for reads since a
+  completion can take far longer than other calls. One per SDK, shared by every client of that provider
+  in the process. The SDKs bring their own httpx, so they can't share the
+  urllib3 pools.
+
+Requests and newly opened connections are counted per host
+(voicebot_http_client_requests_total, voicebot_http_client_connections_total
+and stats()); requests minus connections were served on a reused one.
+
+Pools are never carried across a fork: a gunicorn worker forked from a
+preloading master gets new ones, so sockets are never shared by processes.
+"""
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from config import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_SECONDS,
+    HTTP_POOL_HOSTS,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+    LLM_READ_TIMEOUT,
+)
+from metrics import HTTP_CLIENT_CONNECTIONS, HTTP_CLIENT_REQUESTS, HTTP_CLIENT_SECONDS
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+class _HostStats:
+    """Per-host request and new-connection counts (kept even with metrics disabled)"""
+    def __init__(self):
+        self._counts = {}  # host -> [requests, connections]
+        self._lock = threading.Lock()
+
+    def request(self, host):
+        HTTP_CLIENT_REQUESTS.inc(host=host)
+        with self._lock:
+            self._counts.setdefault(host, [0, 0])[0] += 1
+
+    def connection(self, host):
+        HTTP_CLIENT_CONNECTIONS.inc(host=host)
+        with self._lock:
+            self._counts.setdefault(host, [0, 0])[1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                host: {
+                    "requests": requests_made,
+                    "connections": connections,
+                    "reuse_ratio": round(1 - connections / requests_made, 3) if requests_made else None,
+                }
+                for host, (requests_made, connections) in sorted(self._counts.items())
+            }
+
+
+_stats = _HostStats()
+_lock = threading.Lock()
+_state = {"pid": None, "adapter": None, "local": None, "sdk_clients": {}}
+
+
+def _pooled_adapter():
+    # requests/urllib3 are imported on first use, not with the app
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        def _new_conn(self):
+            _stats.connection(self.host)
+            return super()._new_conn()
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        def _new_conn(self):
+            _stats.connection(self.host)
+            return super()._new_conn()
+
+    class PooledAdapter(HTTPAdapter):
+        """HTTPAdapter with default timeouts and per-host request/connection counts"""
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": CountingHTTPConnectionPool,
+                "https": CountingHTTPSConnectionPool,
+            }
+
+        def send(self, request, timeout=None, **kwargs):
+            host = urlsplit(request.url).hostname or ""
+            _stats.request(host)
+            started_at = time.perf_counter()
+            try:
+                return super().send(request, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
+            finally:
+                HTTP_CLIENT_SECONDS.observe(time.perf_counter() - started_at, host=host)
+
+    # pool_block=False: past HTTP_POOL_SIZE busy connections, extra ones are opened
+    # (and closed after use) rather than waiting for a free one
+    return PooledAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+
+
+def _current():
+    """Transport state of this process, created on first use after start or fork"""
+    state = _state
+    if state["pid"] == os.getpid():
+        return state
+    with _lock:
+        if state["pid"] != os.getpid():
+            state["adapter"] = None
+            state["local"] = threading.local()
+            state["sdk_clients"] = {}
+            state["pid"] = os.getpid()
+    return state
+
+
+def session():
+    """Keep-alive requests.Session of the calling thread, backed by the shared pools"""
+    state = _current()
+    http = getattr(state["local"], "session", None)
+    if http is None:
+        import requests
+        with _lock:
+            if state["adapter"] is None:
+                state["adapter"] = _pooled_adapter()
+        http = requests.Session()
+        http.mount("http://", state["adapter"])
+        http.mount("https://", state["adapter"])
+        state["local"].session = http
+    return http
+
+
+def _httpx_module(client_class):
+    """The httpx package (httpx or a renamed fork) a client class is built on"""
+    for base in client_class.__mro__:
+        if base.__name__ in ("Client", "AsyncClient"):
+            return sys.modules[base.__module__.split(".")[0]]
+    raise TypeError(f"{client_class!r} is not an httpx client class")
+
+
+def _count_connection(response):
+    # httpcore exposes the connection's stream; one not seen before is a new connection
+    stream = response.extensions.get("network_stream")
+    if stream is None or getattr(stream, "_voicebot_seen", False):
+        return
+    try:
+        stream._voicebot_seen = True
+    except AttributeError:
+        return
+    _stats.connection(response.request.url.host)
+
+
+def _count_request(request):
+    _stats.request(request.url.host)
+
+
+async def _acount_request(request):
+    _count_request(request)
+
+
+async def _acount_connection(response):
+    _count_connection(response)
+
+
+def _httpx_options(httpx, is_async):
+    if is_async:
+        hooks = {"request": [_acount_request], "response": [_acount_connection]}
+    else:
+        hooks = {"request": [_count_request], "response": [_count_connection]}
+    return {
+        "limits": httpx.Limits(
+            max_connections=HTTP_POOL_HOSTS * HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+        "timeout": httpx.Timeout(LLM_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        "event_hooks": hooks,
+    }
+
+
+def sdk_http_client(client_class):
+    """Shared httpx client for an SDK (e.g. openai.DefaultHttpxClient), one per class and process"""
+    state = _current()
+    client = state["sdk_clients"].get(client_class)
+    if client is None:
+        with _lock:
+            client = state["sdk_clients"].get(client_class)
+            if client is None:
+                client = client_class(**_httpx_options(_httpx_module(client_class), is_async=False))
+                state["sdk_clients"][client_class] = client
+    return client
+
+
+def sdk_async_http_client(client_class):
+    """New httpx async client for an SDK (e.g. openai.DefaultAsyncHttpxClient)
+
+    Not shared: an async client belongs to the event loop it is first used on.
+    """
+    return client_class(**_httpx_options(_httpx_module(client_class), is_async=True))
+
+
+def stats():
+    """Requests, new connections and connection reuse ratio per host"""
+    return _stats.snapshot()
@@ -0,0 +1,98 @@
+"""
+Fast intent detection in front of the LLM call
+
+Each question is classified once, with regular expressions compiled at
+import, into one of:
+
+- greeting, exit, reset: the whole message is a greeting ("hey there!"),
+  a goodbye or a request to start over. These get canned replies
+  (canned_response) without a provider round trip.
+- booking: the visitor wants to set up a meeting. Only then is their
+  name and email added to the prompt.
+- question: everything else, answered by the LLM.
+
+Booking detection matches whole words only (so "recall" or "talking" are
+not "call"/"talk") and scores the cues it finds: an unambiguous cue such as
+"schedule" or "book" used as a verb ("book a call", "can I book") is enough
+on its own, while softer ones ("call", "connect", "talk") also need a time
+("tomorrow", "3pm") or a second cue. "book" as a noun is no cue at all.
+Each cue's weight is the chance it signals booking on its own; they combine
+as independent evidence, 1 - (1 - w1) * (1 - w2) * ..., into the confidence.
+"""
+import re
+from collections import namedtuple
+
+GREETING = "greeting"
+EXIT = "exit"
+RESET = "reset"
+BOOKING = "booking"
+QUESTION = "question"
+
+Intent = namedtuple("Intent", "name confidence")
+
+# Minimum confidence for a booking intent
+BOOKING_THRESHOLD = 0.5
+
+_WHOLE_MESSAGE = re.compile(
+    r"^\s*(?:"
+    r"(?P<greeting>(?:hi|hello|hey|hiya|howdy|yo|greetings|good (?:morning|afternoon|evening))"
+    r"(?:\s+(?:there|anant|everyone))?"
+    r"(?:[\s,!.]+how (?:are|r) (?:you|u)(?: doing)?(?: today)?)?)"
+    r"|(?P<exit>(?:ok(?:ay)?[\s,]+)?(?:thanks?(?: you)?[\s,!.]+)?"
+    r"(?:bye|goodbye|bye bye|see (?:you|ya)(?: later)?|exit|quit|that'?s all(?: for now)?|good ?night))"
+    r"|(?P<reset>(?:please\s+)?(?:reset|start over|start again|restart|new conversation"
+    r"|clear (?:the |our |this )?(?:chat|conversation|history))(?: please)?)"
+    r")[\s!.?,]*$",
+    re.IGNORECASE,
+)
+
+_BOOKING_CUES = re.compile(
+    r"\b(?:"
+    # "book" only as a verb: "book a call", "can I book", not "your favourite book"
+    r"(?P<strong>(?:to|i|we|can|could|let'?s|please)\s+book"
+    r"|book\s+(?:a|an|me|us|in|some|time|it|that|this|the|my)|booking|booked"
+    r"|schedul(?:e|ed|ing)|appointment|calendar|availab(?:le|ility)"
+    r"|meeting|slot)"
+    r"|(?P<weak>call|connect|talk|meet|interview|zoom|google meet)"
+    r"|(?P<time>today|tomorrow|tonight|next week|this week|(?:mon|tues|wednes|thurs|fri|satur|sun)day"
+    r"|\d{1,2}(?::\d{2})?\s?(?:am|pm)|morning|afternoon|evening"
+    r"|ist|pst|est|gmt|utc)"
+    r")\b",
+    re.IGNORECASE,
+)
+_CUE_WEIGHTS = {"strong": 0.85, "weak": 0.35, "time": 0.35}
+
+CANNED_RESPONSES = {
+    GREETING: "Hey! Good to connect — happy to share about me. What would you like to know?",
+    EXIT: "Goodbye! It was nice talking with you.",
+    RESET: "Sure, let's start fresh. What would you like to know?",
+}
+
+
+def booking_confidence(text):
+    """Combined confidence of the booking cues in text (0 when there are none)"""
+    doubt = 1.0
+    seen = set()
+    for match in _BOOKING_CUES.finditer(text):
+        cue = match.group(0).lower()
+        if cue in seen:
+            continue
+        seen.add(cue)
+        doubt *= 1.0 - _CUE_WEIGHTS[match.lastgroup]
+    return 1.0 - doubt
+
+
+def detect_intent(text):
+    """Intent of a message, with a confidence between 0 and 1"""
+    whole = _WHOLE_MESSAGE.match(text)
+    if whole:
+        return Intent(whole.lastgroup, 1.0)
+    confidence = booking_confidence(text)
+    if confidence >= BOOKING_THRESHOLD:
+        return Intent(BOOKING, round(confidence, 2))
+    return Intent(QUESTION, round(1.0 - confidence, 2))
+
+
+def canned_response(intent):
+    """Reply for intents that don't need the LLM, else None"""
+    return CANNED_RESPONSES.get(intent.name)
@@ -0,0 +1,377 @@
+"""
+Latency-aware routing across all configured LLM providers
+
+LLMRouter wraps every configured provider client (Groq, OpenAI) behind the
+same interface as a single client. For each request it:
+
+- ranks providers by recent p50 latency, skipping ones whose circuit
+  breaker is open (too many consecutive failures, until a cooldown passes)
+- hedges: if the first provider hasn't answered within the hedge deadline
+  (its recent p95, but at least LLM_HEDGE_AFTER_SECONDS), the next provider
+  is asked too and the first answer wins
+- fails over to the next provider when one errors or returns nothing
+- uses FallbackClient's canned answers only when every provider failed
+
+Streaming requests fail over but are not hedged: a stream is committed to
+the provider that produced its first chunk.
+
+Per-provider latency, error rate, breaker state and route decision counts
+are exposed through stats() for /api/health.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config import (
+    LLM_HEDGE_AFTER_SECONDS,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_COOLDOWN_SECONDS,
+)
+from metrics import ROUTE_DECISIONS
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """Rolling latency/error window and circuit breaker for one provider"""
+    def __init__(self, name, window=100, failure_threshold=3, cooldown_seconds=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._latencies = deque(maxlen=window)  # successful calls only
+        self._outcomes = deque(maxlen=window)   # True for success
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+        self.state = CLOSED
+        self._lock = threading.Lock()
+
+    def available(self):
+        """True if allow() would let a request through now (changes nothing)
+
+        Used to rank providers: only allow() claims a half-open breaker's
+        single probe, and only for a request that is actually sent.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.time()
+            if self.state == OPEN and now - self._opened_at < self.cooldown_seconds:
+                return False
+            return now - self._probe_started_at >= self.cooldown_seconds
+
+    def allow(self):
+        """True if a request may be sent to this provider now (claims a half-open probe)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.time()
+            if self.state == OPEN and now - self._opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+            # Let one trial request through per cooldown period
+            if self.state == HALF_OPEN and now - self._probe_started_at >= self.cooldown_seconds:
+                self._probe_started_at = now
+                return True
+            return False
+
+    def record(self, latency, ok):
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(latency)
+                self._consecutive_failures = 0
+                self.state = CLOSED
+            else:
+                self._consecutive_failures += 1
+                if self.state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                    if self.state != OPEN:
+                        print(f"[ROUTER] Circuit opened for {self.name}")
+                    self.state = OPEN
+                    self._opened_at = time.time()
+
+    def percentile(self, pct):
+        with self._lock:
+            ordered = sorted(self._latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def error_rate(self):
+        with self._lock:
+            outcomes = list(self._outcomes)
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def stats(self):
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        return {
+            "state": self.state,
+            "requests": len(self._outcomes),
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class LLMRouter:
+    """LLM client that routes each request across several providers"""
+    def __init__(self, providers, fallback, hedge_after_seconds=2.0,
+                 failure_threshold=3, cooldown_seconds=30):
+        # providers: list of (name, client) in order of preference
+        self.providers = providers
+        self.fallback = fallback
+        self.hedge_after_seconds = hedge_after_seconds
+        self.health = {
+            name: ProviderHealth(name, failure_threshold=failure_threshold,
+                                 cooldown_seconds=cooldown_seconds)
+            for name, _ in providers
+        }
+        self.model = "|".join(getattr(client, "model", name) for name, client in providers)
+        self.conversation_history = []
+        self.decisions = {"primary": 0, "hedged": 0, "failover": 0, "fallback": 0}
+        self.last_decision = None
+        self._decisions_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-router")
+
+    def reconnect(self):
+        """Fresh HTTP clients and thread pool (in a worker forked from a preloaded server)"""
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-router")
+        for _, client in self.providers:
+            if hasattr(client, "reconnect"):
+                client.reconnect()
+
+    def warm_up(self):
+        """Load every provider's SDK ahead of the first request"""
+        for _, client in self.providers:
+            if hasattr(client, "warm_up"):
+                client.warm_up()
+
+    def close(self, timeout=30):
+        """Wait up to timeout seconds for provider calls still running (e.g. losing hedges)"""
+        executor = self._executor
+        waiter = threading.Thread(target=executor.shutdown, kwargs={"wait": True}, daemon=True)
+        waiter.start()
+        waiter.join(timeout)
+        return not waiter.is_alive()
+
+    def _ranked(self):
+        """Available providers, fastest recent p50 first (untried ones keep their order)"""
+        order = {name: i for i, (name, _) in enumerate(self.providers)}
+
+        def expected_latency(item):
+            p50 = self.health[item[0]].percentile(50)
+            return (p50 if p50 is not None else 0.0, order[item[0]])
+
+        return [item for item in sorted(self.providers, key=expected_latency)
+                if self.health[item[0]].available()]
+
+    def _hedge_deadline(self, name):
+        p95 = self.health[name].percentile(95)
+        return max(self.hedge_after_seconds, p95 or 0.0)
+
+    def _decide(self, decision, provider):
+        with self._decisions_lock:
+            self.decisions[decision] += 1
+            self.last_decision = {"decision": decision, "provider": provider, "at": time.time()}
+        ROUTE_DECISIONS.inc(decision=decision, provider=provider)
+
+    def _timed_call(self, name, client, question, history, user_context):
+        start = time.perf_counter()
+        try:
+            answer = client.get_response(question, history, user_context)
+        except Exception as e:
+            print(f"[ROUTER] {name} raised: {e}")
+            answer = None
+        self.health[name].record(time.perf_counter() - start, bool(answer))
+        return answer
+
+    def get_response(self, question, history=None, user_context=None):
+        """Get a response, hedging and failing over across providers"""
+        if history is None:
+            history = self.conversation_history
+        candidates = self._ranked()
+        pending = {}  # future -> (name, private copy of history)
+        hedged = failed = False
+        deadline = None
+
+        def launch():
+            """Send the request to the next candidate its breaker lets through"""
+            nonlocal deadline
+            while candidates:
+                name, client = candidates.pop(0)
+                if not self.health[name].allow():
+                    continue
+                attempt_history = list(history)
+                future = self._executor.submit(
+                    self._timed_call, name, client, question, attempt_history, user_context)
+                pending[future] = (name, attempt_history)
+                deadline = time.monotonic() + self._hedge_deadline(name)
+                return True
+            return False
+
+        launch()
+        while pending:
+            timeout = max(deadline - time.monotonic(), 0) if candidates else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primary is slow: ask the next provider as well
+                hedged = launch() or hedged
+                continue
+            for future in done:
+                name, attempt_history = pending.pop(future)
+                answer = future.result()
+                if answer:
+                    # Slower attempts keep running; their results only update stats
+                    history[:] = attempt_history
+                    self._decide("hedged" if hedged else "failover" if failed else "primary", name)
+                    return answer
+                failed = True
+            if not pending:
+                launch()
+
+        self._decide("fallback", type(self.fallback).__name__)
+        return self.fallback.get_response(question, history, user_context)
+
+    def stream_response(self, question, history=None, user_context=None):
+        """Stream from the first provider that produces output, failing over before the first chunk"""
+        if history is None:
+            history = self.conversation_history
+        failed = False
+        for name, client in self._ranked():
+            if not self.health[name].allow():
+                continue
+            start = time.perf_counter()
+            stream = client.stream_response(question, history, user_context)
+            try:
+                first = next(stream, None)
+            except Exception as e:
+                print(f"[ROUTER] {name} raised: {e}")
+                first = None
+            # Time to first chunk is the latency users notice
+            self.health[name].record(time.perf_counter() - start, first is not None)
+            if first is None:
+                failed = True
+                continue
+            # Like get_response: "failover" only when an earlier provider failed this request
+            # (which provider is tried first changes with latency ranking)
+            self._decide("failover" if failed else "primary", name)
+            yield first
+            yield from stream
+            return
+        self._decide("fallback", type(self.fallback).__name__)
+        yield from self.fallback.stream_response(question, history, user_context)
+
+    async def _atimed_call(self, name, client, question, history, user_context):
+        start = time.perf_counter()
+        try:
+            answer = await client.aget_response(question, history, user_context)
+        except Exception as e:
+            print(f"[ROUTER] {name} raised: {e}")
+            answer = None
+        self.health[name].record(time.perf_counter() - start, bool(answer))
+        return answer
+
+    async def aget_response(self, question, history=None, user_context=None):
+        """Async version of get_response"""
+        if history is None:
+            history = self.conversation_history
+        candidates = self._ranked()
+        pending = {}  # task -> (name, private copy of history)
+        hedged = failed = False
+        deadline = None
+
+        def launch():
+            nonlocal deadline
+            while candidates:
+                name, client = candidates.pop(0)
+                if not self.health[name].allow():
+                    continue
+                attempt_history = list(history)
+                task = asyncio.ensure_future(
+                    self._atimed_call(name, client, question, attempt_history, user_context))
+                pending[task] = (name, attempt_history)
+                deadline = time.monotonic() + self._hedge_deadline(name)
+                return True
+            return False
+
+        launch()
+        while pending:
+            timeout = max(deadline - time.monotonic(), 0) if candidates else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedged = launch() or hedged
+                continue
+            for task in done:
+                name, attempt_history = pending.pop(task)
+                answer = task.result()
+                if answer:
+                    history[:] = attempt_history
+                    self._decide("hedged" if hedged else "failover" if failed else "primary", name)
+                    return answer
+                failed = True
+            if not pending:
+                launch()
+
+        self._decide("fallback", type(self.fallback).__name__)
+        return await self.fallback.aget_response(question, history, user_context)
+
+    async def astream_response(self, question, history=None, user_context=None):
+        """Async version of stream_response"""
+        if history is None:
+            history = self.conversation_history
+        failed = False
+        for name, client in self._ranked():
+            if not self.health[name].allow():
+                continue
+            start = time.perf_counter()
+            stream = client.astream_response(question, history, user_context)
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                print(f"[ROUTER] {name} raised: {e}")
+                first = None
+            self.health[name].record(time.perf_counter() - start, first is not None)
+            if first is None:
+                failed = True
+                continue
+            # Like get_response: "failover" only when an earlier provider failed this request
+            # (which provider is tried first changes with latency ranking)
+            self._decide("failover" if failed else "primary", name)
+            yield first
+            async for chunk in stream:
+                yield chunk
+            return
+        self._decide("fallback", type(self.fallback).__name__)
+        async for chunk in self.fallback.astream_response(question, history, user_context):
+            yield chunk
+
+    def stats(self):
+        """Provider health and route decisions for /api/health"""
+        with self._decisions_lock:
+            decisions = dict(self.decisions)
+            last_decision = self.last_decision
+        return {
+            "providers": {name: self.health[name].stats() for name, _ in self.providers},
+            "decisions": decisions,
+            "last_decision": last_decision,
+        }
+
+
+def build_router(providers, fallback):
+    """Wrap the configured providers in an LLMRouter using config settings"""
+    return LLMRouter(
+        providers,
+        fallback,
+        hedge_after_seconds=LLM_HEDGE_AFTER_SECONDS,
+        failure_threshold=LLM_BREAKER_FAILURES,
+        cooldown_seconds=LLM_BREAKER_COOLDOWN_SECONDS,
+    )
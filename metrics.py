@@ -0,0 +1,309 @@
+"""
+Prometheus metrics for the web app (served at /metrics)
+
+A small dependency-free implementation of counters, gauges and histograms
+with labels, rendered in the Prometheus text exposition format. Recording is
+a dict update under a per-metric lock, cheap enough for every request.
+
+Each gunicorn worker keeps its own values. When METRICS_DIR is set, every
+worker also writes a snapshot to <METRICS_DIR>/metrics-<pid>.json every
+METRICS_FLUSH_SECONDS (and at exit), and a scrape of any worker merges all
+snapshots: counters and histograms are summed across workers (including
+ones that have exited), gauges only over workers that are still running.
+Clear the directory when deploying so counters start from zero.
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import METRICS_ENABLED, METRICS_DIR, METRICS_FLUSH_SECONDS
+
+# Latency buckets in seconds: sub-millisecond cache hits up to slow LLM replies
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # tuple of label values -> value
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (e.g. requests in flight)"""
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then sum and count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), [counts[:], total, count]]
+                    for key, (counts, total, count) in self._values.items()]
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    """All metrics of this process, plus the cross-worker snapshot files"""
+    def __init__(self, directory=""):
+        self.directory = directory
+        self._metrics = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def start(self):
+        """Start the snapshot writer of this process (no-op without a directory)"""
+        if not self.directory:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._flush_loop, daemon=True, name="metrics-flush").start()
+        atexit.register(self.flush)
+
+    def _after_fork(self):
+        # Values inherited from the parent were recorded (and reported) by it
+        for metric in self._metrics:
+            metric.reset()
+        self._pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            self.flush()
+
+    def snapshot(self):
+        return {
+            metric.name: {"kind": metric.kind, "samples": metric.snapshot()}
+            for metric in self._metrics
+        }
+
+    def flush(self):
+        """Write this process's snapshot for the other workers to read"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        try:
+            with self._flush_lock:
+                with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(self.snapshot(), f)
+                os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"[METRICS] Could not write {path}: {e}")
+
+    def _collect(self):
+        """Merged samples: name -> {label values tuple: value}"""
+        if not self.directory:
+            snapshots = [(True, self.snapshot())]
+        else:
+            self.start()
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+                try:
+                    pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+                    with open(path, encoding="utf-8") as f:
+                        snapshots.append((_alive(pid), json.load(f)))
+                except (OSError, ValueError):
+                    continue
+
+        merged = {metric.name: {} for metric in self._metrics}
+        for alive, snapshot in snapshots:
+            for name, data in snapshot.items():
+                if name not in merged or (data["kind"] == "gauge" and not alive):
+                    continue
+                samples = merged[name]
+                for key, value in data["samples"]:
+                    key = tuple(key)
+                    if data["kind"] == "histogram":
+                        total = samples.setdefault(key, [[0] * len(value[0]), 0.0, 0])
+                        total[0] = [a + b for a, b in zip(total[0], value[0])]
+                        total[1] += value[1]
+                        total[2] += value[2]
+                    else:
+                        samples[key] = samples.get(key, 0) + value
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        merged = self._collect()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(merged[metric.name].items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_labels(labels)} {_number(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets + (math.inf,), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == math.inf else _number(bound)
+                    lines.append(f"{metric.name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{metric.name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{metric.name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry(METRICS_DIR)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=REGISTRY._after_fork)
+
+
+# Web app metrics
+HTTP_REQUESTS = Counter(
+    "voicebot_http_requests_total", "HTTP requests by route, method and status",
+    ["route", "method", "status"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "voicebot_http_request_seconds", "HTTP request latency by route (streams: until the last byte)",
+    ["route"])
+HTTP_IN_FLIGHT = Gauge(
+    "voicebot_http_requests_in_flight", "HTTP requests currently being handled", ["route"])
+CHAT_STAGE_SECONDS = Histogram(
+    "voicebot_chat_stage_seconds",
+    "Time spent in each stage of a chat request (intent, cache, llm, llm_first_chunk, marker_parse, webhook)",
+    ["stage"])
+LLM_IN_FLIGHT = Gauge("voicebot_llm_requests_in_flight", "LLM calls currently in progress")
+LLM_TOKENS = Counter(
+    "voicebot_llm_tokens_total", "Tokens reported by the LLM provider (prompt, cached_prompt, completion)",
+    ["kind"])
+ROUTE_DECISIONS = Counter(
+    "voicebot_llm_route_decisions_total", "Provider routing decisions", ["decision", "provider"])
+INTENTS = Counter("voicebot_intents_total", "Detected intent of chat messages", ["intent"])
+CACHE_LOOKUPS = Counter(
+    "voicebot_response_cache_lookups_total", "Response cache lookups (hit, faq_hit, semantic_hit, miss)", ["result"])
+SINGLE_FLIGHT = Counter(
+    "voicebot_single_flight_requests_total",
+    "Coalesced LLM requests (leader called the LLM, follower shared a reply in this worker, "
+    "worker_follower shared another worker's)", ["role"])
+BOOKING_DELIVERIES = Counter(
+    "voicebot_booking_deliveries_total", "n8n webhook delivery attempts (sent, retry, failed)", ["outcome"])
+BOOKING_DELIVERY_SECONDS = Histogram(
+    "voicebot_booking_delivery_seconds", "n8n webhook call latency")
+HTTP_CLIENT_REQUESTS = Counter(
+    "voicebot_http_client_requests_total", "Outbound HTTP requests by host", ["host"])
+HTTP_CLIENT_CONNECTIONS = Counter(
+    "voicebot_http_client_connections_total",
+    "Outbound connections opened by host (requests beyond these reused a kept-alive one)", ["host"])
+HTTP_CLIENT_SECONDS = Histogram(
+    "voicebot_http_client_request_seconds", "Outbound HTTP request latency by host (pooled requests calls)",
+    ["host"])
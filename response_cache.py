@@ -0,0 +1,175 @@
+"""
+Cache of LLM answers to repeated first-turn persona questions
+
+Most visitors open with the same few questions ("life story", "superpower",
+...). When such a question starts a conversation, there is no history that
+could change the answer, so a previous answer can be reused. Questions are
+normalized (casefold, punctuation and stopwords removed) so trivial rewordings
+share an entry, and keys include the model and a hash of SYSTEM_PROMPT so a
+prompt or provider change never serves stale answers.
+
+On an exact-key miss, the precomputed FAQ answers (faq_index.py) are
+consulted, then an optional SemanticIndex (semantic_index.py), so
+near-duplicate rewordings can reuse an answer too.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    SYSTEM_PROMPT,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+from booking import BOOKING_MARKER, is_booking_intent
+from metrics import CACHE_LOOKUPS
+
+# Filler words that don't change what is being asked
+STOPWORDS = frozenset("""
+a an the is are was were be been am do does did can could would will should
+please tell me us about you your yours i my to of in on for and or so just
+really kindly hey hi hello ok okay u ur
+""".split())
+
+_CONTRACTION = re.compile(r"['’](s|re|ve|d|ll|m|t)\b")
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize_question(question):
+    """Reduce a question to the words that carry its meaning"""
+    text = _CONTRACTION.sub("", question.casefold())
+    text = _NON_WORD.sub(" ", text)
+    words = [word for word in text.split() if word not in STOPWORDS]
+    return " ".join(words)
+
+
+def prompt_hash(system_prompt=SYSTEM_PROMPT):
+    """Short hash identifying the persona prompt"""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Size-bounded LRU of first-turn answers with a TTL"""
+    def __init__(self, model, max_entries=512, ttl_seconds=3600, enabled=True, semantic_index=None,
+                 faq_index=None):
+        self.model = model
+        self.semantic_index = semantic_index
+        self.faq_index = faq_index
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._prompt_hash = prompt_hash()
+        # key -> (stored_at, answer), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.faq_hits = 0
+        self.misses = 0
+
+    def key_for(self, question, history):
+        """Cache key for a question, or None if its answer must not be cached
+
+        Only context-free (first-turn) questions are cacheable, and booking
+        requests are always sent to the LLM. With the cache disabled, keys are
+        still made for FAQ index lookups (if there is an index).
+        """
+        if not (self.enabled or self.faq_index is not None):
+            return None
+        if history or is_booking_intent(question):
+            return None
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        raw_key = f"{self.model}\x00{self._prompt_hash}\x00{normalized}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key, question=None):
+        """Return the cached answer for key, or None
+
+        On an exact miss, question (if given) is looked up in the FAQ index,
+        then in the semantic index for a near-duplicate.
+        """
+        if key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(result="hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        if self.faq_index is not None and question:
+            answer = self.faq_index.lookup(question)
+            if answer is not None:
+                with self._lock:
+                    self.faq_hits += 1
+                CACHE_LOOKUPS.inc(result="faq_hit")
+                return answer
+        answer = None
+        if self.semantic_index is not None and question:
+            answer = self.semantic_index.lookup(question)
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self.semantic_hits += 1
+        CACHE_LOOKUPS.inc(result="semantic_hit")
+        self._store(key, answer)
+        return answer
+
+    def put(self, key, answer, question=None):
+        """Remember an answer (ignored for uncacheable keys and booking replies)"""
+        if not self.enabled or key is None or not answer or BOOKING_MARKER in answer:
+            return
+        self._store(key, answer)
+        if self.semantic_index is not None and question:
+            self.semantic_index.add(question, answer)
+
+    def _store(self, key, answer):
+        with self._lock:
+            self._entries[key] = (time.time(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        hits = self.hits + self.semantic_hits + self.faq_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "semantic_entries": len(self.semantic_index) if self.semantic_index is not None else None,
+            "faq_hits": self.faq_hits,
+            "faq_entries": len(self.faq_index) if self.faq_index is not None else None,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def get_response_cache(llm_client):
+    """Create the response cache for the configured LLM client"""
+    # Imported here: semantic_index and faq_index reuse this module's normalization
+    from faq_index import get_faq_index
+    from semantic_index import get_semantic_index
+
+    model = f"{type(llm_client).__name__}:{getattr(llm_client, 'model', '')}"
+    return ResponseCache(
+        model,
+        max_entries=RESPONSE_CACHE_SIZE,
+        ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+        enabled=RESPONSE_CACHE_ENABLED,
+        semantic_index=get_semantic_index(model) if RESPONSE_CACHE_ENABLED else None,
+        # Switched separately (FAQ_ENABLED)
+        faq_index=get_faq_index(),
+    )
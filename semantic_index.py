@@ -0,0 +1,289 @@
+"""
+Near-duplicate lookup of previously answered first-turn questions
+
+Questions are embedded locally (CPU only, no model download) as hashed
+character n-gram TF-IDF vectors, so rewordings and typos of a question that
+was already answered ("whats ur superpower", "what is your super power") can
+reuse its answer. Similarity is a vectorized NumPy cosine over all stored
+questions; candidates above a configurable threshold must then also pass a
+word check (same_question): n-gram overlap alone rates "Why should we not
+hire you?" close to "Why should we hire you?", and "biggest achievement"
+close to "proudest achievement".
+
+The index has a fixed capacity (least recently used entries are replaced)
+and is persisted as a .npy matrix plus a small JSON sidecar with the
+answers, so restarted workers start warm. The saved matrix is loaded
+memory-mapped copy-on-write, so the workers of a host share its pages until
+one of them stores new questions; the matrix then grows with the number of
+stored questions rather than being allocated at full capacity up front.
+
+NumPy is optional: without it the index is simply disabled.
+"""
+import atexit
+import json
+import math
+import os
+import threading
+import time
+import zlib
+from difflib import SequenceMatcher
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_PATH,
+)
+from response_cache import normalize_question, prompt_hash
+from voice_bot import is_fallback_reply
+
+# Hashed feature space size and character n-gram lengths
+DIMENSIONS = 2048
+NGRAM_SIZES = (3, 4, 5)
+# Persist after this many inserts (and at exit)
+SAVE_EVERY = 20
+# Rows allocated for the first insert; the matrix doubles from there up to capacity
+INITIAL_ROWS = 64
+# Candidates above the threshold given the word check, best first
+MAX_CANDIDATES = 5
+# Spelling similarity (difflib ratio) for two words to count as the same word
+WORD_SIMILARITY = 0.8
+
+NEGATIONS = frozenset("""
+not no never nor none nothing nobody without cannot
+don doesn didn isn aren wasn weren won wouldn shouldn couldn haven hasn
+""".split())
+NUMBER_WORDS = {
+    word: str(value) for value, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve thirteen "
+        "fourteen fifteen sixteen seventeen eighteen nineteen twenty".split())
+}
+NUMBER_WORDS.update({"thirty": "30", "forty": "40", "fifty": "50", "hundred": "100"})
+
+
+def embed(question, dimensions=DIMENSIONS):
+    """Hashed character n-gram vector (sublinear TF, L2-normalized)"""
+    text = f" {normalize_question(question)} "
+    counts = {}
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            slot = zlib.crc32(text[i:i + n].encode("utf-8")) % dimensions
+            counts[slot] = counts.get(slot, 0) + 1
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for slot, count in counts.items():
+        vector[slot] = 1.0 + math.log(count)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _content_words(question):
+    return [NUMBER_WORDS.get(word, word) for word in normalize_question(question).split()]
+
+
+def _same_word(a, b):
+    if a == b:
+        return True
+    if a.isdigit() or b.isdigit() or min(len(a), len(b)) < 4:
+        return False
+    return SequenceMatcher(None, a, b).ratio() >= WORD_SIMILARITY
+
+
+def _unmatched(words, others):
+    """Words with no counterpart in others (a typo of it, or two words written as one)"""
+    compounds = set(others) | {a + b for a, b in zip(others, others[1:])}
+    unmatched = []
+    i = 0
+    while i < len(words):
+        if i + 1 < len(words) and words[i] + words[i + 1] in compounds:
+            i += 2
+            continue
+        if words[i] not in compounds and not any(_same_word(words[i], o) for o in others):
+            unmatched.append(words[i])
+        i += 1
+    return unmatched
+
+
+def same_question(a, b):
+    """True if b asks what a asks, word for word up to typos and one extra word
+
+    Rejects a negation on one side only, different numbers, and a word
+    swapped for another ("proudest" / "biggest", "pressure" / "failure").
+    """
+    words_a, words_b = _content_words(a), _content_words(b)
+    if bool(NEGATIONS.intersection(words_a)) != bool(NEGATIONS.intersection(words_b)):
+        return False
+    if sorted(w for w in words_a if w.isdigit()) != sorted(w for w in words_b if w.isdigit()):
+        return False
+    extra_a, extra_b = _unmatched(words_a, words_b), _unmatched(words_b, words_a)
+    if extra_a and extra_b:
+        return False
+    return len(extra_a) + len(extra_b) <= 1
+
+
+class SemanticIndex:
+    """Fixed-capacity TF-IDF index of question vectors and their answers"""
+    def __init__(self, model, capacity=2000, threshold=0.6, path=None, dimensions=DIMENSIONS):
+        self.model = model
+        self.capacity = capacity
+        self.threshold = threshold
+        self.path = path
+        self.dimensions = dimensions
+        self._prompt_hash = prompt_hash()
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self._df = np.zeros(dimensions, dtype=np.float32)  # document frequency per feature
+        self._last_used = np.zeros(0, dtype=np.float64)
+        # IDF weights and IDF-weighted row norms, recomputed after inserts
+        self._idf = None
+        self._norms = None
+        self._questions = []
+        self._answers = []
+        self._unsaved = 0
+        if path:
+            self._load()
+            atexit.register(self.save)
+
+    def __len__(self):
+        return len(self._answers)
+
+    def lookup(self, question):
+        """Answer of the most similar stored question, or None below the threshold"""
+        size = len(self._answers)
+        if size == 0:
+            return None
+        query = embed(question, self.dimensions)
+        with self._lock:
+            size = len(self._answers)
+            if self._idf is None:
+                self._reweight(size)
+            # cos(row * idf, query * idf) without materializing the weighted rows
+            weighted_query = query * self._idf
+            scores = (self._vectors[:size] @ (weighted_query * self._idf)) / np.maximum(
+                self._norms * np.linalg.norm(weighted_query), 1e-12)
+            candidates = np.argsort(-scores)[:MAX_CANDIDATES]
+            for slot in candidates:
+                if scores[slot] < self.threshold:
+                    break
+                if same_question(self._questions[slot], question):
+                    self._last_used[slot] = time.time()
+                    return self._answers[slot]
+            return None
+
+    def add(self, question, answer):
+        """Insert a question/answer pair, replacing the least recently used one when full"""
+        vector = embed(question, self.dimensions)
+        with self._lock:
+            size = len(self._answers)
+            if size < self.capacity:
+                slot = size
+                self._reserve(size + 1)
+                self._questions.append(question)
+                self._answers.append(answer)
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._df -= self._vectors[slot] > 0
+                self._questions[slot] = question
+                self._answers[slot] = answer
+            self._vectors[slot] = vector
+            self._df += vector > 0
+            self._last_used[slot] = time.time()
+            self._idf = None
+            self._unsaved += 1
+            save_now = self.path and self._unsaved >= SAVE_EVERY
+        if save_now:
+            self.save()
+
+    def _reserve(self, rows):
+        """Grow the row arrays to hold at least rows entries (caller holds the lock)"""
+        allocated = len(self._vectors)
+        if rows <= allocated:
+            return
+        new_rows = min(self.capacity, max(rows, INITIAL_ROWS, allocated * 2))
+        vectors = np.zeros((new_rows, self.dimensions), dtype=np.float32)
+        vectors[:allocated] = self._vectors
+        last_used = np.zeros(new_rows, dtype=np.float64)
+        last_used[:allocated] = self._last_used
+        self._vectors, self._last_used = vectors, last_used
+
+    def _reweight(self, size):
+        """Recompute IDF weights and weighted row norms (caller holds the lock)"""
+        self._idf = np.log((1.0 + size) / (1.0 + self._df)) + 1.0
+        rows = self._vectors[:size]
+        self._norms = np.sqrt((rows * rows) @ (self._idf * self._idf))
+
+    def save(self):
+        """Write the index to disk (atomically replacing the previous files)"""
+        if not self.path:
+            return
+        with self._lock:
+            size = len(self._answers)
+            vectors = np.array(self._vectors[:size])
+            meta = {
+                "model": self.model,
+                "prompt_hash": self._prompt_hash,
+                "dimensions": self.dimensions,
+                "questions": list(self._questions),
+                "answers": list(self._answers),
+                "last_used": self._last_used[:size].tolist(),
+            }
+            self._unsaved = 0
+        try:
+            tmp_npy = f"{self.path}.npy.tmp.{os.getpid()}"
+            tmp_json = f"{self.path}.json.tmp.{os.getpid()}"
+            with open(tmp_npy, "wb") as f:
+                np.save(f, vectors)
+            with open(tmp_json, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_npy, f"{self.path}.npy")
+            os.replace(tmp_json, f"{self.path}.json")
+        except OSError as e:
+            print(f"[SEMANTIC] Could not save index: {e}")
+
+    def _load(self):
+        """Load a saved index built with the same model, prompt and dimensions"""
+        try:
+            with open(f"{self.path}.json", encoding="utf-8") as f:
+                meta = json.load(f)
+            # Copy-on-write: pages stay shared until this process changes a row
+            vectors = np.load(f"{self.path}.npy", mmap_mode="c")
+        except (OSError, ValueError):
+            return
+        if (meta.get("model") != self.model
+                or meta.get("prompt_hash") != self._prompt_hash
+                or meta.get("dimensions") != self.dimensions
+                or vectors.shape[1] != self.dimensions):
+            print("[SEMANTIC] Saved index is for a different model or prompt; starting empty")
+            return
+        size = min(len(meta["answers"]), vectors.shape[0], self.capacity)
+        # Canned fallback replies saved by earlier versions are not answers
+        rows = [i for i in range(size) if not is_fallback_reply(meta["answers"][i])]
+        if len(rows) < size:
+            print(f"[SEMANTIC] Dropped {size - len(rows)} saved fallback replies")
+        # Fancy indexing copies, so the mapping is kept when nothing was dropped
+        self._vectors = vectors[:size] if len(rows) == size else np.array(vectors[rows])
+        size = len(rows)
+        self._df = (self._vectors > 0).sum(axis=0).astype(np.float32)
+        self._last_used = np.array([meta["last_used"][i] for i in rows], dtype=np.float64)
+        self._questions = [meta["questions"][i] for i in rows]
+        self._answers = [meta["answers"][i] for i in rows]
+        print(f"[SEMANTIC] Loaded {size} cached questions from {self.path}.npy")
+
+
+def get_semantic_index(model):
+    """Create the semantic index, or None when disabled or NumPy is missing"""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    if np is None:
+        print("[SEMANTIC] NumPy is not installed; near-duplicate question lookup is disabled")
+        return None
+    return SemanticIndex(
+        model,
+        capacity=SEMANTIC_CACHE_SIZE,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        path=SEMANTIC_CACHE_PATH or None,
+    )
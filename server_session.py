@@ -0,0 +1,351 @@
+"""
+Server-side sessions for the Flask and Quart apps
+
+By default Flask keeps the whole session (name, email, picture URL,
+conversation id) in a signed cookie that is re-signed and re-sent whenever
+it changes. With a server-side backend the cookie only carries a random
+session id and the data stays on the server:
+
+- SESSION_BACKEND=cookie (default): Flask's signed cookie sessions
+- SESSION_BACKEND=sqlite: a SQLite file shared by the workers of one host
+- SESSION_BACKEND=filesystem: one small file per session in SESSION_DIR
+- SESSION_BACKEND=redis: SESSION_REDIS_URL (needs the redis package)
+
+Backends share the Redis subset get(key) / set(key, value, ex=seconds) /
+delete(key), so a redis client (or any stand-in with those methods) can
+replace the local ones. Data is stored as compact JSON. A session is loaded
+lazily, on first access, so requests that never touch it (static files,
+health checks, metrics) do no storage I/O, and it is only written when
+modified or when its TTL needs extending. Expired sessions are swept every
+SWEEP_EVERY writes (redis expires them itself). regenerate() gives a session
+a new id (on login), so an id known before authentication stops working.
+"""
+import asyncio
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from config import (
+    SESSION_BACKEND,
+    SESSION_DB_PATH,
+    SESSION_DIR,
+    SESSION_REDIS_URL,
+    SESSION_TTL_SECONDS,
+)
+
+# Local backends sweep expired sessions every N writes
+SWEEP_EVERY = 500
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+
+class SQLiteSessionBackend:
+    """Session storage in a SQLite file"""
+    def __init__(self, path="sessions.db"):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.commit()
+
+    def _connection(self):
+        # sqlite3 connections can't be shared across threads or processes; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ex):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ex),
+        )
+        conn.commit()
+        if _due_for_sweep(self):
+            self.sweep()
+
+    def delete(self, key):
+        conn = self._connection()
+        conn.execute("DELETE FROM sessions WHERE id = ?", (key,))
+        conn.commit()
+
+    def sweep(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+
+
+class FileSessionBackend:
+    """Session storage as one file per session: an expiry line, then the data"""
+    def __init__(self, directory="flask_session"):
+        self.directory = directory
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                expires_at = float(f.readline())
+                if expires_at <= time.time():
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value, ex):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(f"{time.time() + ex:.0f}\n".encode() + value)
+        os.replace(tmp, path)
+        if _due_for_sweep(self):
+            self.sweep()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self):
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not _SESSION_ID.match(name):
+                continue
+            path = self._path(name)
+            try:
+                with open(path, "rb") as f:
+                    expired = float(f.readline()) <= now
+                if expired:
+                    os.remove(path)
+            except (OSError, ValueError):
+                continue
+
+
+def _due_for_sweep(backend):
+    with backend._writes_lock:
+        backend._writes += 1
+        return backend._writes % SWEEP_EVERY == 0
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that is read from the backend on first use"""
+    def __init__(self, store, sid=None):
+        def on_update(session):
+            session.modified = True
+        super().__init__(None, on_update)
+        self.store = store
+        self.sid = sid
+        self.loaded = False
+        self.stored_at = None
+        self.modified = False
+        self.accessed = False
+        # Id to delete when the session is saved under a new one
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Keep the data but issue a new session id when the session is saved"""
+        self.ensure_loaded()
+        if self.sid:
+            self.replaced_sid = self.sid
+            self.sid = None
+        self.modified = True
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        self.accessed = True
+        if self.sid:
+            stored_at, data = self.store.load(self.sid)
+            if data is None:
+                self.sid = None
+            else:
+                self.stored_at = stored_at
+                dict.update(self, data)
+
+
+def _lazy(name):
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.ensure_loaded()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ("__getitem__", "__setitem__", "__delitem__", "__contains__", "__iter__", "__len__",
+              "get", "keys", "values", "items", "setdefault", "pop", "popitem", "update", "clear", "copy"):
+    setattr(ServerSession, _name, _lazy(_name))
+
+
+class SessionStore:
+    """Loads and saves session data in a backend, with a sliding TTL"""
+    def __init__(self, backend, ttl_seconds=86400):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    def load(self, sid):
+        """(stored_at, data) of a session, or (None, None) if unknown or expired"""
+        try:
+            raw = self.backend.get(sid)
+        except Exception as e:
+            print(f"[SESSION] Could not load session: {e}")
+            return None, None
+        if raw is None:
+            return None, None
+        try:
+            stored_at, data = json.loads(raw)
+        except ValueError:
+            return None, None
+        return stored_at, data
+
+    def open(self, cookie_value):
+        sid = cookie_value if cookie_value and _SESSION_ID.match(cookie_value) else None
+        return ServerSession(self, sid)
+
+    def save(self, session):
+        """Persist the session; returns (cookie_value, delete_cookie)"""
+        if not session.loaded:
+            # Never touched during the request: nothing changed
+            return None, False
+        if session.replaced_sid:
+            self.backend.delete(session.replaced_sid)
+            session.replaced_sid = None
+        if not session:
+            if session.sid:
+                self.backend.delete(session.sid)
+                return None, True
+            return None, False
+        # Extend the TTL of sessions that are in use, at most every tenth of it
+        stale = session.stored_at is None or time.time() - session.stored_at > self.ttl_seconds / 10
+        if not (session.modified or stale):
+            return None, False
+        new = session.sid is None
+        if new:
+            session.sid = secrets.token_urlsafe(32)
+        payload = json.dumps([int(time.time()), dict(dict.items(session))],
+                             separators=(",", ":"), ensure_ascii=False)
+        self.backend.set(session.sid, payload.encode("utf-8"), ex=self.ttl_seconds)
+        return (session.sid if new else None), False
+
+
+def _cookie_kwargs(interface, app):
+    return {
+        "domain": interface.get_cookie_domain(app),
+        "path": interface.get_cookie_path(app),
+        "secure": interface.get_cookie_secure(app),
+        "samesite": interface.get_cookie_samesite(app),
+        "httponly": interface.get_cookie_httponly(app),
+    }
+
+
+def _apply_cookie(interface, app, session, response, cookie_value, delete_cookie):
+    name = interface.get_cookie_name(app)
+    if session.accessed:
+        response.vary.add("Cookie")
+    if delete_cookie:
+        response.delete_cookie(name, **_cookie_kwargs(interface, app))
+    elif cookie_value:
+        response.set_cookie(name, cookie_value, expires=interface.get_expiration_time(app, session),
+                            **_cookie_kwargs(interface, app))
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface storing session data in a SessionStore"""
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        return self.store.open(request.cookies.get(self.get_cookie_name(app)))
+
+    def save_session(self, app, session, response):
+        cookie_value, delete_cookie = self.store.save(session)
+        _apply_cookie(self, app, session, response, cookie_value, delete_cookie)
+
+
+def get_session_backend():
+    """Backend for SESSION_BACKEND, or None to keep cookie sessions"""
+    if SESSION_BACKEND == "cookie":
+        return None
+    if SESSION_BACKEND == "redis":
+        try:
+            import redis
+        except ImportError:
+            print("[SESSION] redis is not installed; falling back to SQLite sessions")
+        else:
+            return redis.Redis.from_url(SESSION_REDIS_URL)
+    if SESSION_BACKEND == "filesystem":
+        return FileSessionBackend(SESSION_DIR)
+    return SQLiteSessionBackend(SESSION_DB_PATH)
+
+
+def install(app):
+    """Use server-side sessions in a Flask app (unless SESSION_BACKEND=cookie)"""
+    backend = get_session_backend()
+    if backend is not None:
+        app.session_interface = ServerSessionInterface(SessionStore(backend, SESSION_TTL_SECONDS))
+
+
+async def aload(session):
+    """Read a server-side session in a thread, before a Quart handler uses it
+
+    Its first access would otherwise query the backend from the event loop.
+    Cookie sessions need no loading.
+    """
+    if isinstance(session, ServerSession) and not session.loaded:
+        await asyncio.to_thread(session.ensure_loaded)
+
+
+def install_async(app):
+    """Use server-side sessions in a Quart app (unless SESSION_BACKEND=cookie)"""
+    from quart.sessions import SessionInterface as AsyncSessionInterface
+
+    class AsyncServerSessionInterface(AsyncSessionInterface):
+        def __init__(self, store):
+            self.store = store
+
+        async def open_session(self, app, request):
+            return self.store.open(request.cookies.get(self.get_cookie_name(app)))
+
+        async def save_session(self, app, session, response):
+            if response is None:
+                return
+            # Backend I/O runs in a thread, off the event loop
+            cookie_value, delete_cookie = await asyncio.to_thread(self.store.save, session)
+            _apply_cookie(self, app, session, response, cookie_value, delete_cookie)
+
+    backend = get_session_backend()
+    if backend is not None:
+        app.session_interface = AsyncServerSessionInterface(SessionStore(backend, SESSION_TTL_SECONDS))
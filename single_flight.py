@@ -0,0 +1,584 @@
+"""
+Coalescing of identical in-flight first-turn LLM requests (single flight)
+
+When a link is shared, many visitors arrive at once with the same opener.
+The response cache only helps once the first answer is in; until then every
+visitor would start their own completion. SingleFlight sits in front of the
+LLM client: while a context-free question is being answered, identical
+questions (same normalized text, empty history) wait for that answer instead
+of calling the provider. Streaming callers all receive the same token stream
+as it arrives, whether the request that started it streams or not.
+
+Within a worker, requests share the flight through memory. With
+SINGLE_FLIGHT_LOCK_DIR set, workers on the same host coalesce too: the first
+worker holds an flock on <dir>/<key>.lock and appends the reply to
+<dir>/<key>.stream, which the other workers tail. If that worker dies or the
+reply takes longer than SINGLE_FLIGHT_WAIT_SECONDS, a waiting worker calls
+the LLM itself.
+
+Only requests with no history and no user context are coalesced (the same
+rule as the response cache), so one visitor's conversation never leaks into
+another's reply.
+"""
+import asyncio
+import codecs
+import hashlib
+import os
+import threading
+import time
+
+from config import (
+    SINGLE_FLIGHT_ENABLED,
+    SINGLE_FLIGHT_LOCK_DIR,
+    SINGLE_FLIGHT_WAIT_SECONDS,
+)
+from booking import is_booking_intent
+from metrics import SINGLE_FLIGHT
+from response_cache import normalize_question, prompt_hash
+from voice_bot import remember_turn
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing stays within one worker
+    fcntl = None
+
+# End of a reply in a .stream file: completed or failed
+_DONE = b"\x00"
+_FAILED = b"\x01"
+_POLL_SECONDS = 0.02
+
+
+class FlightFailed(RuntimeError):
+    """The request that was being waited on failed or timed out"""
+
+
+class _Flight:
+    """Chunks of one in-flight reply, readable by any number of threads"""
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        # The request that started the flight called the LLM itself
+        self.called = False
+        self._changed = threading.Condition()
+
+    def publish(self, chunk):
+        with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    def finish(self, error=None):
+        with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    def follow(self, timeout):
+        """Yield every chunk from the first one until the reply is complete"""
+        index = 0
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._changed:
+                ready = self._changed.wait_for(
+                    lambda: self.done or len(self.chunks) > index, deadline - time.monotonic())
+                if not ready:
+                    raise FlightFailed("Timed out waiting for an identical request")
+                new_chunks = self.chunks[index:]
+                done, error = self.done, self.error
+            index += len(new_chunks)
+            yield from new_chunks
+            if done:
+                if error is not None:
+                    raise FlightFailed(f"Identical request failed: {error}")
+                return
+
+    def result(self, timeout):
+        return "".join(self.follow(timeout))
+
+
+class _AsyncFlight:
+    """_Flight for one event loop"""
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.called = False
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def follow(self, timeout):
+        index = 0
+        deadline = time.monotonic() + timeout
+        while True:
+            while not self.done and len(self.chunks) <= index:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    raise FlightFailed("Timed out waiting for an identical request") from None
+            new_chunks = self.chunks[index:]
+            index += len(new_chunks)
+            for chunk in new_chunks:
+                yield chunk
+            if self.done and index == len(self.chunks):
+                if self.error is not None:
+                    raise FlightFailed(f"Identical request failed: {self.error}")
+                return
+
+
+class FileFlight:
+    """One reply shared between worker processes through a lock file and a stream file
+
+    The worker holding the lock writes the reply to a fresh .stream file
+    (replaced atomically, so readers never see a previous reply being
+    overwritten) and removes it and the lock file once finished; readers
+    keep their open handle.
+    """
+    def __init__(self, lock_dir, key):
+        self.lock_path = os.path.join(lock_dir, f"{key}.lock")
+        self.stream_path = os.path.join(lock_dir, f"{key}.stream")
+        self._lock_fd = None
+        self._stream = None
+        self._reader = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def try_lead(self):
+        """Take the flight (True), or False if another worker is answering"""
+        while True:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            if self._is_current(fd):
+                break
+            # The previous leader removed this lock file after we opened it
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._lock_fd = fd
+        partial_path = f"{self.stream_path}.{os.getpid()}"
+        self._stream = open(partial_path, "wb")
+        os.replace(partial_path, self.stream_path)
+        return True
+
+    def _is_current(self, fd):
+        """True if fd is still the file at lock_path"""
+        try:
+            return os.fstat(fd).st_ino == os.stat(self.lock_path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def write(self, chunk):
+        # The end markers never occur in model output; drop them just in case
+        self._stream.write(chunk.encode("utf-8").replace(_DONE, b"").replace(_FAILED, b""))
+        self._stream.flush()
+
+    def release(self, ok):
+        try:
+            self._stream.write(_DONE if ok else _FAILED)
+            self._stream.close()
+            os.unlink(self.stream_path)
+        except OSError:
+            pass
+        finally:
+            # Remove the lock file while still holding it, so lock files don't
+            # pile up one per question; a worker that opened it meanwhile sees
+            # it is stale in try_lead and locks a fresh one
+            try:
+                os.unlink(self.lock_path)
+            except OSError:
+                pass
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+
+    def open(self):
+        """Start reading the other worker's reply (False if it just finished)"""
+        try:
+            self._reader = open(self.stream_path, "rb")
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _leader_alive(self):
+        try:
+            fd = os.open(self.lock_path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def poll(self):
+        """(new text, finished) without blocking; raises FlightFailed"""
+        data = self._reader.read()
+        end = min((i for i in (data.find(_DONE), data.find(_FAILED)) if i >= 0), default=-1)
+        if end >= 0:
+            text = self._decoder.decode(data[:end], final=True)
+            self._reader.close()
+            if data[end:end + 1] == _FAILED:
+                raise FlightFailed("Identical request failed in another worker")
+            return text, True
+        if not data and not self._leader_alive():
+            # Lock released without an end marker: that worker died mid-reply.
+            # Read once more in case the marker landed after the first read
+            data = self._reader.read()
+            if not data:
+                self._reader.close()
+                raise FlightFailed("Worker answering an identical request exited")
+            return self._decoder.decode(data), False
+        return self._decoder.decode(data), False
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+
+
+class SingleFlight:
+    """Front of an LLM client that shares in-flight replies between identical requests
+
+    Mirrors the client's get_response / stream_response / aget_response /
+    astream_response; requests that may not be coalesced go straight through.
+    """
+    def __init__(self, client, model, lock_dir="", wait_seconds=60, enabled=True):
+        self.client = client
+        self.model = model
+        self.lock_dir = lock_dir if fcntl is not None else ""
+        self.wait_seconds = wait_seconds
+        self.enabled = enabled
+        self._prompt_hash = prompt_hash()
+        self._flights = {}
+        self._async_flights = {}
+        # Pump tasks, referenced until done so they aren't garbage collected
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.worker_followers = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def key_for(self, question, history, user_context=None):
+        """Flight key, or None if the request must be answered on its own"""
+        if not self.enabled or history or user_context or is_booking_intent(question):
+            return None
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        raw_key = f"{self.model}\x00{self._prompt_hash}\x00{normalized}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()[:32]
+
+    def _count(self, role):
+        with self._lock:
+            setattr(self, role, getattr(self, role) + 1)
+        SINGLE_FLIGHT.inc(role=role[:-1])
+
+    def _join(self, key, flights, new_flight):
+        """(flight, is_leader) for key"""
+        with self._lock:
+            flight = flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = flights[key] = new_flight()
+            return flight, True
+
+    def _leave(self, key, flights, flight):
+        with self._lock:
+            if flights.get(key) is flight:
+                del flights[key]
+
+    def _remember(self, history, question, answer):
+        # The LLM client records the turn for the request that called it;
+        # everyone else records the shared answer themselves
+        if answer and history is not None:
+            remember_turn(history, question, answer)
+
+    # Blocking
+
+    def get_response(self, question, history=None, user_context=None):
+        key = self.key_for(question, history, user_context)
+        if key is None:
+            return self.client.get_response(question, history, user_context)
+        flight, leader = self._join(key, self._flights, _Flight)
+        if not leader:
+            self._count("followers")
+            try:
+                answer = flight.result(self.wait_seconds)
+            except FlightFailed as e:
+                print(f"[SINGLE-FLIGHT] {e}; calling the LLM")
+                return self.client.get_response(question, history, user_context)
+            self._remember(history, question, answer)
+            return answer
+        try:
+            for chunk in self._source(key, flight, question, history, user_context, stream=False):
+                flight.publish(chunk)
+            flight.finish()
+        except BaseException as e:
+            flight.finish(e)
+            raise
+        finally:
+            self._leave(key, self._flights, flight)
+        answer = "".join(flight.chunks)
+        if not flight.called:
+            self._remember(history, question, answer)
+        return answer
+
+    def stream_response(self, question, history=None, user_context=None):
+        key = self.key_for(question, history, user_context)
+        if key is None:
+            return self.client.stream_response(question, history, user_context)
+        flight, leader = self._join(key, self._flights, _Flight)
+        if leader:
+            # The reply is pumped by a thread, so waiting requests keep
+            # receiving it even if the visitor who asked first disconnects
+            threading.Thread(
+                target=self._pump, args=(key, flight, question, history, user_context),
+                name="single-flight", daemon=True,
+            ).start()
+        else:
+            self._count("followers")
+        return self._follow(flight, leader, question, history, user_context)
+
+    def _pump(self, key, flight, question, history, user_context):
+        try:
+            for chunk in self._source(key, flight, question, history, user_context, stream=True):
+                flight.publish(chunk)
+            flight.finish()
+        except Exception as e:
+            flight.finish(e)
+        finally:
+            self._leave(key, self._flights, flight)
+
+    def _follow(self, flight, leader, question, history, user_context):
+        sent = False
+        try:
+            for chunk in flight.follow(self.wait_seconds):
+                sent = True
+                yield chunk
+        except FlightFailed as e:
+            if sent or leader:
+                raise
+            # Nothing shown to the visitor yet: answer this request on its own
+            print(f"[SINGLE-FLIGHT] {e}; calling the LLM")
+            yield from self.client.stream_response(question, history, user_context)
+            return
+        if not (leader and flight.called):
+            self._remember(history, question, "".join(flight.chunks))
+
+    def _source(self, key, flight, question, history, user_context, stream):
+        """Chunks of the reply for a flight's first request in this worker"""
+        file_flight = FileFlight(self.lock_dir, key) if self.lock_dir else None
+        give_up_at = time.monotonic() + self.wait_seconds
+        while file_flight is not None:
+            if file_flight.try_lead():
+                break
+            if not file_flight.open():
+                # The other worker is between taking the lock and creating its
+                # stream, or just finished: try again shortly
+                if time.monotonic() > give_up_at:
+                    print("[SINGLE-FLIGHT] Another worker holds the flight but has no reply; calling the LLM")
+                    file_flight = None
+                    break
+                time.sleep(_POLL_SECONDS)
+                continue
+            self._count("worker_followers")
+            sent = False
+            deadline = time.monotonic() + self.wait_seconds
+            try:
+                while True:
+                    text, finished = file_flight.poll()
+                    if text:
+                        sent = True
+                        yield text
+                    if finished:
+                        return
+                    if time.monotonic() > deadline:
+                        raise FlightFailed("Timed out waiting for another worker")
+                    if not text:
+                        time.sleep(_POLL_SECONDS)
+            except FlightFailed as e:
+                file_flight.close()
+                if sent:
+                    raise
+                print(f"[SINGLE-FLIGHT] {e}; calling the LLM")
+                file_flight = None
+        self._count("leaders")
+        flight.called = True
+        ok = False
+        try:
+            if stream:
+                for chunk in self.client.stream_response(question, history, user_context):
+                    if file_flight is not None:
+                        file_flight.write(chunk)
+                    yield chunk
+                ok = True
+            else:
+                answer = self.client.get_response(question, history, user_context)
+                if answer:
+                    if file_flight is not None:
+                        file_flight.write(answer)
+                    yield answer
+                ok = bool(answer)
+        finally:
+            if file_flight is not None:
+                file_flight.release(ok)
+
+    # Async (one event loop per worker)
+
+    async def aget_response(self, question, history=None, user_context=None):
+        key = self.key_for(question, history, user_context)
+        if key is None:
+            return await self.client.aget_response(question, history, user_context)
+        flight, leader = self._join(key, self._async_flights, _AsyncFlight)
+        if leader:
+            # A task, so a disconnecting first visitor doesn't cancel everyone's reply
+            self._start_task(self._apump(key, flight, question, history, user_context, stream=False))
+        else:
+            self._count("followers")
+        parts = []
+        try:
+            async for chunk in flight.follow(self.wait_seconds):
+                parts.append(chunk)
+        except FlightFailed as e:
+            if leader:
+                raise
+            print(f"[SINGLE-FLIGHT] {e}; calling the LLM")
+            return await self.client.aget_response(question, history, user_context)
+        answer = "".join(parts)
+        if not (leader and flight.called):
+            self._remember(history, question, answer)
+        return answer
+
+    async def astream_response(self, question, history=None, user_context=None):
+        key = self.key_for(question, history, user_context)
+        if key is None:
+            async for chunk in self.client.astream_response(question, history, user_context):
+                yield chunk
+            return
+        flight, leader = self._join(key, self._async_flights, _AsyncFlight)
+        if leader:
+            self._start_task(self._apump(key, flight, question, history, user_context, stream=True))
+        else:
+            self._count("followers")
+        sent = False
+        try:
+            async for chunk in flight.follow(self.wait_seconds):
+                sent = True
+                yield chunk
+        except FlightFailed as e:
+            if sent or leader:
+                raise
+            print(f"[SINGLE-FLIGHT] {e}; calling the LLM")
+            async for chunk in self.client.astream_response(question, history, user_context):
+                yield chunk
+            return
+        if not (leader and flight.called):
+            self._remember(history, question, "".join(flight.chunks))
+
+    def _start_task(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _apump(self, key, flight, question, history, user_context, stream):
+        try:
+            async for chunk in self._asource(key, flight, question, history, user_context, stream):
+                flight.publish(chunk)
+            flight.finish()
+        except Exception as e:
+            flight.finish(e)
+        finally:
+            self._leave(key, self._async_flights, flight)
+
+    async def _asource(self, key, flight, question, history, user_context, stream):
+        file_flight = FileFlight(self.lock_dir, key) if self.lock_dir else None
+        give_up_at = time.monotonic() + self.wait_seconds
+        while file_flight is not None:
+            if file_flight.try_lead():
+                break
+            if not file_flight.open():
+                if time.monotonic() > give_up_at:
+                    print("[SINGLE-FLIGHT] Another worker holds the flight but has no reply; calling the LLM")
+                    file_flight = None
+                    break
+                await asyncio.sleep(_POLL_SECONDS)
+                continue
+            self._count("worker_followers")
+            sent = False
+            deadline = time.monotonic() + self.wait_seconds
+            try:
+                while True:
+                    text, finished = file_flight.poll()
+                    if text:
+                        sent = True
+                        yield text
+                    if finished:
+                        return
+                    if time.monotonic() > deadline:
+                        raise FlightFailed("Timed out waiting for another worker")
+                    if not text:
+                        await asyncio.sleep(_POLL_SECONDS)
+            except FlightFailed as e:
+                file_flight.close()
+                if sent:
+                    raise
+                print(f"[SINGLE-FLIGHT] {e}; calling the LLM")
+                file_flight = None
+        self._count("leaders")
+        flight.called = True
+        ok = False
+        try:
+            if stream:
+                async for chunk in self.client.astream_response(question, history, user_context):
+                    if file_flight is not None:
+                        file_flight.write(chunk)
+                    yield chunk
+                ok = True
+            else:
+                answer = await self.client.aget_response(question, history, user_context)
+                if answer:
+                    if file_flight is not None:
+                        file_flight.write(answer)
+                    yield answer
+                ok = bool(answer)
+        finally:
+            if file_flight is not None:
+                file_flight.release(ok)
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        return {
+            "enabled": self.enabled,
+            "cross_worker": bool(self.lock_dir),
+            "in_flight": len(self._flights) + len(self._async_flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "worker_followers": self.worker_followers,
+        }
+
+
+def get_single_flight(llm_client):
+    """Put request coalescing in front of the configured LLM client"""
+    model = f"{type(llm_client).__name__}:{getattr(llm_client, 'model', '')}"
+    return SingleFlight(
+        llm_client,
+        model,
+        lock_dir=SINGLE_FLIGHT_LOCK_DIR,
+        wait_seconds=SINGLE_FLIGHT_WAIT_SECONDS,
+        enabled=SINGLE_FLIGHT_ENABLED,
+    )
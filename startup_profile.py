@@ -0,0 +1,181 @@
+"""
+Startup profile of the web app: python app.py --profile-startup
+
+Starts a fresh interpreter with -X importtime that imports the app, answers
+a first request through the test client, then runs the background warm-up.
+Reports:
+
+- interpreter start to first response (time to first request), split into
+  interpreter startup, importing the app and serving the request
+- how long the warm-up takes (work kept off the first request)
+- the slowest imports, grouped by top-level package, and the app's own modules
+
+--max-import-ms fails (exit code 1) when importing the app takes longer, so
+an import regression can fail a CI job:
+
+    python app.py --profile-startup --max-import-ms 1500
+    python app.py --profile-startup --async --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+_MARKER = "[STARTUP-PROFILE]"
+_WARM_UP_MARKER = "[STARTUP-PROFILE] warm-up"
+
+# Runs in the profiled interpreter; the markers split the -X importtime output
+# into interpreter startup, the app's imports and the warm-up's imports
+_CHILD = """
+import json, sys, time
+started_at = time.time()
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+import_started = time.perf_counter()
+import {module} as served
+import_s = time.perf_counter() - import_started
+request_started = time.perf_counter()
+{request}
+request_s = time.perf_counter() - request_started
+first_response_at = time.time()
+sys.stderr.write({warm_up_marker!r} + "\\n")
+sys.stderr.flush()
+import chat_service
+warm_up_started = time.perf_counter()
+chat_service.warm_up()
+warm_up_s = time.perf_counter() - warm_up_started
+print({marker!r} + json.dumps({{
+    "started_at": started_at, "first_response_at": first_response_at,
+    "import_s": import_s, "first_request_s": request_s, "warm_up_s": warm_up_s,
+    "status": status,
+}}))
+"""
+_FLASK_REQUEST = "status = served.app.test_client().get('/api/health').status_code"
+_QUART_REQUEST = """import asyncio
+async def first_request():
+    return (await served.app.test_client().get('/api/health')).status_code
+status = asyncio.run(first_request())"""
+
+
+def parse_importtime(stderr, start=_MARKER, end=_WARM_UP_MARKER):
+    """(module, depth, self_us, cumulative_us) of each import between two marker lines"""
+    imports = []
+    inside = False
+    for line in stderr.splitlines():
+        if line.strip() in (start, end):
+            inside = line.strip() == start
+            continue
+        if not inside or not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        imports.append((stripped, depth, int(fields[0]), int(fields[1])))
+    return imports
+
+
+def summarize(imports, top=15):
+    packages = {}
+    for name, _, self_us, _ in imports:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    local = {
+        os.path.splitext(filename)[0]
+        for filename in os.listdir(ROOT) if filename.endswith(".py")
+    }
+    return {
+        "imports": len(imports),
+        "packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        },
+        # Cumulative: each of the app's modules including what it imports
+        "app_modules_ms": {
+            name: round(cumulative / 1000, 1)
+            for name, _, _, cumulative in sorted(imports, key=lambda item: -item[3])
+            if name in local
+        },
+    }
+
+
+def profile(use_async=False, env=None):
+    """Profile report for app.py (or async_app.py with use_async)"""
+    code = _CHILD.format(
+        marker=_MARKER,
+        warm_up_marker=_WARM_UP_MARKER,
+        module="async_app" if use_async else "app",
+        request=_QUART_REQUEST if use_async else _FLASK_REQUEST,
+    )
+    launched_at = time.time()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300,
+    )
+    timings = None
+    for line in result.stdout.splitlines():
+        if line.startswith(_MARKER):
+            timings = json.loads(line[len(_MARKER):])
+    if result.returncode != 0 or timings is None:
+        raise RuntimeError(f"Profiled app failed to start:\n{result.stderr[-2000:]}")
+    return {
+        "app": "async_app" if use_async else "app",
+        "status": timings["status"],
+        "time_to_first_request_ms": round((timings["first_response_at"] - launched_at) * 1000, 1),
+        "interpreter_ms": round((timings["started_at"] - launched_at) * 1000, 1),
+        "import_ms": round(timings["import_s"] * 1000, 1),
+        "first_request_ms": round(timings["first_request_s"] * 1000, 1),
+        "warm_up_ms": round(timings["warm_up_s"] * 1000, 1),
+        **summarize(parse_importtime(result.stderr)),
+        "warm_up_packages_ms": summarize(
+            parse_importtime(result.stderr, start=_WARM_UP_MARKER, end=None), top=5)["packages_ms"],
+    }
+
+
+def print_report(report):
+    print(f"Startup profile of {report['app']}.py")
+    print(f"  time to first request  {report['time_to_first_request_ms']:>8.1f} ms"
+          f"  (HTTP {report['status']})")
+    print(f"    interpreter          {report['interpreter_ms']:>8.1f} ms")
+    print(f"    import app           {report['import_ms']:>8.1f} ms  ({report['imports']} modules)")
+    print(f"    first request        {report['first_request_ms']:>8.1f} ms")
+    print(f"  background warm-up     {report['warm_up_ms']:>8.1f} ms")
+    print("  slowest packages (own import time):")
+    for name, ms in report["packages_ms"].items():
+        print(f"    {name:<28} {ms:>8.1f} ms")
+    print("  app modules (including their imports):")
+    for name, ms in report["app_modules_ms"].items():
+        print(f"    {name:<28} {ms:>8.1f} ms")
+    print("  loaded by the warm-up:")
+    for name, ms in report["warm_up_packages_ms"].items():
+        print(f"    {name:<28} {ms:>8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py --profile-startup",
+                                     description="Import-time and time-to-first-request profile")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="profile async_app.py")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="exit with status 1 if importing the app takes longer")
+    args = parser.parse_args(argv)
+
+    report = profile(args.use_async)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if args.max_import_ms is not None and report["import_ms"] > args.max_import_ms:
+        print(f"[STARTUP] Importing the app took {report['import_ms']} ms, over the "
+              f"{args.max_import_ms} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -83,19 +83,39 @@ async function resetConversation() {
 	if (tc) tc.click();
 }
 
+// Animated WebP is a fraction of the GIF's size; the GIF stays as the fallback
+const supportsWebp = (() => {
+	try {
+		return document.createElement('canvas').toDataURL('image/webp').startsWith('data:image/webp');
+	} catch (e) {
+		return false;
+	}
+})();
+
+function voiceSource(imgEl, kind) {
+	const webp = supportsWebp ? imgEl.getAttribute(`data-${kind}-webp`) : '';
+	return webp || imgEl.getAttribute(`data-${kind}`);
+}
+
 function preloadVoiceGifs() {
 	const imgEl = document.getElementById('voice-gif');
 	if (!imgEl) return;
-	const mp = imgEl.getAttribute('data-mp');
-	const sp = imgEl.getAttribute('data-sp');
-	if (mp) {
-		const i1 = new Image();
-		i1.src = mp;
-	}
-	if (sp) {
-		const i2 = new Image();
-		i2.src = sp;
-	}
+	const mp = voiceSource(imgEl, 'mp');
+	const sp = voiceSource(imgEl, 'sp');
+	// Built assets are cached for a year, so this only downloads on the first visit;
+	// wait until the page is idle so it never competes with the page itself
+	const preload = () => {
+		if (mp) {
+			const i1 = new Image();
+			i1.src = mp;
+		}
+		if (sp) {
+			const i2 = new Image();
+			i2.src = sp;
+		}
+	};
+	if ('requestIdleCallback' in window) requestIdleCallback(preload);
+	else setTimeout(preload, 1000);
 	// Prevent drag/select artifacts
 	imgEl.draggable = false;
 }
@@ -105,8 +125,8 @@ async function updateAnimation(state) {
 	const img = document.getElementById('voice-gif');
 	const vb = document.getElementById('voice-btn');
 	if (!img) return;
-	const mp = img.getAttribute('data-mp');
-	const sp = img.getAttribute('data-sp');
+	const mp = voiceSource(img, 'mp');
+	const sp = voiceSource(img, 'sp');
 	switch(state) {
 		case 'listening':
 			if (mp && img.src !== mp) img.src = mp;
@@ -196,7 +216,7 @@ function initSpeechRecognition() {
             if (!voiceSessionActive || !isSpeaking) {
                 updateAnimation('idle');
             }
-            // Note: Restarting listening is now handled in speakText's utterance.onend
+            // Note: Restarting listening is now handled in finishSpeaking
             // to ensure it only happens after bot finishes speaking
         };
     } else {
@@ -233,34 +253,179 @@ async function sendMessage(message) {
 	const loadingId = null;
     
     try {
-        const response = await fetch('/api/chat', {
+        const response = await fetch('/api/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({ question: message })
         });
-        
-        const data = await response.json();
-        
-        if (data.success) {
-			// Always append assistant message to chat
-			addMessage(data.response, 'bot');
-            speakText(data.response);
-        } else {
-			addMessage('Sorry, I encountered an error. Please try again.', 'bot');
+
+        // Older browsers without streaming bodies use the blocking endpoint
+        if (!response.ok || !response.body || !response.body.getReader) {
+            await sendMessageBlocking(message);
+            return;
         }
+
+        await readChatStream(response);
     } catch (error) {
         console.error('Error:', error);
 		addMessage('Sorry, I encountered an error. Please try again.', 'bot');
     }
 }
 
+// Non-streaming fallback: wait for the whole reply, then show and speak it
+async function sendMessageBlocking(message) {
+    const response = await fetch('/api/chat', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ question: message })
+    });
+    
+    const data = await response.json();
+    
+    if (data.success) {
+		// Always append assistant message to chat
+		addMessage(data.response, 'bot');
+        speakText(data.response);
+		handleBooking(data.booking);
+    } else {
+		addMessage('Sorry, I encountered an error. Please try again.', 'bot');
+    }
+}
+
+// Read Server-Sent Events from /api/chat/stream, rendering and speaking the
+// reply sentence by sentence as it arrives
+async function readChatStream(response) {
+	const reader = response.body.getReader();
+	const decoder = new TextDecoder();
+	const messageId = addMessage('', 'bot');
+	const contentEl = document.querySelector(`#${messageId} .message-content`);
+	const messagesContainer = document.getElementById('chat-messages');
+	let buffer = '';
+	let replyText = '';
+	let spokenUpTo = 0;
+	let finished = false;
+
+	beginStreamedSpeech();
+
+	const handleEvent = (eventName, data) => {
+		if (eventName === 'done') {
+			finished = true;
+			// Final text has the booking marker stripped and is authoritative
+			if (contentEl) contentEl.textContent = data.response;
+			// spokenUpTo counts characters of replyText, which can differ from the
+			// final text (trimmed whitespace), so skip what was spoken by content
+			const finalText = data.response.trimStart();
+			const spoken = replyText.slice(0, spokenUpTo).trim();
+			const rest = (finalText.startsWith(spoken)
+				? finalText.slice(spoken.length)
+				: replyText.slice(spokenUpTo)).trim();
+			if (rest) queueSpeech(rest);
+			handleBooking(data.booking);
+			return;
+		}
+		if (eventName === 'error') {
+			finished = true;
+			if (contentEl) contentEl.textContent = 'Sorry, I encountered an error. Please try again.';
+			return;
+		}
+		if (data.delta) {
+			replyText += data.delta;
+			if (contentEl) contentEl.textContent = replyText;
+			if (messagesContainer) messagesContainer.scrollTop = messagesContainer.scrollHeight;
+			// Speak every complete sentence as soon as it is available
+			const boundary = lastSentenceBoundary(replyText, spokenUpTo);
+			if (boundary > spokenUpTo) {
+				queueSpeech(replyText.slice(spokenUpTo, boundary));
+				spokenUpTo = boundary;
+			}
+		}
+	};
+
+	try {
+		while (!finished) {
+			const { value, done } = await reader.read();
+			if (done) break;
+			buffer += decoder.decode(value, { stream: true });
+			let sep;
+			while ((sep = buffer.indexOf('\n\n')) !== -1) {
+				const rawEvent = buffer.slice(0, sep);
+				buffer = buffer.slice(sep + 2);
+				let eventName = 'message';
+				let dataLine = '';
+				for (const line of rawEvent.split('\n')) {
+					if (line.startsWith('event:')) eventName = line.slice(6).trim();
+					else if (line.startsWith('data:')) dataLine += line.slice(5).trim();
+				}
+				if (dataLine) handleEvent(eventName, JSON.parse(dataLine));
+			}
+		}
+		if (!finished) {
+			// Stream ended without a final event
+			const rest = replyText.slice(spokenUpTo).trim();
+			if (rest) queueSpeech(rest);
+		}
+	} finally {
+		endStreamedSpeech();
+	}
+}
+
+// Follow up on a booking the reply confirmed: the server rejects details that
+// don't validate, otherwise the invite is being delivered in the background
+function handleBooking(booking) {
+	if (!booking) return;
+	if (booking.status === 'invalid') {
+		addMessage("Sorry, I couldn't book that meeting: some details didn't check out. Could you confirm the date, time and your timezone?", 'bot');
+	} else if (booking.id) {
+		pollBookingStatus(booking.id);
+	}
+}
+
+// Bookings are sent to the calendar workflow in the background; check on
+// them until delivered and tell the user if the invite could not be sent
+async function pollBookingStatus(bookingId, attempt = 0) {
+	if (attempt >= 40) return;
+	try {
+		const response = await fetch(`/api/booking/${encodeURIComponent(bookingId)}`);
+		const data = await response.json();
+		if (data.success && data.booking) {
+			if (data.booking.status === 'sent') {
+				console.log('Booking delivered:', bookingId);
+				return;
+			}
+			if (data.booking.status === 'failed') {
+				addMessage("I couldn't send the calendar invite for that meeting. Please try booking again in a little while.", 'bot');
+				return;
+			}
+		}
+	} catch (e) {
+		console.warn('Booking status check failed:', e);
+	}
+	// Back off gradually: 2s, 3s, 4s ... capped at 15s
+	setTimeout(() => pollBookingStatus(bookingId, attempt + 1), Math.min(2000 + attempt * 1000, 15000));
+}
+
+// Index just past the last complete sentence in text (after position from)
+function lastSentenceBoundary(text, from) {
+	const re = /[.!?]+["')\]]*\s+/g;
+	re.lastIndex = from;
+	let boundary = from;
+	let match;
+	while ((match = re.exec(text)) !== null) {
+		boundary = match.index + match[0].length;
+	}
+	return boundary;
+}
+
 // Add message to chat
+let messageCounter = 0; // Keeps ids unique for messages added in the same millisecond
 function addMessage(text, type, isLoading = false) {
     const messagesContainer = document.getElementById('chat-messages');
     const messageDiv = document.createElement('div');
-    const messageId = 'msg-' + Date.now();
+    const messageId = 'msg-' + Date.now() + '-' + (++messageCounter);
     messageDiv.id = messageId;
     messageDiv.className = `message ${type}-message`;
     
@@ -306,13 +471,24 @@ function primeTTS() {
     }
 }
 
+// Speech is queued per sentence; these track the reply currently being spoken
+let speechGeneration = 0; // Bumped per reply so stale utterance callbacks are ignored
+let pendingUtterances = 0;
+let speechQueueOpen = false; // True while more sentences may still arrive
+
 // Speak text using Web Speech API
 function speakText(text) {
-    if (!synth) return;
-	if (isMuted) {
-		updateAnimation('idle');
-		return;
-	}
+	beginStreamedSpeech();
+	queueSpeech(text);
+	endStreamedSpeech();
+}
+
+// Prepare to speak a reply that arrives in pieces
+function beginStreamedSpeech() {
+    speechGeneration += 1;
+    pendingUtterances = 0;
+    speechQueueOpen = true;
+    if (!synth || isMuted) return;
     
     // Prime TTS if not already done (for mobile browsers)
     if (!ttsPrimed) {
@@ -331,9 +507,15 @@ function speakText(text) {
             console.warn('Error stopping recognition before speak:', e);
         }
     }
+}
+
+// Queue one piece (usually a sentence) of the current reply for speaking
+function queueSpeech(text) {
+    if (!synth || isMuted) return;
 
 	// Clean markdown/symbols before speaking to avoid reading asterisks etc.
 	const spokenText = sanitizeForSpeech(text);
+	if (!spokenText) return;
     
     updateAnimation('speaking');
     isSpeaking = true;
@@ -354,54 +536,57 @@ function speakText(text) {
         const englishVoice = voices.find(v => /en/i.test(v.lang)) || voices[0];
         utterance.voice = englishVoice;
     }
-    
-    utterance.onend = () => {
-        isSpeaking = false;
-		if (nextBtn) nextBtn.style.display = 'none';
 
-        // In live session mode, go back to listening automatically
+    const generation = speechGeneration;
+    pendingUtterances += 1;
+    utterance.onend = () => {
+        if (generation !== speechGeneration) return;
+        pendingUtterances -= 1;
         // Use a longer delay to ensure bot's speech is fully finished and not picked up
-        if (voiceSessionActive && recognition && !isListening) {
-            try {
-                setTimeout(() => {
-                    // Double-check we're still in active session and not speaking before restarting
-                    if (!isListening && voiceSessionActive && !isSpeaking) {
-                        try { 
-                            recognition.start(); 
-                        } catch (e) { 
-                            console.warn('re-start listen after speak failed:', e); 
-                        }
-                    }
-                }, 1000); // Increased delay from 250ms to 1000ms to prevent feedback loop
-            } catch (e) {
-                console.warn('Error restarting recognition after speak:', e);
-            }
-        } else {
-            updateAnimation('idle');
-        }
+        if (pendingUtterances === 0 && !speechQueueOpen) finishSpeaking(1000);
     };
-    
     utterance.onerror = () => {
-        isSpeaking = false;
-		if (nextBtn) nextBtn.style.display = 'none';
-        if (voiceSessionActive && recognition && !isListening) {
-            try {
-                setTimeout(() => {
-                    if (!isListening && voiceSessionActive) {
-                        try { recognition.start(); } catch (e) { console.warn('re-start listen after error failed:', e); }
-                    }
-                }, 250);
-            } catch (e) {
-                console.warn('Error restarting recognition after error:', e);
-            }
-        } else {
-            updateAnimation('idle');
-        }
+        if (generation !== speechGeneration) return;
+        pendingUtterances -= 1;
+        if (pendingUtterances === 0 && !speechQueueOpen) finishSpeaking(250);
     };
     
     synth.speak(utterance);
 }
 
+// No more pieces will arrive for the current reply
+function endStreamedSpeech() {
+    speechQueueOpen = false;
+    if (pendingUtterances === 0) finishSpeaking(250);
+}
+
+// Called once the whole reply has been spoken (or nothing was spoken)
+function finishSpeaking(restartDelay) {
+    isSpeaking = false;
+	const nextBtn = document.getElementById('next-btn');
+	if (nextBtn) nextBtn.style.display = 'none';
+
+    // In live session mode, go back to listening automatically
+    if (voiceSessionActive && recognition && !isListening) {
+        try {
+            setTimeout(() => {
+                // Double-check we're still in active session and not speaking before restarting
+                if (!isListening && voiceSessionActive && !isSpeaking) {
+                    try { 
+                        recognition.start(); 
+                    } catch (e) { 
+                        console.warn('re-start listen after speak failed:', e); 
+                    }
+                }
+            }, restartDelay);
+        } catch (e) {
+            console.warn('Error restarting recognition after speak:', e);
+        }
+    } else {
+        updateAnimation('idle');
+    }
+}
+
 // Remove basic markdown/markup so TTS doesn't speak symbols like * or `
 function sanitizeForSpeech(input) {
 	if (!input) return "";
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py reads the environment at import: keep the tests offline and their files out of the tree
+_state_dir = tempfile.mkdtemp(prefix="voicebot-tests-")
+for name, value in {
+    "GROQ_API_KEY": "",
+    "OPENAI_API_KEY": "",
+    "N8N_WEBHOOK_URL": "",
+    "CONVERSATION_DB_PATH": os.path.join(_state_dir, "conversations.db"),
+    "SESSION_DB_PATH": os.path.join(_state_dir, "sessions.db"),
+    "SESSION_DIR": os.path.join(_state_dir, "sessions"),
+    "BOOKING_DB_PATH": os.path.join(_state_dir, "bookings.db"),
+    "SEMANTIC_CACHE_PATH": "",
+    "FAQ_INDEX_PATH": "",
+    "FAQ_JOURNAL_PATH": os.path.join(_state_dir, "faq_answers.jsonl"),
+    "GREETING_POOL_PATH": os.path.join(_state_dir, "greetings.json"),
+    "TTS_CACHE_DIR": os.path.join(_state_dir, "tts_cache"),
+    "METRICS_DIR": "",
+}.items():
+    os.environ[name] = value
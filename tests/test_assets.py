@@ -0,0 +1,29 @@
+import os
+
+import assets
+
+
+def test_build_dir_is_anchored_to_the_project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert os.path.isabs(assets.BUILD_DIR)
+    assert assets.BUILD_DIR.startswith(assets.BASE_DIR)
+    assert assets.AssetManifest().directory == assets.BUILD_DIR
+
+
+def test_built_assets_are_fingerprinted_and_revalidated(tmp_path, monkeypatch):
+    source = tmp_path / "static"
+    source.mkdir()
+    (source / "style.css").write_text("body { color: red; }\n" * 50)
+    manifest = assets.build(str(source), str(tmp_path / "dist"))
+    built = manifest["style.css"]["file"]
+    assert built.startswith("style.") and built.endswith(".css") and "gz" in manifest["style.css"]
+
+    monkeypatch.setattr(assets, "asset_manifest", assets.AssetManifest(str(tmp_path / "dist")))
+    assert assets.asset_url("style.css") == f"/assets/{built}"
+    assert assets.asset_url("missing.css") == "/static/missing.css"
+    assert assets.webp_url("style.css") == ""
+
+    status, path, headers = assets.resolve_asset(built, accept_encoding="gzip")
+    assert status == 200 and path.endswith(".gz") and headers["Content-Encoding"] == "gzip"
+    assert assets.resolve_asset(built, "gzip", if_none_match=headers["ETag"])[0] == 304
+    assert assets.resolve_asset("style.0000000000.css") is None
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from booking import (
+    BOOKING_MARKER,
+    BookingError,
+    BookingExtractor,
+    parse_booking_marker,
+    resolve_timezone,
+    validate_booking,
+)
+
+PAYLOAD = {"name": "Ada", "email": "ada@example.com", "start": "2026-11-02 15:00",
+           "timezone": "IST", "notes": "Intro {call}"}
+REPLY = f"Great, you're booked for Monday at 3pm!\n{BOOKING_MARKER} {json.dumps(PAYLOAD)}\n"
+
+
+@pytest.mark.parametrize("value, zone", [
+    ("IST", "Asia/Kolkata"),
+    ("pst", "America/Los_Angeles"),
+    ("europe/berlin", "Europe/Berlin"),
+    ("new york", "America/New_York"),
+    ("GMT+2", "Etc/GMT-2"),
+    ("UTC-5", "Etc/GMT+5"),
+    ("UTC+0", "UTC"),
+    ("UTC+05:30", "UTC+05:30"),
+    ("GMT+05:30", "UTC+05:30"),
+    ("+05:30", "UTC+05:30"),
+    ("+0530", "UTC+05:30"),
+    ("GMT-3", "Etc/GMT+3"),
+    ("India Standard Time", "Asia/Kolkata"),
+    ("eastern time", "America/New_York"),
+])
+def test_resolve_timezone(value, zone):
+    assert resolve_timezone(value) == zone
+
+
+@pytest.mark.parametrize("value", ["", "Mars/Olympus", "GMT+15", "UTC+05:75"])
+def test_resolve_unknown_timezone(value):
+    assert resolve_timezone(value) is None
+
+
+def test_validate_normalizes_times_and_timezone():
+    booking = validate_booking(PAYLOAD)
+    assert booking["start"] == "2026-11-02T15:00:00"
+    assert booking["end"] == "2026-11-02T15:30:00"  # default meeting length
+    assert booking["timezone"] == "Asia/Kolkata"
+
+
+@pytest.mark.parametrize("change, start, end, zone", [
+    # Fractional offsets have no IANA zone: the times are sent in UTC
+    ({"timezone": "UTC+05:30"}, "2026-11-02T09:30:00", "2026-11-02T10:00:00", "UTC"),
+    ({"timezone": "GMT+05:30", "end": "2026-11-02 16:00"}, "2026-11-02T09:30:00", "2026-11-02T10:30:00", "UTC"),
+    ({"timezone": "India Standard Time"}, "2026-11-02T15:00:00", "2026-11-02T15:30:00", "Asia/Kolkata"),
+    # An offset on the time is converted to the booking's timezone...
+    ({"start": "2026-11-02T09:30:00Z"}, "2026-11-02T15:00:00", "2026-11-02T15:30:00", "Asia/Kolkata"),
+    ({"start": "2026-11-02T15:00:00+05:30"}, "2026-11-02T15:00:00", "2026-11-02T15:30:00", "Asia/Kolkata"),
+    # ...or gives the timezone when there is none
+    ({"start": "2026-11-02T15:00:00+05:30", "timezone": None}, "2026-11-02T09:30:00", "2026-11-02T10:00:00", "UTC"),
+    ({"start": "2026-11-02T15:00:00+02:00", "timezone": ""}, "2026-11-02T15:00:00", "2026-11-02T15:30:00", "Etc/GMT-2"),
+])
+def test_validate_accepts_utc_offsets(change, start, end, zone):
+    booking = validate_booking({**PAYLOAD, **change})
+    assert (booking["start"], booking["end"], booking["timezone"]) == (start, end, zone)
+
+
+def test_validate_prefers_signed_in_user():
+    session = {"authenticated": True, "user_name": "Grace", "user_email": "grace@example.com"}
+    booking = validate_booking(PAYLOAD, session)
+    assert (booking["name"], booking["email"]) == ("Grace", "grace@example.com")
+
+
+@pytest.mark.parametrize("change", [
+    {"email": "not-an-email"},
+    {"start": "2026-02-30 10:00"},
+    {"timezone": "Nowhere"},
+    {"name": " "},
+    {"timezone": None},
+    {"start": "2026-11-02T15:00:00+25:00"},
+])
+def test_validate_rejects_bad_payloads(change):
+    with pytest.raises(BookingError):
+        validate_booking({**PAYLOAD, **change})
+
+
+def test_marker_is_stripped_and_payload_parsed():
+    text, booking = parse_booking_marker(REPLY, {})
+    assert text == "Great, you're booked for Monday at 3pm!"
+    assert booking["notes"] == "Intro {call}"
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 13])
+def test_streamed_extraction_matches_blocking(size):
+    extractor = BookingExtractor()
+    shown = "".join(extractor.feed(REPLY[i:i + size]) for i in range(0, len(REPLY), size))
+    shown += extractor.flush()
+    assert BOOKING_MARKER not in shown and "{" not in shown
+    assert extractor.result({}) == parse_booking_marker(REPLY, {})
+
+
+def test_validation_failure_is_reported():
+    extractor = BookingExtractor()
+    extractor.feed(REPLY.replace("IST", "Atlantis"))
+    extractor.flush()
+    assert extractor.result({})[1] is None
+    assert extractor.error == "unknown timezone 'Atlantis'"
+
+
+def test_incomplete_or_invalid_json_books_nothing():
+    assert parse_booking_marker(f"Sure. {BOOKING_MARKER} {{\"name\": ", {}) == ("Sure.", None)
+    assert parse_booking_marker(f"Sure. {BOOKING_MARKER} {{\"name\" 1}}", {}) == ("Sure.", None)
+    assert parse_booking_marker("No marker here [[BOOK", {}) == ("No marker here [[BOOK", None)
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+import booking_queue
+from booking_queue import FAILED, SENT, BookingDispatcher
+
+PAYLOAD = {"name": "Ada", "email": "ada@example.com", "start": "2026-11-02T15:00:00"}
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return {"status": "ok"}
+
+
+class Webhook:
+    """Fake session: answers with the given status codes, then 200"""
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.calls = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.calls.append((json, headers))
+        return Response(self.statuses.pop(0) if self.statuses else 200)
+
+
+@pytest.fixture
+def dispatcher(tmp_path):
+    queue = BookingDispatcher("https://n8n.example/hook", path=str(tmp_path / "bookings.db"),
+                              workers=1, max_attempts=3, retry_base_seconds=0.01)
+    yield queue
+    queue.stop()
+
+
+def wait_for(dispatcher, booking_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        booking = dispatcher.get(booking_id)
+        if booking["status"] == status:
+            return booking
+        time.sleep(0.01)
+    raise AssertionError(f"booking is {dispatcher.get(booking_id)['status']}, not {status}")
+
+
+def test_delivery_is_retried_until_it_succeeds(dispatcher, monkeypatch):
+    webhook = Webhook(500)
+    monkeypatch.setattr(booking_queue.http_transport, "session", lambda: webhook)
+    booking_id = dispatcher.enqueue(PAYLOAD)
+    booking = wait_for(dispatcher, booking_id, SENT)
+    assert booking["attempts"] == 2 and booking["result"] == {"status": "ok"}
+    assert webhook.calls[-1] == (PAYLOAD, {"Idempotency-Key": booking_id})
+
+
+def test_same_booking_is_queued_once(dispatcher, monkeypatch):
+    webhook = Webhook()
+    monkeypatch.setattr(booking_queue.http_transport, "session", lambda: webhook)
+    first = dispatcher.enqueue(PAYLOAD)
+    assert dispatcher.enqueue(dict(reversed(list(PAYLOAD.items())))) == first
+    wait_for(dispatcher, first, SENT)
+    assert len(webhook.calls) == 1
+
+
+def test_gives_up_after_max_attempts(dispatcher, monkeypatch):
+    webhook = Webhook(500, 502, 503, 504)
+    monkeypatch.setattr(booking_queue.http_transport, "session", lambda: webhook)
+    booking_id = dispatcher.enqueue(PAYLOAD)
+    booking = wait_for(dispatcher, booking_id, FAILED)
+    assert booking["attempts"] == 3 and "HTTP 503" in booking["error"]
+    assert dispatcher.get("unknown") is None
+
+
+def test_failed_booking_is_retried_when_enqueued_again(dispatcher, monkeypatch):
+    webhook = Webhook(500, 502, 503)
+    monkeypatch.setattr(booking_queue.http_transport, "session", lambda: webhook)
+    booking_id = dispatcher.enqueue(PAYLOAD)
+    wait_for(dispatcher, booking_id, FAILED)
+    assert dispatcher.enqueue(PAYLOAD) == booking_id
+    booking = wait_for(dispatcher, booking_id, SENT)
+    assert booking["attempts"] == 1 and booking["error"] is None
+    assert len(webhook.calls) == 4
@@ -0,0 +1,57 @@
+import time
+
+from context_window import (
+    PREFIX_TOKENS,
+    PROMPT_PREFIX,
+    SUMMARY_PREFIX,
+    ContextWindow,
+    count_tokens,
+    message_tokens,
+)
+
+
+def long_turns(window, history, count):
+    for i in range(count):
+        window.add_turn(history, f"Question {i}. " + "word " * 40, f"Answer {i}. " + "word " * 40)
+
+
+def test_history_is_kept_under_budget_with_a_summary():
+    window = ContextWindow(budget_tokens=200)
+    history = []
+    long_turns(window, history, 6)
+    assert history[0]["summary"] and history[0]["pending"]
+    assert history[0]["content"].startswith(SUMMARY_PREFIX + "They asked: Question 0")
+    assert history[-1]["content"].startswith("Answer 5.")
+    turns = history[1:]
+    assert sum(message_tokens(m) for m in turns) <= 200 or len(turns) == 2
+
+
+def test_latest_exchange_is_kept_even_over_budget():
+    window = ContextWindow(budget_tokens=10)
+    history = []
+    long_turns(window, history, 2)
+    assert [m["role"] for m in history] == ["system", "user", "assistant"]
+    assert history[1]["content"].startswith("Question 1.")
+
+
+def test_build_puts_the_shared_prefix_first_and_user_context_last():
+    window = ContextWindow()
+    history = [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello!"}]
+    messages, tokens = window.build("Book a call", history, "[User Info: Ada]")
+    assert messages[:len(PROMPT_PREFIX)] == list(PROMPT_PREFIX)
+    assert messages[-2:] == [{"role": "system", "content": "[User Info: Ada]"},
+                             {"role": "user", "content": "Book a call"}]
+    assert tokens > PREFIX_TOKENS + count_tokens("Book a call")
+    assert all(set(m) == {"role", "content"} for m in messages)
+
+
+def test_placeholder_is_replaced_by_the_llm_summary():
+    window = ContextWindow(budget_tokens=200, summarizer=lambda text: " They like Python. ")
+    history = []
+    long_turns(window, history, 6)
+    deadline = time.monotonic() + 5
+    while history[0].get("pending") and time.monotonic() < deadline:
+        window.build("Next question", history)
+        time.sleep(0.01)
+    assert history[0] == {"role": "system", "content": SUMMARY_PREFIX + "They like Python.",
+                          "summary": True, "tokens": history[0]["tokens"]}
@@ -0,0 +1,84 @@
+import threading
+
+import faq_index
+from faq_index import FAQIndex, build, faq_key, write_index
+from response_cache import ResponseCache, prompt_hash
+
+
+class FakeClient:
+    model = "fake"
+
+    def __init__(self):
+        self.questions = []
+        self._lock = threading.Lock()
+
+    def get_response(self, question, history):
+        with self._lock:
+            self.questions.append(question)
+        if "fail" in question:
+            raise RuntimeError("provider error")
+        return f"Answer to {question}"
+
+
+def test_index_round_trip(tmp_path):
+    path = str(tmp_path / "faq.bin")
+    answers = {faq_key(f"What is your favourite thing number {i}?"): f"answer {i}" for i in range(50)}
+    assert write_index(path, answers, prompt_hash()) == 50
+    index = FAQIndex(path)
+    assert len(index) == 50
+    assert index.prompt_hash == prompt_hash()
+    assert index.lookup("what's your FAVOURITE thing number 7") == "answer 7"
+    assert index.lookup("what is your favourite thing number 99") is None
+    assert index.stats() == {"entries": 50, "hits": 1, "misses": 1}
+
+
+def test_vague_questions_are_not_keys(tmp_path):
+    assert faq_key("Who are you?") is None
+    assert faq_key("what?") is None
+    assert faq_key("What's your superpower?") == "what superpower"
+    path = str(tmp_path / "faq.bin")
+    write_index(path, {"what superpower": "Adaptability."}, prompt_hash())
+    assert FAQIndex(path).lookup("who?") is None
+
+
+def test_build_resumes_and_skips_vague_and_booking_questions(tmp_path, monkeypatch):
+    monkeypatch.setattr(faq_index, "RETRY_BASE_SECONDS", 0)
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("# comment\nWhat's your #1 superpower?\nWhat is your #1 superpower\n"
+                      "Who are you?\nBook a call tomorrow at 5pm\nfail this question please\n")
+    index_path, journal_path = str(tmp_path / "faq.bin"), str(tmp_path / "journal.jsonl")
+
+    client = FakeClient()
+    assert not build(str(corpus), client, index_path, journal_path, concurrency=2, per_minute=0)
+    # Rewordings share a key; the vague and booking questions are never sent
+    assert sorted(set(client.questions)) == ["What's your #1 superpower?", "fail this question please"]
+    assert FAQIndex(index_path).lookup("what is your #1 superpower") == "Answer to What's your #1 superpower?"
+
+    retry = FakeClient()
+    build(str(corpus), retry, index_path, journal_path, concurrency=2, per_minute=0)
+    assert set(retry.questions) == {"fail this question please"}
+
+
+def test_prompt_change_regenerates_answers(tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("What's your superpower?\n")
+    index_path, journal_path = str(tmp_path / "faq.bin"), str(tmp_path / "journal.jsonl")
+    build(str(corpus), FakeClient(), index_path, journal_path, per_minute=0)
+
+    monkeypatch.setattr(faq_index, "prompt_hash", lambda: "0123456789abcdef")
+    client = FakeClient()
+    build(str(corpus), client, index_path, journal_path, per_minute=0)
+    assert client.questions == ["What's your superpower?"]
+    assert FAQIndex(index_path).prompt_hash == "0123456789abcdef"
+
+
+def test_served_from_response_cache_even_when_cache_disabled(tmp_path):
+    path = str(tmp_path / "faq.bin")
+    write_index(path, {"what superpower": "Adaptability."}, prompt_hash())
+    cache = ResponseCache("model", enabled=False, faq_index=FAQIndex(path))
+    key = cache.key_for("What's your superpower?", [])
+    assert cache.get(key, "What's your superpower?") == "Adaptability."
+    assert cache.key_for("What's your superpower?", [{"role": "user", "content": "hi"}]) is None
+    cache.put(key, "Something else", "What's your superpower?")
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["faq_hits"] == 1
@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loads gunicorn.conf.py in a fresh interpreter and calls on_starting with a fake server
+PROBE = """
+import importlib.util, json
+spec = importlib.util.spec_from_file_location("gunicorn_conf", "gunicorn.conf.py")
+conf = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(conf)
+
+class Log:
+    warnings = []
+
+    def info(self, message):
+        pass
+
+    def warning(self, message):
+        self.warnings.append(message)
+
+class Cfg:
+    workers = conf.workers
+
+class Server:
+    cfg = Cfg()
+    log = Log()
+
+try:
+    conf.on_starting(Server())
+    error = None
+except RuntimeError as e:
+    error = str(e)
+import config, metrics, os
+conf.on_exit(Server())
+print(json.dumps({"workers": conf.workers, "store": config.CONVERSATION_STORE, "error": error,
+                  "metrics_dir": metrics.REGISTRY.directory, "kept": os.path.isdir(metrics.REGISTRY.directory),
+                  "warnings": Log.warnings}))
+"""
+
+
+def probe(**env):
+    environ = {k: v for k, v in os.environ.items() if k != "CONVERSATION_STORE"}
+    environ.update(env)
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=environ,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_several_workers_default_to_the_shared_store():
+    result = probe(WEB_CONCURRENCY="3")
+    assert (result["workers"], result["store"], result["error"]) == (3, "sqlite", None)
+
+
+def test_several_workers_share_metrics_in_a_directory_for_the_run():
+    result = probe(WEB_CONCURRENCY="3", METRICS_DIR="")
+    assert "voicebot-metrics-" in result["metrics_dir"]
+    assert not result["kept"]  # removed by on_exit
+    assert result["warnings"] == []
+    assert probe(WEB_CONCURRENCY="3", METRICS_DIR="/tmp/shared-metrics")["metrics_dir"] == "/tmp/shared-metrics"
+
+
+def test_memory_store_is_refused_with_several_workers():
+    result = probe(WEB_CONCURRENCY="3", CONVERSATION_STORE="memory")
+    assert result["store"] == "memory" and "CONVERSATION_STORE=memory" in result["error"]
+
+
+def test_one_worker_keeps_the_memory_store_and_local_metrics():
+    result = probe(WEB_CONCURRENCY="1", METRICS_DIR="")
+    assert (result["store"], result["error"], result["metrics_dir"]) == ("memory", None, "")
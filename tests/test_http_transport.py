@@ -0,0 +1,17 @@
+import httpx
+
+import http_transport
+from config import HTTP_CONNECT_TIMEOUT, LLM_READ_TIMEOUT
+
+
+def test_llm_sdk_clients_get_the_long_read_timeout():
+    client = http_transport.sdk_http_client(httpx.Client)
+    assert client is http_transport.sdk_http_client(httpx.Client)
+    assert client.timeout.read == LLM_READ_TIMEOUT
+    assert client.timeout.connect == HTTP_CONNECT_TIMEOUT
+    async_client = http_transport.sdk_async_http_client(httpx.AsyncClient)
+    assert async_client.timeout.read == LLM_READ_TIMEOUT
+
+
+def test_other_calls_keep_the_short_default_timeout():
+    assert http_transport.DEFAULT_TIMEOUT[1] < LLM_READ_TIMEOUT
@@ -0,0 +1,38 @@
+import pytest
+
+from intents import BOOKING, EXIT, GREETING, QUESTION, RESET, canned_response, detect_intent
+
+
+@pytest.mark.parametrize("text", [
+    "Can I book a call tomorrow?",
+    "I'd like to book time with you",
+    "Book a meeting",
+    "Could we schedule a chat?",
+    "Are you available for a call on Friday at 3pm?",
+    "lets book",
+])
+def test_booking_requests(text):
+    assert detect_intent(text).name == BOOKING
+
+
+@pytest.mark.parametrize("text", [
+    "What's your favourite book?",
+    "What book changed your life?",
+    "Which books do you read?",
+    "How do you recall things so well?",
+    "What are you talking about at the conference?",
+])
+def test_questions_that_mention_booking_words(text):
+    assert detect_intent(text).name == QUESTION
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("Hey there!", GREETING),
+    ("ok thanks, bye", EXIT),
+    ("start over please", RESET),
+    ("hey, what is your superpower?", QUESTION),
+])
+def test_whole_message_intents(text, intent):
+    detected = detect_intent(text)
+    assert detected.name == intent
+    assert (canned_response(detected) is not None) == (intent != QUESTION)
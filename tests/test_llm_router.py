@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+from llm_router import CLOSED, HALF_OPEN, OPEN, LLMRouter, ProviderHealth
+
+
+class Client:
+    def __init__(self, answer="ok", delay=0.0, error=None):
+        self.answer, self.delay, self.error = answer, delay, error
+        self.calls = 0
+
+    def get_response(self, question, history=None, user_context=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.answer
+
+    def stream_response(self, question, history=None, user_context=None):
+        yield self.get_response(question, history, user_context)
+
+    async def aget_response(self, question, history=None, user_context=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.answer
+
+
+class Fallback(Client):
+    def __init__(self):
+        super().__init__(answer="fallback")
+
+
+def open_breaker(health):
+    for _ in range(health.failure_threshold):
+        health.record(0.1, False)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    health = ProviderHealth("p", failure_threshold=2, cooldown_seconds=60)
+    health.record(0.1, False)
+    assert health.state == CLOSED
+    health.record(0.1, False)
+    assert health.state == OPEN
+    assert not health.available() and not health.allow()
+
+
+def test_half_open_allows_one_probe_and_closes_on_success():
+    health = ProviderHealth("p", failure_threshold=1, cooldown_seconds=0.05)
+    open_breaker(health)
+    time.sleep(0.06)
+    assert health.available()
+    assert health.available()  # Checking does not use up the probe
+    assert health.allow()
+    assert health.state == HALF_OPEN
+    assert not health.allow()
+    health.record(0.1, True)
+    assert health.state == CLOSED
+
+
+def test_failed_probe_reopens():
+    health = ProviderHealth("p", failure_threshold=3, cooldown_seconds=0.05)
+    open_breaker(health)
+    time.sleep(0.06)
+    assert health.allow()
+    health.record(0.1, False)
+    assert health.state == OPEN
+
+
+def test_ranking_does_not_use_up_the_probe():
+    fast, recovering = Client("fast"), Client("recovering")
+    router = LLMRouter([("fast", fast), ("recovering", recovering)], Fallback(),
+                       hedge_after_seconds=5, failure_threshold=1, cooldown_seconds=0.05)
+    router.health["fast"].record(0.01, True)
+    router.health["recovering"].record(1.0, True)
+    open_breaker(router.health["recovering"])
+    time.sleep(0.06)
+    # The fast provider answers before any hedge, so the recovering one is never sent a request
+    assert router.get_response("q", []) == "fast"
+    assert recovering.calls == 0
+    assert router.health["recovering"].allow()
+
+
+def test_failover_and_fallback():
+    broken = Client(error=RuntimeError("down"))
+    healthy = Client("healthy")
+    router = LLMRouter([("broken", broken), ("healthy", healthy)], Fallback(), hedge_after_seconds=5)
+    assert router.get_response("q", []) == "healthy"
+    assert router.decisions["failover"] == 1
+    router = LLMRouter([("broken", broken)], Fallback(), hedge_after_seconds=5)
+    assert router.get_response("q", []) == "fallback"
+
+
+def test_slow_primary_is_hedged():
+    slow, quick = Client("slow", delay=0.5), Client("quick")
+    router = LLMRouter([("slow", slow), ("quick", quick)], Fallback(), hedge_after_seconds=0.05)
+    assert router.get_response("q", []) == "quick"
+    assert router.decisions["hedged"] == 1
+    router.close(1)
+
+
+def test_async_failover():
+    broken, healthy = Client(error=RuntimeError("down")), Client("healthy")
+    router = LLMRouter([("broken", broken), ("healthy", healthy)], Fallback(), hedge_after_seconds=5)
+    assert asyncio.run(router.aget_response("q", [])) == "healthy"
+
+
+def test_stream_decision_follows_this_request_not_configured_order():
+    configured_first, faster = Client("first"), Client("faster")
+    router = LLMRouter([("first", configured_first), ("faster", faster)], Fallback())
+    router.health["first"].record(1.0, True)
+    router.health["faster"].record(0.1, True)
+    assert "".join(router.stream_response("q", [])) == "faster"
+    assert router.last_decision["decision"] == "primary"
+    assert router.last_decision["provider"] == "faster"
+    faster.error = RuntimeError("down")
+    assert "".join(router.stream_response("q", [])) == "first"
+    assert router.decisions["failover"] == 1
@@ -0,0 +1,54 @@
+from booking import BOOKING_MARKER
+from response_cache import ResponseCache, normalize_question
+
+
+def test_normalization_ignores_case_punctuation_and_filler():
+    assert normalize_question("What's YOUR superpower?!") == "what superpower"
+    assert normalize_question("Hey, tell me about your life story.") == "life story"
+    assert normalize_question("Please, just... hi!") == ""
+
+
+def test_rewordings_share_a_key_but_models_do_not():
+    cache = ResponseCache("model-a")
+    key = cache.key_for("What is your superpower?", [])
+    assert key == cache.key_for("what's ur superpower", None)
+    assert key != cache.key_for("What is your life story?", [])
+    assert key != ResponseCache("model-b").key_for("What is your superpower?", [])
+
+
+def test_only_context_free_non_booking_questions_are_cacheable():
+    cache = ResponseCache("model")
+    assert cache.key_for("What is your superpower?", [{"role": "user", "content": "hi"}]) is None
+    assert cache.key_for("Can I book a call tomorrow?", []) is None
+    assert cache.key_for("hi!", []) is None
+    assert ResponseCache("model", enabled=False).key_for("What is your superpower?", []) is None
+
+
+def test_put_get_and_booking_replies_are_not_stored():
+    cache = ResponseCache("model")
+    key = cache.key_for("What is your superpower?", [])
+    assert cache.get(key) is None
+    cache.put(key, f"Sure! {BOOKING_MARKER} {{}}")
+    assert cache.get(key) is None
+    cache.put(key, "Adaptability.")
+    assert cache.get(key) == "Adaptability."
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache("model", max_entries=2)
+    keys = [cache.key_for(q, []) for q in ("superpower", "life story", "growth areas")]
+    cache.put(keys[0], "a")
+    cache.put(keys[1], "b")
+    cache.get(keys[0])
+    cache.put(keys[2], "c")
+    assert cache.get(keys[1]) is None
+    assert (cache.get(keys[0]), cache.get(keys[2])) == ("a", "c")
+
+
+def test_expired_entries_are_not_served():
+    cache = ResponseCache("model", ttl_seconds=-1)
+    key = cache.key_for("What is your superpower?", [])
+    cache.put(key, "Adaptability.")
+    assert cache.get(key) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,91 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import semantic_index
+from semantic_index import SemanticIndex, same_question
+
+
+def test_near_duplicate_lookup():
+    index = SemanticIndex("model")
+    index.add("What's your superpower?", "Adaptability.")
+    index.add("Tell me about your life story", "Born in Indore.")
+    assert index.lookup("what is your super power") == "Adaptability."
+    assert index.lookup("What is the weather in Paris?") is None
+
+
+@pytest.mark.parametrize("asked, cached", [
+    ("Why should we not hire you?", "Why should we hire you?"),
+    ("How do you handle failure?", "How do you handle pressure?"),
+    ("What is your biggest achievement?", "What is your proudest achievement?"),
+    ("Where do you see yourself in 10 years?", "Where do you see yourself in five years?"),
+    ("What is your greatest strength?", "What is your greatest weakness?"),
+    ("What do you like about your job?", "What do you dislike about your job?"),
+])
+def test_different_questions_are_not_the_same(asked, cached):
+    assert not same_question(asked, cached)
+
+
+@pytest.mark.parametrize("asked, cached", [
+    ("what is your super power", "What's your superpower?"),
+    ("Tell me about your experiance", "Tell me about your experience"),
+    ("Where do you see yourself in 5 years?", "Where do you see yourself in five years?"),
+])
+def test_rephrased_questions_are_the_same(asked, cached):
+    assert same_question(asked, cached)
+
+
+def test_similar_but_different_question_is_not_reused():
+    index = SemanticIndex("model")
+    index.add("Why should we hire you?", "I ship fast.")
+    assert index.lookup("Why should we hire you") == "I ship fast."
+    assert index.lookup("Why should we not hire you?") is None
+
+
+def test_rows_grow_with_entries():
+    index = SemanticIndex("model", capacity=1000)
+    assert index._vectors.shape[0] == 0
+    index.add("first question here", "answer")
+    assert index._vectors.shape[0] == semantic_index.INITIAL_ROWS
+    for i in range(semantic_index.INITIAL_ROWS):
+        index.add(f"question number {i}", "answer")
+    assert index._vectors.shape[0] == 2 * semantic_index.INITIAL_ROWS
+
+
+def test_least_recently_used_entry_is_replaced_when_full():
+    index = SemanticIndex("model", capacity=2)
+    index.add("favourite programming language", "Python.")
+    index.add("favourite city to live in", "Indore.")
+    assert index.lookup("favourite programming language") == "Python."
+    index.add("favourite food of all time", "Poha.")
+    assert len(index) == 2
+    assert index._vectors.shape[0] == 2
+    assert index.lookup("favourite city to live in") is None
+    assert index.lookup("favourite programming language") == "Python."
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "index")
+    index = SemanticIndex("model", path=path)
+    index.add("What's your superpower?", "Adaptability.")
+    index.save()
+    assert SemanticIndex("model", path=path).lookup("what is your superpower") == "Adaptability."
+    loaded = SemanticIndex("model", path=path)
+    assert isinstance(loaded._vectors, np.memmap)
+    loaded.add("Tell me about your life story", "Born in Indore.")
+    assert loaded.lookup("tell me about your life story") == "Born in Indore."
+    # Answers from another model are not reused
+    assert len(SemanticIndex("other-model", path=path)) == 0
+
+
+def test_saved_fallback_replies_are_dropped(tmp_path):
+    from voice_bot import FALLBACK_DEFAULT_REPLY
+    path = str(tmp_path / "index")
+    index = SemanticIndex("model", path=path)
+    index.add("What's your favourite movie?", FALLBACK_DEFAULT_REPLY)
+    index.add("What's your superpower?", "Adaptability.")
+    index.save()
+    loaded = SemanticIndex("model", path=path)
+    assert len(loaded) == 1
+    assert loaded.lookup("what is your super power") == "Adaptability."
+    assert loaded.lookup("What's your favourite movie?") is None
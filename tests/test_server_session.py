@@ -0,0 +1,87 @@
+from flask import Flask, jsonify, session
+
+import chat_service
+from server_session import FileSessionBackend, ServerSessionInterface, SessionStore, SQLiteSessionBackend
+
+
+class DictBackend:
+    """The get/set/delete subset of redis the store needs"""
+    def __init__(self):
+        self.data = {}
+        self.reads = 0
+
+    def get(self, key):
+        self.reads += 1
+        return self.data.get(key)
+
+    def set(self, key, value, ex):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def make_app(backend):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = ServerSessionInterface(SessionStore(backend, ttl_seconds=3600))
+
+    @app.route("/visit")
+    def visit():
+        session["visits"] = session.get("visits", 0) + 1
+        return jsonify(visits=session["visits"])
+
+    @app.route("/login")
+    def login():
+        return jsonify(chat_service.sign_in(session, {"email": "ada@example.com", "name": "Ada"}))
+
+    @app.route("/ping")
+    def ping():
+        return "ok"
+
+    return app
+
+
+def session_id(client):
+    cookie = client.get_cookie("session")
+    return cookie.value if cookie else None
+
+
+def test_data_stays_on_the_server():
+    backend = DictBackend()
+    client = make_app(backend).test_client()
+    assert client.get("/visit").get_json() == {"visits": 1}
+    assert client.get("/visit").get_json() == {"visits": 2}
+    assert list(backend.data) == [session_id(client)]
+
+
+def test_untouched_session_is_not_read():
+    backend = DictBackend()
+    client = make_app(backend).test_client()
+    client.get("/visit")
+    reads = backend.reads
+    client.get("/ping")
+    assert backend.reads == reads
+
+
+def test_login_issues_a_new_session_id():
+    backend = DictBackend()
+    client = make_app(backend).test_client()
+    client.get("/visit")
+    before = session_id(client)
+    client.get("/login")
+    after = session_id(client)
+    assert after and after != before
+    assert before not in backend.data
+    # The data survives the new id
+    assert client.get("/visit").get_json() == {"visits": 2}
+
+
+def test_local_backends_round_trip(tmp_path):
+    for backend in (SQLiteSessionBackend(str(tmp_path / "sessions.db")),
+                    FileSessionBackend(str(tmp_path / "sessions"))):
+        key = "k" * 43
+        backend.set(key, b'[1,{"a":1}]', ex=60)
+        assert backend.get(key) == b'[1,{"a":1}]'
+        backend.delete(key)
+        assert backend.get(key) is None
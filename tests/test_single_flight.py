@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import single_flight
+from single_flight import FileFlight, SingleFlight
+
+
+class SlowClient:
+    """LLM client that counts calls and answers after a short delay"""
+    def __init__(self, answer="I build voice bots.", delay=0.2):
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_response(self, question, history=None, user_context=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.answer
+
+    def stream_response(self, question, history=None, user_context=None):
+        with self._lock:
+            self.calls += 1
+        for word in self.answer.split(" "):
+            time.sleep(self.delay / 4)
+            yield word + " "
+
+    async def aget_response(self, question, history=None, user_context=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.answer
+
+
+def test_key_only_for_context_free_questions():
+    flight = SingleFlight(SlowClient(), "model")
+    key = flight.key_for("What is your superpower?", [])
+    assert key == flight.key_for("what is your superpower", None)
+    assert flight.key_for("What is your superpower?", [{"role": "user", "content": "hi"}]) is None
+    assert flight.key_for("What is your superpower?", [], user_context="a@b.c") is None
+    assert flight.key_for("Can I book a call tomorrow?", []) is None
+    assert SingleFlight(SlowClient(), "model", enabled=False).key_for("hi there", []) is None
+
+
+def test_identical_requests_share_one_call():
+    client = SlowClient()
+    flight = SingleFlight(client, "model")
+    answers = []
+
+    def ask():
+        answers.append(flight.get_response("What is your superpower?", []))
+
+    threads = [threading.Thread(target=ask) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.calls == 1
+    assert answers == [client.answer] * 5
+    assert flight.leaders == 1 and flight.followers == 4
+
+
+def test_streaming_followers_receive_the_same_reply():
+    client = SlowClient()
+    flight = SingleFlight(client, "model")
+    first = flight.stream_response("What is your superpower?", [])
+    second = flight.stream_response("What is your superpower?", [])
+    assert "".join(first).strip() == "".join(second).strip() == client.answer
+    assert client.calls == 1
+
+
+def test_async_requests_share_one_call():
+    client = SlowClient()
+    flight = SingleFlight(client, "model")
+
+    async def ask_all():
+        return await asyncio.gather(
+            *(flight.aget_response("What is your superpower?", []) for _ in range(3)))
+
+    assert asyncio.run(ask_all()) == [client.answer] * 3
+    assert client.calls == 1
+
+
+@pytest.mark.skipif(single_flight.fcntl is None, reason="needs flock")
+def test_file_flight_streams_to_other_workers_and_removes_its_files(tmp_path):
+    leader = FileFlight(str(tmp_path), "key")
+    follower = FileFlight(str(tmp_path), "key")
+    assert leader.try_lead()
+    assert not follower.try_lead()
+    assert follower.open()
+    leader.write("Hello ")
+    assert follower.poll() == ("Hello ", False)
+    leader.write("there")
+    leader.release(ok=True)
+    assert follower.poll() == ("there", True)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.skipif(single_flight.fcntl is None, reason="needs flock")
+def test_stale_lock_file_is_not_trusted(tmp_path):
+    first = FileFlight(str(tmp_path), "key")
+    assert first.try_lead()
+    # Another worker opened the lock file just before the leader removed it
+    stale_fd = os.open(first.lock_path, os.O_RDWR)
+    first.release(ok=True)
+    second = FileFlight(str(tmp_path), "key")
+    assert second.try_lead()
+    assert second._is_current(second._lock_fd)
+    assert not second._is_current(stale_fd)
+    os.close(stale_fd)
+    second.release(ok=True)
+
+
+@pytest.mark.skipif(single_flight.fcntl is None, reason="needs flock")
+def test_waits_briefly_then_answers_when_other_worker_has_no_stream(tmp_path, monkeypatch):
+    # Another worker holds the lock but never creates its stream file
+    holder = FileFlight(str(tmp_path), "unused")
+    client = SlowClient(delay=0)
+    flight = SingleFlight(client, "model", lock_dir=str(tmp_path), wait_seconds=0.3)
+    key = flight.key_for("What is your superpower?", [])
+    holder.lock_path = os.path.join(str(tmp_path), f"{key}.lock")
+    holder.stream_path = os.path.join(str(tmp_path), f"{key}.stream")
+    assert holder.try_lead()
+    os.unlink(holder.stream_path)
+
+    opens = []
+    real_open = FileFlight.open
+    monkeypatch.setattr(FileFlight, "open", lambda self: opens.append(1) or real_open(self))
+    start = time.monotonic()
+    assert flight.get_response("What is your superpower?", []) == client.answer
+    assert time.monotonic() - start >= 0.3
+    # Polled at an interval rather than spinning
+    assert len(opens) < 0.3 / single_flight._POLL_SECONDS + 5
+    assert client.calls == 1
+    holder.release(ok=False)
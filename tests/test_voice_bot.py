@@ -0,0 +1,33 @@
+from booking import user_context
+from voice_bot import build_messages
+
+SIGNED_IN = {"authenticated": True, "user_name": "Ada", "user_email": "ada@example.com"}
+
+
+def test_build_messages_includes_user_context():
+    context = user_context(SIGNED_IN, "Can I book a call tomorrow?")
+    messages, prompt_tokens = build_messages("Can I book a call tomorrow?", [], context)
+    assert any("ada@example.com" in m["content"] for m in messages)
+    assert messages[-1] == {"role": "user", "content": "Can I book a call tomorrow?"}
+    assert prompt_tokens > 0
+
+
+def test_build_messages_without_user_context():
+    with_context, _ = build_messages("Book a call", [], "[User Info: Name: Ada, Email: ada@example.com]")
+    messages, _ = build_messages("Book a call", [], None)
+    assert len(messages) == len(with_context) - 1
+    assert not any("ada@example.com" in m["content"] for m in messages)
+
+
+def test_web_app_does_not_load_desktop_modules():
+    import os
+    import subprocess
+    import sys
+    desktop = ("asr", "tts", "greetings", "voice_pipeline")
+    code = ("import sys, app; "
+            f"print('loaded:', [m for m in {desktop!r} if m in sys.modules])")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, env=dict(os.environ),
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "loaded: []"
@@ -0,0 +1,25 @@
+import math
+import struct
+
+import pytest
+
+from voice_pipeline import rms
+
+
+def pack(samples, width):
+    if width == 3:
+        return b"".join(s.to_bytes(3, "little", signed=True) for s in samples)
+    return struct.pack(f"<{len(samples)}{ {1: 'b', 2: 'h', 4: 'i'}[width]}", *samples)
+
+
+@pytest.mark.parametrize("width, peak", [(1, 100), (2, 20000), (3, 2_000_000), (4, 500_000_000)])
+def test_rms_of_every_sample_width(width, peak):
+    samples = [peak, -peak, peak // 2, -peak // 2]
+    expected = math.sqrt(sum(s * s for s in samples) / len(samples))
+    assert rms(pack(samples, width), width) == pytest.approx(expected)
+
+
+def test_rms_ignores_trailing_partial_sample_and_empty_frames():
+    assert rms(pack([300, -300], 2) + b"\x01", 2) == pytest.approx(300)
+    assert rms(b"", 2) == 0
+    assert rms(b"\x01\x02", 3) == 0
@@ -0,0 +1,126 @@
+"""The Flask and Quart frontends share chat_service, so they must answer alike"""
+import asyncio
+import json
+
+import pytest
+
+import app as flask_app
+import async_app
+
+
+def sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines.get("event", "data"), json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def flask_client():
+    return flask_app.app.test_client()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_chat_canned_greeting(flask_client):
+    response = flask_client.post("/api/chat", json={"question": "hello"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["success"] and body["intent"] == "greeting"
+
+
+def test_chat_requires_question(flask_client):
+    assert flask_client.post("/api/chat", json={"question": "  "}).status_code == 400
+
+
+def test_stream_matches_blocking_answer(flask_client):
+    blocking = flask_client.post("/api/chat", json={"question": "How do you push your boundaries?"}).get_json()
+    response = flask_client.post("/api/chat/stream", json={"question": "How do you push your boundaries?"})
+    events = sse_events(response.get_data(as_text=True))
+    assert events[-1][0] == "done"
+    assert events[-1][1]["response"] == blocking["response"]
+    assert "".join(data["delta"] for event, data in events if event == "data") == blocking["response"]
+
+
+def test_history_is_kept_per_session(flask_client):
+    # Canned replies are remembered by the service (LLM clients record their own turns)
+    flask_client.post("/api/chat", json={"question": "hello"})
+    with flask_client.session_transaction() as session:
+        conversation_id = session["conversation_id"]
+    history = flask_app.chat_service.conversation_store.get(conversation_id)
+    assert [m["role"] for m in history] == ["user", "assistant"]
+    assert flask_client.post("/api/reset").get_json() == {"success": True}
+    assert flask_app.chat_service.conversation_store.get(conversation_id) == []
+
+
+def test_async_app_answers_like_flask(flask_client):
+    question = {"question": "Tell me about your life story"}
+    expected = flask_client.post("/api/chat", json=question).get_json()["response"]
+
+    async def scenario():
+        client = async_app.app.test_client()
+        blocking = await (await client.post("/api/chat", json=question)).get_json()
+        streamed = await (await client.post("/api/chat/stream", json=question)).get_data(as_text=True)
+        user = await (await client.get("/api/auth/user")).get_json()
+        health = await (await client.get("/api/health")).get_json()
+        return blocking, streamed, user, health
+
+    blocking, streamed, user, health = run(scenario())
+    assert blocking["response"] == expected
+    assert sse_events(streamed)[-1][1]["response"] == expected
+    assert user == {"success": False, "user": None}
+    assert health["mode"] == "async"
+
+
+def test_booking_status_unknown(flask_client):
+    response = flask_client.get("/api/booking/missing")
+    assert response.status_code == 404
+
+
+def test_fallback_replies_are_not_cached(flask_client):
+    from voice_bot import is_fallback_reply
+    cache = flask_app.chat_service.response_cache
+    question = "What's your favourite movie of all time?"
+    body = flask_client.post("/api/chat", json={"question": question}).get_json()
+    assert is_fallback_reply(body["response"])
+    assert cache.get(cache.key_for(question, []), question) is None
+
+
+def test_invalid_booking_is_reported_in_the_response():
+    from booking import BOOKING_MARKER
+    reply = (f'You are booked! {BOOKING_MARKER} {{"name": "Ada", "email": "ada@example.com", '
+             f'"start": "2026-11-02 15:00", "timezone": "Atlantis"}}')
+    text, booking = flask_app.chat_service.handle_booking_marker({}, reply)
+    assert text == "You are booked!"
+    assert booking == {"status": "invalid", "error": "unknown timezone 'Atlantis'"}
+    assert flask_app.chat_service.handle_booking_marker({}, "No booking here.") == ("No booking here.", None)
+
+
+CORS_HEADERS = ("Access-Control-Allow-Origin", "Access-Control-Allow-Credentials",
+                "Access-Control-Allow-Headers", "Access-Control-Allow-Methods", "Vary")
+
+
+def test_async_app_sends_the_same_cors_headers(flask_client):
+    origin = {"Origin": "https://portfolio.example"}
+    preflight = {**origin, "Access-Control-Request-Method": "POST",
+                 "Access-Control-Request-Headers": "Content-Type"}
+
+    def cors(headers):
+        return {name: headers.get(name) for name in CORS_HEADERS}
+
+    async def scenario():
+        client = async_app.app.test_client()
+        simple = await client.get("/api/health", headers=origin)
+        options = await client.options("/api/chat", headers=preflight)
+        plain = await client.get("/api/health")
+        return cors(simple.headers), cors(options.headers), cors(plain.headers)
+
+    simple, options, plain = run(scenario())
+    assert simple == cors(flask_client.get("/api/health", headers=origin).headers)
+    assert simple["Access-Control-Allow-Origin"] == origin["Origin"]
+    assert simple["Access-Control-Allow-Credentials"] == "true"
+    assert options == cors(flask_client.options("/api/chat", headers=preflight).headers)
+    assert plain == cors(flask_client.get("/api/health").headers)
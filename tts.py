@@ -0,0 +1,264 @@
+"""
+Sentence-chunked speech output with a disk cache of rendered audio
+
+pyttsx3's say() + runAndWait() synthesizes and plays a whole answer before
+returning. CachedSpeaker splits text into sentences and renders each one to a
+WAV file, while a playback thread plays the ones already rendered, so the
+first sentence starts as soon as it is ready and synthesis of the next ones
+overlaps with playback.
+
+Rendered sentences are kept in an on-disk LRU cache (TTS_CACHE_DIR, at most
+TTS_CACHE_MAX_MB), keyed by the text and the voice settings (VOICE_SPEED,
+VOICE_VOLUME, voice id). The greeting, canned replies and the error/goodbye
+lines therefore play instantly from the second run on, and repeated LLM
+sentences do too.
+
+Synthesis stays on the thread that created the pyttsx3 engine (SAPI on
+Windows is bound to it); playback uses PyAudio, which speech_recognition's
+Microphone already needs.
+"""
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+import time
+import wave
+from array import array
+
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_MB, VOICE_SPEED, VOICE_VOLUME
+from voice_pipeline import SentenceBuffer
+
+# Part of every cache key; bump when the rendering changes
+_FORMAT_VERSION = 1
+# Frames per write to the audio device; also how often playback checks for barge-in
+_PLAYBACK_FRAMES = 1024
+
+
+def audio_key(text, rate=VOICE_SPEED, volume=VOICE_VOLUME, voice_id=""):
+    """Cache key for a piece of text spoken with the given voice settings"""
+    raw = f"{_FORMAT_VERSION}\x00{rate}\x00{volume}\x00{voice_id}\x00{text.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Size-bounded LRU of rendered WAV files in a directory
+
+    Recency is the file's modification time, so the order survives restarts;
+    a hit touches the file.
+    """
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (last_used, size)
+        self._entries = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".wav"):
+                stat = entry.stat()
+                self._entries[entry.name[:-4]] = (stat.st_mtime, stat.st_size)
+                self._bytes += stat.st_size
+        self._evict()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def get(self, key):
+        """Path of the cached audio for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            self._entries[key] = (now, entry[1])
+            self.hits += 1
+        path = self.path(key)
+        try:
+            os.utime(path, (now, now))
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes -= self._entries.pop(key, (0, 0))[1]
+            return None
+        return path
+
+    def put(self, key, rendered_path):
+        """Move a rendered file into the cache and return its cached path"""
+        path = self.path(key)
+        os.replace(rendered_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (time.time(), size)
+            self._bytes += size
+        self._evict(keep=key)
+        return path
+
+    def _evict(self, keep=None):
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return
+            victims = []
+            for key, (_, size) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+                if self._bytes <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                del self._entries[key]
+                self._bytes -= size
+                victims.append(key)
+        for key in victims:
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+def read_audio(path):
+    """(sample_width, channels, rate, little-endian PCM frames) of a rendered file
+
+    Most pyttsx3 drivers write WAV; macOS's NSSpeechSynthesizer writes AIFF
+    whatever the file name, which is converted here.
+    """
+    try:
+        with wave.open(path, "rb") as wav:
+            return wav.getsampwidth(), wav.getnchannels(), wav.getframerate(), wav.readframes(wav.getnframes())
+    except wave.Error:
+        import aifc  # Deprecated, but only needed on macOS
+        with aifc.open(path, "rb") as aiff:
+            width, channels, rate = aiff.getsampwidth(), aiff.getnchannels(), aiff.getframerate()
+            frames = aiff.readframes(aiff.getnframes())
+        if width == 2:
+            samples = array("h", frames)
+            samples.byteswap()
+            frames = samples.tobytes()
+        return width, channels, rate, frames
+
+
+def write_wav(path, width, channels, rate, frames):
+    with wave.open(path, "wb") as wav:
+        wav.setsampwidth(width)
+        wav.setnchannels(channels)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+
+
+class Player:
+    """Plays WAV files one after another on a background thread"""
+    def __init__(self, lookahead=3):
+        import pyaudio  # type: ignore
+        self._audio = pyaudio.PyAudio()
+        self._stream = None
+        self._format = None
+        # Rendered sentences waiting to play; bounded so synthesis stays only a few ahead
+        self._queue = queue.Queue(maxsize=lookahead)
+        self._idle = threading.Condition()
+        self._pending = 0
+        threading.Thread(target=self._run, name="tts-playback", daemon=True).start()
+
+    def enqueue(self, path, should_stop):
+        with self._idle:
+            self._pending += 1
+        self._queue.put((path, should_stop))
+
+    def is_playing(self):
+        return self._pending > 0
+
+    def wait(self, should_stop=None, poll_seconds=0.05):
+        """Block until everything queued has played (or should_stop() turns true)"""
+        with self._idle:
+            while self._pending and not (should_stop and should_stop()):
+                self._idle.wait(poll_seconds)
+
+    def _run(self):
+        while True:
+            path, should_stop = self._queue.get()
+            try:
+                if not (should_stop and should_stop()):
+                    self._play(path, should_stop)
+            except Exception as e:
+                print(f"[TTS] Playback failed: {e}")
+            finally:
+                with self._idle:
+                    self._pending -= 1
+                    self._idle.notify_all()
+
+    def _play(self, path, should_stop):
+        width, channels, rate, frames = read_audio(path)
+        audio_format = (width, channels, rate)
+        if audio_format != self._format:
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = self._audio.open(format=self._audio.get_format_from_width(width),
+                                            channels=channels, rate=rate, output=True)
+            self._format = audio_format
+        step = _PLAYBACK_FRAMES * width * channels
+        for start in range(0, len(frames), step):
+            if should_stop and should_stop():
+                return  # Barge-in: stop within one buffer
+            self._stream.write(frames[start:start + step])
+
+
+def sentences_of(text):
+    buffer = SentenceBuffer()
+    return buffer.feed(text) + buffer.flush()
+
+
+class CachedSpeaker:
+    """Sentence-by-sentence speech from cached or freshly rendered audio
+
+    Same interface as voice_pipeline.Pyttsx3Speaker: speak() returns once its
+    sentences are rendered and queued for playback, so the caller can render
+    the next sentence while this one plays; wait() blocks until playback ends.
+    """
+    def __init__(self, engine, cache=None, player=None):
+        self.engine = engine
+        voice = engine.getProperty("voice") or ""
+        self._voice = (engine.getProperty("rate"), engine.getProperty("volume"), str(voice))
+        self.cache = cache or AudioCache(TTS_CACHE_DIR, TTS_CACHE_MAX_MB * 1024 * 1024)
+        self.player = player or Player()
+        self._render_dir = tempfile.mkdtemp(prefix="voicebot-tts-")
+
+    def render(self, text):
+        """Path of the audio for one sentence, rendering it on a cache miss"""
+        key = audio_key(text, *self._voice)
+        path = self.cache.get(key)
+        if path is not None:
+            return path
+        started_at = time.perf_counter()
+        rendered = os.path.join(self._render_dir, f"{key}.out")
+        self.engine.save_to_file(text, rendered)
+        self.engine.runAndWait()
+        # Stored as WAV whatever the driver wrote
+        normalized = os.path.join(self._render_dir, f"{key}.wav")
+        write_wav(normalized, *read_audio(rendered))
+        os.remove(rendered)
+        path = self.cache.put(key, normalized)
+        print(f"[TTS] Rendered {len(text)} chars in {time.perf_counter() - started_at:.2f}s")
+        return path
+
+    def prepare(self, text):
+        """Render text into the cache without playing it (e.g. canned replies while idle)"""
+        for sentence in sentences_of(text):
+            self.render(sentence)
+
+    def speak(self, text, should_stop=None):
+        for sentence in sentences_of(text):
+            if should_stop and should_stop():
+                return
+            self.player.enqueue(self.render(sentence), should_stop)
+
+    def is_speaking(self):
+        return self.player.is_playing()
+
+    def wait(self, should_stop=None):
+        self.player.wait(should_stop)
@@ -1,30 +1,52 @@
 """
 AI Voice Bot - Responds to questions using voice input/output and LLM API
 
-Note: Audio libraries are imported lazily inside the VoiceBot class so that
-server deployments (e.g., Render) don't need pyaudio/pyttsx3 installed.
+Note: Audio libraries and the desktop-only modules (asr, tts, greetings,
+voice_pipeline) are imported lazily inside the VoiceBot class so that server
+deployments (e.g., Render) don't need pyaudio/pyttsx3 installed and web
+workers don't load them; the groq/openai SDKs (the slowest imports of the web
+app) only when a client first makes a call, or when the web app warms up in
+the background.
 """
 import sys
+import asyncio
+import threading
+from importlib.util import find_spec
 from config import (
     GROQ_API_KEY,
     GROQ_MODEL,
+    GROQ_BASE_URL,
     OPENAI_API_KEY,
     OPENAI_MODEL,
+    OPENAI_BASE_URL,
     VOICE_SPEED,
     VOICE_VOLUME,
-    SYSTEM_PROMPT
+    TTS_CACHE_ENABLED,
+    VOICE_CALIBRATION_SECONDS,
+    VOICE_MAX_PHRASE_SECONDS,
+    SYSTEM_PROMPT,
+    HUGGINGFACE_MODEL
 )
+from context_window import context_window, record_usage, register_summarizer
+from http_transport import sdk_async_http_client, sdk_http_client, session as http_session
 
 
 class VoiceBot:
-    def __init__(self):
-        """Initialize the voice bot with speech recognition and text-to-speech"""
+    def __init__(self, asr=None, microphone=None):
+        """Initialize the voice bot with speech recognition and text-to-speech
+
+        asr is a speech recognition backend (default: ASR_BACKEND, see asr.py);
+        microphone may be replaced, e.g. by asr.WavSource to run from a file.
+        """
+        from asr import get_asr_backend
+        from greetings import GreetingPool
         try:
             import speech_recognition as sr  # type: ignore
             import pyttsx3  # type: ignore
             self._sr = sr
             self.recognizer = sr.Recognizer()
-            self.microphone = sr.Microphone()
+            self.asr = asr or get_asr_backend(recognizer=self.recognizer)
+            self.microphone = microphone or sr.Microphone(sample_rate=self.asr.sample_rate)
             self.tts_engine = pyttsx3.init()
         except Exception as e:
             raise RuntimeError(
@@ -47,198 +69,436 @@ class VoiceBot:
             else:
                 self.tts_engine.setProperty('voice', voices[0].id)
         
+        self.speaker = self._initialize_speaker()
+        self._calibrated = False
+
         # Initialize LLM client
         self.llm_client = self._initialize_llm()
+        self.greetings = GreetingPool()
         
         print("Voice Bot initialized successfully!")
         print("Listening for your questions...")
     
     def _generate_greeting(self):
-        """Generate a short first-person greeting via the LLM using the persona"""
-        try:
-            prompt = (
-                "Give a warm, natural 1–2 sentence greeting in first person as me. "
-                "Do not mention being an AI or assistant. Keep it friendly and real."
-            )
-            greeting = self.llm_client.get_response(prompt)
-            if greeting and isinstance(greeting, str):
-                return greeting.strip()
-        except Exception:
-            pass
-        # Safe fallback if LLM unavailable
-        return "Hey! Good to connect — happy to share about me. What would you like to know?"
+        """A greeting from the pre-generated pool (no LLM call); a stale pool
+        is refreshed in the background for the next start"""
+        greeting = self.greetings.pick()
+        if not isinstance(self.llm_client, FallbackClient):
+            self.greetings.refresh_in_background(self.llm_client)
+        return greeting
+
+    def _initialize_speaker(self):
+        """Sentence-by-sentence speech from the audio cache, or pyttsx3 directly"""
+        from tts import CachedSpeaker
+        from voice_pipeline import Pyttsx3Speaker
+        if TTS_CACHE_ENABLED:
+            try:
+                return CachedSpeaker(self.tts_engine)
+            except Exception as e:
+                print(f"[TTS] Audio cache unavailable ({e}); speaking directly")
+        return Pyttsx3Speaker(self.tts_engine)
 
     def _initialize_llm(self):
         """Initialize the LLM client based on configuration"""
-        if GROQ_API_KEY:
-            return GroqClient(GROQ_API_KEY, GROQ_MODEL)
-        elif OPENAI_API_KEY:
-            return OpenAIClient(OPENAI_API_KEY, OPENAI_MODEL)
-        else:
-            print("Warning: No API key found. Using fallback responses.")
-            return FallbackClient()
+        return initialize_llm()
     
     def listen(self):
-        """Listen for voice input and convert to text"""
+        """Listen for one voice input and convert it to text"""
         with self.microphone as source:
-            # Adjust for ambient noise
-            print("Adjusting for ambient noise... Please wait.")
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
+            if not self._calibrated:
+                # Once: the recognizer keeps adjusting the threshold after that
+                print("Adjusting for ambient noise... Please wait.")
+                self.recognizer.adjust_for_ambient_noise(source, duration=VOICE_CALIBRATION_SECONDS)
+                self._calibrated = True
             print("Listening...")
             
             try:
                 # Listen for audio
-                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
+                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=VOICE_MAX_PHRASE_SECONDS)
                 print("Processing speech...")
-                
-                # Recognize speech using Google's speech recognition
-                text = self.recognizer.recognize_google(audio)
-                print(f"You said: {text}")
-                return text
             except self._sr.WaitTimeoutError:
                 print("No speech detected. Please try again.")
                 return None
-            except self._sr.UnknownValueError:
-                print("Could not understand audio. Please try again.")
-                return None
-            except self._sr.RequestError as e:
-                print(f"Error with speech recognition service: {e}")
-                return None
+        text = self.recognize(audio.frame_data, audio.sample_rate, audio.sample_width)
+        if text:
+            print(f"You said: {text}")
+        return text
+
+    def recognize(self, frame_data, sample_rate, sample_width):
+        """Text of an utterance (raw PCM), or None"""
+        return self.asr.transcribe(frame_data, sample_rate, sample_width)
     
     def speak(self, text):
         """Convert text to speech and speak it"""
         print(f"Bot: {text}")
-        self.tts_engine.say(text)
-        self.tts_engine.runAndWait()
+        self.speaker.speak(text)
+        self.speaker.wait()
     
     def get_response(self, question):
         """Get response from LLM"""
         return self.llm_client.get_response(question)
     
     def run(self):
-        """Main conversation loop"""
-        # Greeting via LLM (first-person, authentic)
-        greeting = self._generate_greeting()
-        self.speak(greeting)
-        
-        while True:
-            try:
-                # Listen for question
-                question = self.listen()
-                
-                if question is None:
-                    continue
-                
-                # Check for exit commands
-                if any(word in question.lower() for word in ['exit', 'quit', 'goodbye', 'bye']):
-                    self.speak("Goodbye! It was nice talking with you.")
-                    break
-                
-                # Get response from LLM
-                response = self.get_response(question)
-                
-                # Speak the response
-                if response:
-                    self.speak(response)
-                else:
-                    self.speak("I'm sorry, I couldn't generate a response. Please try again.")
-                    
-            except KeyboardInterrupt:
-                print("\nExiting...")
-                self.speak("Goodbye!")
-                break
-            except Exception as e:
-                print(f"Error: {e}")
-                self.speak("I encountered an error. Let's try again.")
+        """Main conversation loop
+
+        Listening, recognition, the LLM and speech run concurrently (see
+        voice_pipeline.py): the reply is spoken sentence by sentence while it
+        is generated, and talking over the bot interrupts it.
+        """
+        from intents import CANNED_RESPONSES
+        from voice_pipeline import NO_RESPONSE, VoicePipeline
+        pipeline = VoicePipeline(
+            self.microphone, self.recognizer, self.asr, self.llm_client,
+            self.speaker,
+            # From the pre-generated pool, so the bot speaks right after calibration
+            greeting=self._generate_greeting,
+            # Fixed lines and pooled greetings are rendered into the audio cache while idle
+            prefetch=list(CANNED_RESPONSES.values()) + [NO_RESPONSE, "Goodbye!"] + self.greetings.greetings,
+        )
+        try:
+            pipeline.run()
+        except KeyboardInterrupt:
+            print("\nExiting...")
+            self.speak("Goodbye!")
+
+
+def initialize_llm():
+    """LLM client for the desktop bot and offline jobs, based on configuration"""
+    if GROQ_API_KEY:
+        return GroqClient(GROQ_API_KEY, GROQ_MODEL, GROQ_BASE_URL)
+    elif OPENAI_API_KEY:
+        return OpenAIClient(OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL)
+    else:
+        print("Warning: No API key found. Using fallback responses.")
+        return FallbackClient()
+
+
+def build_messages(question, history, user_context):
+    """Assemble the chat messages for one request: persona, history, question
+
+    Returns (messages, prompt_tokens).
+    """
+    return context_window.build(question, history, user_context)
+
+
+def remember_turn(history, question, answer, prompt_tokens=None):
+    """Append a completed exchange to history, keeping it under the token budget"""
+    context_window.add_turn(history, question, answer, prompt_tokens)
 
 
 class GroqClient:
     """Groq API client - Fast inference with open-source models"""
-    def __init__(self, api_key, model):
-        try:
-            from groq import Groq
-            self.client = Groq(api_key=api_key)
-            self.model = model
-            self.conversation_history = [
-                {"role": "system", "content": SYSTEM_PROMPT}
-            ]
-        except ImportError:
+    def __init__(self, api_key, model, base_url=None):
+        if find_spec("groq") is None:
             print("Groq library not installed. Install with: pip install groq")
-            raise
+            raise ImportError("No module named 'groq'")
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._async_client = None
+        self.model = model
+        register_summarizer(self)
+        # Default history for single-user callers (the desktop voice bot)
+        self.conversation_history = []
+
+    @property
+    def client(self):
+        """SDK client, created (and the SDK imported) on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from groq import Groq, DefaultHttpxClient
+                    self._client = Groq(api_key=self.api_key, base_url=self.base_url,
+                                        http_client=sdk_http_client(DefaultHttpxClient))
+        return self._client
+
+    def reconnect(self):
+        """Drop the HTTP clients (in a worker forked from a preloaded server)"""
+        self._client = None
+        self._async_client = None
+
+    def warm_up(self):
+        """Import the SDK and create the client before the first call needs it"""
+        self.client  # noqa: B018 - created on access
     
-    def get_response(self, question):
-        """Get response from Groq API"""
+    def get_response(self, question, history=None, user_context=None):
+        """Get response from Groq API
+
+        history is the caller's list of prior user/assistant messages and is
+        updated in place; it defaults to this client's own history.
+        """
+        if history is None:
+            history = self.conversation_history
         try:
-            # Add user question to history
-            self.conversation_history.append({"role": "user", "content": question})
-            
+            messages, prompt_tokens = build_messages(question, history, user_context)
             # Get response from API
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=self.conversation_history,
+                messages=messages,
                 # Allow longer answers so responses are not cut off mid-sentence
                 max_tokens=800,
                 temperature=0.7
             )
             
+            record_usage(response)
             answer = response.choices[0].message.content
             
-            # Add assistant response to history
-            self.conversation_history.append({"role": "assistant", "content": answer})
-            
-            # Keep conversation history manageable (last 10 messages)
-            if len(self.conversation_history) > 20:
-                self.conversation_history = [self.conversation_history[0]] + self.conversation_history[-19:]
-            
+            remember_turn(history, question, answer, prompt_tokens)
             return answer
         except Exception as e:
             print(f"Groq API Error: {e}")
             return None
 
+    def stream_response(self, question, history=None, user_context=None):
+        """Yield the Groq reply in chunks as they arrive
+
+        history is updated once the full reply has been received.
+        """
+        if history is None:
+            history = self.conversation_history
+        parts = []
+        messages, prompt_tokens = build_messages(question, history, user_context)
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=800,
+                temperature=0.7,
+                stream=True
+            )
+            # Closing the generator early (the voice bot's barge-in) closes the HTTP stream
+            with stream:
+                for chunk in stream:
+                    record_usage(chunk)
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    if text:
+                        parts.append(text)
+                        yield text
+        except Exception as e:
+            print(f"Groq API Error: {e}")
+            return
+        if parts:
+            remember_turn(history, question, "".join(parts), prompt_tokens)
+
+    @property
+    def async_client(self):
+        """Async SDK client, created on first use by the async web app"""
+        if self._async_client is None:
+            from groq import AsyncGroq, DefaultAsyncHttpxClient
+            self._async_client = AsyncGroq(api_key=self.api_key, base_url=self.base_url,
+                                           http_client=sdk_async_http_client(DefaultAsyncHttpxClient))
+        return self._async_client
+
+    async def aget_response(self, question, history=None, user_context=None):
+        """Async version of get_response"""
+        if history is None:
+            history = self.conversation_history
+        try:
+            messages, prompt_tokens = build_messages(question, history, user_context)
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=800,
+                temperature=0.7
+            )
+            record_usage(response)
+            answer = response.choices[0].message.content
+            remember_turn(history, question, answer, prompt_tokens)
+            return answer
+        except Exception as e:
+            print(f"Groq API Error: {e}")
+            return None
+
+    async def astream_response(self, question, history=None, user_context=None):
+        """Async version of stream_response"""
+        if history is None:
+            history = self.conversation_history
+        parts = []
+        messages, prompt_tokens = build_messages(question, history, user_context)
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=800,
+                temperature=0.7,
+                stream=True
+            )
+            async for chunk in stream:
+                record_usage(chunk)
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            print(f"Groq API Error: {e}")
+            return
+        if parts:
+            remember_turn(history, question, "".join(parts), prompt_tokens)
+
 
 class OpenAIClient:
     """OpenAI API client"""
-    def __init__(self, api_key, model):
-        try:
-            from openai import OpenAI
-            self.client = OpenAI(api_key=api_key)
-            self.model = model
-            self.conversation_history = [
-                {"role": "system", "content": SYSTEM_PROMPT}
-            ]
-        except ImportError:
+    def __init__(self, api_key, model, base_url=None):
+        if find_spec("openai") is None:
             print("OpenAI library not installed. Install with: pip install openai")
-            raise
+            raise ImportError("No module named 'openai'")
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._async_client = None
+        self.model = model
+        register_summarizer(self)
+        # Default history for single-user callers (the desktop voice bot)
+        self.conversation_history = []
+
+    @property
+    def client(self):
+        """SDK client, created (and the SDK imported) on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI, DefaultHttpxClient
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          http_client=sdk_http_client(DefaultHttpxClient))
+        return self._client
+
+    def reconnect(self):
+        """Drop the HTTP clients (in a worker forked from a preloaded server)"""
+        self._client = None
+        self._async_client = None
+
+    def warm_up(self):
+        """Import the SDK and create the client before the first call needs it"""
+        self.client  # noqa: B018 - created on access
     
-    def get_response(self, question):
-        """Get response from OpenAI API"""
+    def get_response(self, question, history=None, user_context=None):
+        """Get response from OpenAI API
+
+        history is the caller's list of prior user/assistant messages and is
+        updated in place; it defaults to this client's own history.
+        """
+        if history is None:
+            history = self.conversation_history
         try:
-            # Add user question to history
-            self.conversation_history.append({"role": "user", "content": question})
-            
+            messages, prompt_tokens = build_messages(question, history, user_context)
             # Get response from API
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=self.conversation_history,
+                messages=messages,
                 # Allow longer answers so responses are not cut off mid-sentence
                 max_tokens=800,
                 temperature=0.7
             )
             
+            record_usage(response)
             answer = response.choices[0].message.content
             
-            # Add assistant response to history
-            self.conversation_history.append({"role": "assistant", "content": answer})
-            
-            # Keep conversation history manageable (last 10 messages)
-            if len(self.conversation_history) > 20:
-                self.conversation_history = [self.conversation_history[0]] + self.conversation_history[-19:]
-            
+            remember_turn(history, question, answer, prompt_tokens)
+            return answer
+        except Exception as e:
+            print(f"OpenAI API Error: {e}")
+            return None
+
+    def stream_response(self, question, history=None, user_context=None):
+        """Yield the OpenAI reply in chunks as they arrive
+
+        history is updated once the full reply has been received.
+        """
+        if history is None:
+            history = self.conversation_history
+        parts = []
+        messages, prompt_tokens = build_messages(question, history, user_context)
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=800,
+                temperature=0.7,
+                stream=True,
+                # Final chunk carries token usage (incl. cached prompt tokens)
+                stream_options={"include_usage": True}
+            )
+            # Closing the generator early (the voice bot's barge-in) closes the HTTP stream
+            with stream:
+                for chunk in stream:
+                    record_usage(chunk)
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    if text:
+                        parts.append(text)
+                        yield text
+        except Exception as e:
+            print(f"OpenAI API Error: {e}")
+            return
+        if parts:
+            remember_turn(history, question, "".join(parts), prompt_tokens)
+
+    @property
+    def async_client(self):
+        """Async SDK client, created on first use by the async web app"""
+        if self._async_client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                             http_client=sdk_async_http_client(DefaultAsyncHttpxClient))
+        return self._async_client
+
+    async def aget_response(self, question, history=None, user_context=None):
+        """Async version of get_response"""
+        if history is None:
+            history = self.conversation_history
+        try:
+            messages, prompt_tokens = build_messages(question, history, user_context)
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=800,
+                temperature=0.7
+            )
+            record_usage(response)
+            answer = response.choices[0].message.content
+            remember_turn(history, question, answer, prompt_tokens)
             return answer
         except Exception as e:
             print(f"OpenAI API Error: {e}")
             return None
 
+    async def astream_response(self, question, history=None, user_context=None):
+        """Async version of stream_response"""
+        if history is None:
+            history = self.conversation_history
+        parts = []
+        messages, prompt_tokens = build_messages(question, history, user_context)
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=800,
+                temperature=0.7,
+                stream=True,
+                # Final chunk carries token usage (incl. cached prompt tokens)
+                stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                record_usage(chunk)
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            print(f"OpenAI API Error: {e}")
+            return
+        if parts:
+            remember_turn(history, question, "".join(parts), prompt_tokens)
+
 
 class HuggingFaceClient:
     """Hugging Face API client (free alternative)"""
@@ -246,17 +506,24 @@ class HuggingFaceClient:
         # Use a text generation model that works better for Q&A
         self.api_url = f"https://api-inference.huggingface.co/models/{HUGGINGFACE_MODEL}"
         self.headers = {}
-        self.conversation_context = SYSTEM_PROMPT
+        self.model = HUGGINGFACE_MODEL
+        self.conversation_history = []
+        register_summarizer(self)
         # Note: Some models don't require API key, but you can add one if needed
         # self.headers = {"Authorization": f"Bearer {YOUR_HF_TOKEN}"}
     
-    def get_response(self, question):
+    def get_response(self, question, history=None, user_context=None):
         """Get response from Hugging Face API"""
+        if history is None:
+            history = self.conversation_history
         try:
-            import requests
-            
             # Format prompt for text generation
-            prompt = f"{self.conversation_context}\n\nUser: {question}\nAssistant:"
+            messages, prompt_tokens = build_messages(question, history, user_context)
+            prompt = "\n\n".join(
+                message["content"] if message["role"] == "system"
+                else f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}"
+                for message in messages
+            ) + "\nAssistant:"
             
             payload = {
                 "inputs": prompt,
@@ -267,7 +534,7 @@ class HuggingFaceClient:
                 }
             }
             
-            response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=30)
+            response = http_session().post(self.api_url, headers=self.headers, json=payload, timeout=30)
             
             if response.status_code == 200:
                 result = response.json()
@@ -278,15 +545,20 @@ class HuggingFaceClient:
                     # Remove any repeated prompts
                     if "Assistant:" in generated_text:
                         generated_text = generated_text.split("Assistant:")[-1].strip()
-                    return generated_text if generated_text else None
                 elif isinstance(result, dict) and 'generated_text' in result:
-                    return result['generated_text'].strip()
+                    generated_text = result['generated_text'].strip()
+                else:
+                    return None
+                if not generated_text:
+                    return None
+                remember_turn(history, question, generated_text, prompt_tokens)
+                return generated_text
             elif response.status_code == 503:
                 # Model is loading, wait and retry
                 print("Model is loading, please wait...")
                 import time
                 time.sleep(5)
-                return self.get_response(question)
+                return self.get_response(question, history, user_context)
             else:
                 print(f"Hugging Face API Error: {response.status_code} - {response.text}")
                 return None
@@ -294,20 +566,71 @@ class HuggingFaceClient:
             print(f"Hugging Face API Error: {e}")
             return None
 
+    def stream_response(self, question, history=None, user_context=None):
+        """Hugging Face replies are not streamed; yield the whole reply at once"""
+        answer = self.get_response(question, history, user_context)
+        if answer:
+            yield answer
+
+    async def aget_response(self, question, history=None, user_context=None):
+        """Run the blocking request in a worker thread"""
+        return await asyncio.to_thread(self.get_response, question, history, user_context)
+
+    async def astream_response(self, question, history=None, user_context=None):
+        """Yield the whole reply at once"""
+        answer = await self.aget_response(question, history, user_context)
+        if answer:
+            yield answer
+
+
+# FallbackClient's replies by keyword, and its reply to anything else
+FALLBACK_KEYWORD_REPLIES = (
+    ("life", "I was born and brought up in Indore, and my journey so far has been about curiosity and growth."),
+    ("superpower", "I’d say my biggest superpower is adaptability. I learn fast and adjust to challenges quickly."),
+    ("grow", "I’m focusing on growing in AI, software, finance, and real estate — all areas that excite me."),
+    ("boundaries", "Whenever I fear being mediocre, I push harder — I believe real growth begins there."),
+)
+FALLBACK_DEFAULT_REPLY = "That’s a great question — I’d like to reflect on that a bit more."
+_FALLBACK_REPLIES = frozenset([reply for _, reply in FALLBACK_KEYWORD_REPLIES] + [FALLBACK_DEFAULT_REPLY])
+
+
+def is_fallback_reply(text):
+    """True if text is one of FallbackClient's canned replies rather than a real answer
+
+    Recognized by content, so it holds however the reply reached the caller
+    (through the router, a shared single-flight stream or another worker).
+    Such replies must never be cached: they stand in for an answer only while
+    every provider is failing.
+    """
+    return bool(text) and text.strip() in _FALLBACK_REPLIES
+
 
 class FallbackClient:
-    """Basic offline fallback"""
-    def get_response(self, question):
+    """Basic offline fallback: precomputed FAQ answers, else keyword replies"""
+    def get_response(self, question, history=None, user_context=None):
+        from faq_index import get_faq_index
+        faq_index = get_faq_index()
+        if faq_index is not None and not history:
+            answer = faq_index.lookup(question)
+            if answer is not None:
+                return answer
         q = question.lower()
-        if "life" in q:
-            return "I was born and brought up in Indore, and my journey so far has been about curiosity and growth."
-        if "superpower" in q:
-            return "I’d say my biggest superpower is adaptability. I learn fast and adjust to challenges quickly."
-        if "grow" in q:
-            return "I’m focusing on growing in AI, software, finance, and real estate — all areas that excite me."
-        if "boundaries" in q:
-            return "Whenever I fear being mediocre, I push harder — I believe real growth begins there."
-        return "That’s a great question — I’d like to reflect on that a bit more."
+        for keyword, reply in FALLBACK_KEYWORD_REPLIES:
+            if keyword in q:
+                return reply
+        return FALLBACK_DEFAULT_REPLY
+
+    def stream_response(self, question, history=None, user_context=None):
+        """Yield the canned reply as a single chunk"""
+        yield self.get_response(question, history, user_context)
+
+    async def aget_response(self, question, history=None, user_context=None):
+        """Async version of get_response"""
+        return self.get_response(question, history, user_context)
+
+    async def astream_response(self, question, history=None, user_context=None):
+        """Yield the canned reply as a single chunk"""
+        yield self.get_response(question, history, user_context)
 
 
 if __name__ == "__main__":
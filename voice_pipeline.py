@@ -0,0 +1,433 @@
+"""
+Pipelined listen / think / speak loop for the desktop voice bot
+
+VoiceBot.run used to do one thing at a time: calibrate the microphone for a
+second, record, wait for recognition, wait for the whole LLM reply, then
+block until the speech finished. VoicePipeline runs each step as its own
+stage, linked by small bounded queues:
+
+    capture -> recognize -> think -> speak
+    (thread)   (thread)     (thread) (caller's thread)
+
+- capture reads microphone frames continuously. It measures ambient noise
+  once at startup and keeps adapting the speech threshold on quiet frames,
+  and ends an utterance after VOICE_END_SILENCE_SECONDS of silence. Frames
+  are passed on while the visitor is still talking.
+- recognize feeds them to the speech recognition backend (asr.py). A
+  streaming backend decodes as they arrive and may find the end of the
+  utterance itself, so the question can go to the LLM before the silence
+  timeout.
+- think streams the LLM reply and cuts it into sentences, so the first
+  sentence is spoken while the rest is still being generated.
+- speak plays sentences as they come. It runs on the thread that created the
+  TTS engine, since some engines (SAPI on Windows) are bound to it.
+
+Each utterance starts a new turn. Work and queued items of older turns are
+dropped, so when the visitor talks over the bot (barge-in, VOICE_BARGE_IN),
+the LLM stream is closed and speech stops at the next word.
+"""
+import math
+import queue
+import re
+import threading
+import time
+from array import array
+from collections import deque
+
+from config import (
+    VOICE_BARGE_IN,
+    VOICE_BARGE_IN_RATIO,
+    VOICE_CALIBRATION_SECONDS,
+    VOICE_END_SILENCE_SECONDS,
+    VOICE_MAX_PHRASE_SECONDS,
+)
+from intents import EXIT, RESET, canned_response, detect_intent
+
+# A sentence ends at ., ! or ? (optionally followed by a closing quote or
+# bracket) and whitespace; "e.g. " or "3.5" are not sentence ends
+_SENTENCE_END = re.compile(r"(?<!\be\.g)(?<!\bi\.e)(?<!\bMr)(?<!\bDr)(?<!\bMs)[.!?…]+[\"'”’)\]]*\s+")
+# Shorter pieces are joined with the next sentence rather than spoken alone
+_MIN_SENTENCE_CHARS = 12
+
+NO_RESPONSE = "I'm sorry, I couldn't generate a response. Please try again."
+
+
+def split_sentences(text):
+    """(complete sentences, remaining text) of a partial reply"""
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() - start >= _MIN_SENTENCE_CHARS:
+            sentences.append(text[start:match.end()].strip())
+            start = match.end()
+    return sentences, text[start:]
+
+
+class SentenceBuffer:
+    """Collects streamed chunks and hands out whole sentences"""
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, chunk):
+        sentences, self._pending = split_sentences(self._pending + chunk)
+        return sentences
+
+    def flush(self):
+        rest, self._pending = self._pending.strip(), ""
+        return [rest] if rest else []
+
+
+class Turns:
+    """Numbered turns; starting one makes every older turn stale"""
+    def __init__(self):
+        self._current = 0
+        self._lock = threading.Lock()
+        # Set while a reply is being generated or spoken
+        self.busy = threading.Event()
+
+    def start(self):
+        with self._lock:
+            self._current += 1
+            return self._current
+
+    def is_current(self, turn):
+        return turn == self._current
+
+
+# array typecodes of signed samples by width in bytes
+_SAMPLE_TYPECODES = {1: "b", 2: "h", 4: "i" if array("i").itemsize == 4 else "l"}
+
+
+def rms(frame, sample_width=2):
+    """Root mean square energy of a frame of signed little-endian samples"""
+    usable = len(frame) - len(frame) % sample_width
+    if sample_width in _SAMPLE_TYPECODES:
+        samples = array(_SAMPLE_TYPECODES[sample_width], frame[:usable])
+    else:  # 24-bit audio: no array typecode
+        samples = [int.from_bytes(frame[i:i + sample_width], "little", signed=True)
+                   for i in range(0, usable, sample_width)]
+    if not samples:
+        return 0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class Capture:
+    """Energy-based voice activity detection on a stream of microphone frames
+
+    Uses the speech_recognition Recognizer's tuning attributes
+    (energy_threshold, dynamic_energy_ratio, dynamic_energy_adjustment_damping)
+    so existing tweaks of the recognizer keep working.
+    """
+    def __init__(self, recognizer, sample_rate, sample_width, frame_samples,
+                 end_silence_seconds=0.5, max_phrase_seconds=10, barge_in_ratio=2.0,
+                 preroll_seconds=0.3, min_speech_seconds=0.15):
+        self.recognizer = recognizer
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_seconds = frame_samples / sample_rate
+        self.end_silence_frames = max(1, round(end_silence_seconds / self.frame_seconds))
+        self.max_phrase_frames = round(max_phrase_seconds / self.frame_seconds)
+        self.min_speech_frames = max(1, round(min_speech_seconds / self.frame_seconds))
+        self.barge_in_ratio = barge_in_ratio
+        self._preroll = deque(maxlen=max(1, round(preroll_seconds / self.frame_seconds)))
+        self._phrase = None
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self.last_voice_at = 0.0
+
+    def calibrate(self, frames):
+        """Set the speech threshold from a few frames of ambient noise (done once)"""
+        energies = [rms(frame, self.sample_width) for frame in frames]
+        if energies:
+            ambient = sum(energies) / len(energies)
+            self.recognizer.energy_threshold = max(ambient * self.recognizer.dynamic_energy_ratio, 1)
+
+    def _adapt(self, energy):
+        # Same exponential adjustment speech_recognition applies between phrases,
+        # applied continuously to every quiet frame instead of once per listen()
+        if not getattr(self.recognizer, "dynamic_energy_threshold", True):
+            return
+        damping = self.recognizer.dynamic_energy_adjustment_damping ** self.frame_seconds
+        target = energy * self.recognizer.dynamic_energy_ratio
+        self.recognizer.energy_threshold = self.recognizer.energy_threshold * damping + target * (1 - damping)
+
+    def feed(self, frame, bot_speaking=False):
+        """Process one frame, returning (event, audio):
+
+        ("speech", audio so far) once an utterance is confirmed, then
+        ("audio", frame) for each following frame and ("end", frame) for its
+        last one; (None, None) otherwise.
+
+        While the bot speaks, the threshold is raised by barge_in_ratio so its
+        own voice from the speakers is not taken for the visitor's.
+        """
+        energy = rms(frame, self.sample_width)
+        threshold = self.recognizer.energy_threshold * (self.barge_in_ratio if bot_speaking else 1)
+        loud = energy > threshold
+        if self._phrase is None:
+            if not loud:
+                if not bot_speaking:
+                    self._adapt(energy)
+                self._preroll.append(frame)
+                return None, None
+            self._phrase = list(self._preroll)
+            self._preroll.clear()
+            self._speech_frames = 0
+            self._silent_frames = 0
+        self._phrase.append(frame)
+        if loud:
+            self.last_voice_at = time.perf_counter()
+            self._speech_frames += 1
+            self._silent_frames = 0
+            if self._speech_frames == self.min_speech_frames:
+                return "speech", b"".join(self._phrase)
+        else:
+            self._silent_frames += 1
+        confirmed = self._speech_frames >= self.min_speech_frames
+        if self._silent_frames >= self.end_silence_frames or len(self._phrase) >= self.max_phrase_frames:
+            self._phrase = None
+            # Shorter noises (a click or a cough) are dropped
+            return ("end", frame) if confirmed else (None, None)
+        return ("audio", frame) if confirmed else (None, None)
+
+
+class Pyttsx3Speaker:
+    """Speaks sentences with pyttsx3, stopping mid-sentence when told to"""
+    def __init__(self, engine):
+        self.engine = engine
+        self._should_stop = None
+        # Called by the engine's loop on its own thread; stop() is only
+        # reliable from there
+        engine.connect("started-word", self._on_word)
+
+    def _on_word(self, name, location, length):
+        if self._should_stop is not None and self._should_stop():
+            self.engine.stop()
+
+    def speak(self, text, should_stop=None):
+        self._should_stop = should_stop
+        try:
+            self.engine.say(text)
+            self.engine.runAndWait()
+        finally:
+            self._should_stop = None
+
+    def is_speaking(self):
+        return self._should_stop is not None
+
+    def wait(self, should_stop=None):
+        """speak() only returns once the speech is over"""
+
+    def prepare(self, text):
+        """Nothing to prepare: speech is synthesized as it plays"""
+
+
+_END_OF_TURN = object()
+_EXIT = object()
+
+
+class VoicePipeline:
+    """Concurrent capture / recognize / think / speak stages for one voice session
+
+    microphone: a speech_recognition Microphone (or anything with the same
+    context manager, stream.read, SAMPLE_RATE, SAMPLE_WIDTH and CHUNK, such
+    as asr.WavSource)
+    asr: a speech recognition backend (asr.ASRBackend)
+    speaker: Pyttsx3Speaker or tts.CachedSpeaker (speak, is_speaking, wait, prepare)
+    prefetch: phrases the speaker prepares while idle (canned replies)
+    """
+    def __init__(self, microphone, recognizer, asr, llm_client, speaker, greeting=None, prefetch=(),
+                 barge_in=VOICE_BARGE_IN, calibration_seconds=VOICE_CALIBRATION_SECONDS,
+                 end_silence_seconds=VOICE_END_SILENCE_SECONDS, max_phrase_seconds=VOICE_MAX_PHRASE_SECONDS,
+                 barge_in_ratio=VOICE_BARGE_IN_RATIO):
+        self.microphone = microphone
+        self.recognizer = recognizer
+        self.asr = asr
+        self.llm_client = llm_client
+        self.speaker = speaker
+        self.greeting = greeting
+        self._prefetch = list(prefetch)
+        self.barge_in = barge_in
+        self.calibration_seconds = calibration_seconds
+        self.end_silence_seconds = end_silence_seconds
+        self.max_phrase_seconds = max_phrase_seconds
+        self.barge_in_ratio = barge_in_ratio
+        self.turns = Turns()
+        # Bounded, so a stalled stage holds back the ones before it
+        # Utterance audio, frame by frame (about 16 s of 64 ms frames)
+        self.audio = queue.Queue(maxsize=256)
+        self.questions = queue.Queue(maxsize=2)
+        self.sentences = queue.Queue(maxsize=8)
+        self.stopped = threading.Event()
+        self.calibrated = threading.Event()
+        # (turn, Capture) of the utterance being heard; its last_voice_at is
+        # when the visitor stopped talking
+        self._heard = (None, None)
+
+    # Helpers
+
+    def _put(self, stage_queue, turn, item):
+        """Queue an item of a turn, giving up once the turn is stale"""
+        while not self.stopped.is_set():
+            if not self.turns.is_current(turn):
+                return False
+            try:
+                stage_queue.put((turn, item), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, stage_queue):
+        while not self.stopped.is_set():
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None, None
+
+    def _run_stage(self, target):
+        try:
+            target()
+        except Exception as e:
+            print(f"[VOICE] {target.__name__} stopped: {e}")
+            self.stopped.set()
+
+    # Stages
+
+    def capture(self):
+        with self.microphone as source:
+            capture = Capture(
+                self.recognizer, source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK,
+                end_silence_seconds=self.end_silence_seconds,
+                max_phrase_seconds=self.max_phrase_seconds,
+                barge_in_ratio=self.barge_in_ratio,
+            )
+            frames = max(1, round(self.calibration_seconds * source.SAMPLE_RATE / source.CHUNK))
+            capture.calibrate([source.stream.read(source.CHUNK) for _ in range(frames)])
+            print(f"[VOICE] Calibrated: speech threshold {self.recognizer.energy_threshold:.0f}")
+            self.calibrated.set()
+            turn = None
+            while not self.stopped.is_set():
+                frame = source.stream.read(source.CHUNK)
+                busy = self.turns.busy.is_set()
+                if busy and not self.barge_in:
+                    continue  # Don't listen to ourselves
+                event, audio = capture.feed(frame, bot_speaking=self.speaker.is_speaking())
+                if event == "speech":
+                    # A new turn starts as soon as the visitor speaks, which
+                    # cancels the reply in progress (barge-in)
+                    turn = self.turns.start()
+                    self._heard = (turn, capture)
+                    if busy:
+                        print("[VOICE] Barge-in: stopping the current reply")
+                        self.turns.busy.clear()
+                if event and turn is not None:
+                    self._put(self.audio, turn, (event, audio))
+                if event == "end":
+                    turn = None
+
+    def recognize_stage(self):
+        stream, stream_turn, answered = None, None, False
+        sample_rate, sample_width = self.microphone.SAMPLE_RATE, self.microphone.SAMPLE_WIDTH
+        while not self.stopped.is_set():
+            turn, item = self._get(self.audio)
+            if item is None or not self.turns.is_current(turn):
+                continue
+            event, audio = item
+            if turn != stream_turn:
+                stream, stream_turn, answered = self.asr.start(sample_rate, sample_width), turn, False
+            if answered:
+                continue  # The backend already ended this utterance
+            partial, endpoint = stream.accept(audio)
+            if partial and not endpoint:
+                print(f"[ASR] ... {partial}")
+            if not (endpoint or event == "end"):
+                continue
+            answered = True
+            started_at = time.perf_counter()
+            text = stream.finish()
+            if not self.asr.streaming:
+                print(f"[ASR] {self.asr.name}: {time.perf_counter() - started_at:.2f}s")
+            if text:
+                print(f"You said: {text}")
+                self._put(self.questions, turn, text)
+
+    def think(self):
+        if self.greeting is not None:
+            greeting = self.greeting() if callable(self.greeting) else self.greeting
+            self.turns.busy.set()
+            self._put(self.sentences, 0, greeting)
+            self._put(self.sentences, 0, _END_OF_TURN)
+        while not self.stopped.is_set():
+            turn, question = self._get(self.questions)
+            if question is None or not self.turns.is_current(turn):
+                continue
+            self.turns.busy.set()
+            self._answer(turn, question)
+
+    def _answer(self, turn, question):
+        # Greetings and goodbyes don't need the LLM
+        intent = detect_intent(question)
+        canned = canned_response(intent)
+        if intent.name == RESET and hasattr(self.llm_client, "conversation_history"):
+            self.llm_client.conversation_history.clear()
+        if canned:
+            self._put(self.sentences, turn, canned)
+            self._put(self.sentences, turn, _EXIT if intent.name == EXIT else _END_OF_TURN)
+            return
+        buffer = SentenceBuffer()
+        spoke = False
+        chunks = self.llm_client.stream_response(question)
+        try:
+            for chunk in chunks:
+                if not self.turns.is_current(turn):
+                    print("[VOICE] LLM reply cancelled")
+                    return
+                for sentence in buffer.feed(chunk):
+                    spoke = self._put(self.sentences, turn, sentence) or spoke
+            for sentence in buffer.flush():
+                spoke = self._put(self.sentences, turn, sentence) or spoke
+        finally:
+            # Closes the provider's HTTP stream when the turn was cancelled
+            chunks.close()
+        if not spoke:
+            self._put(self.sentences, turn, NO_RESPONSE)
+        self._put(self.sentences, turn, _END_OF_TURN)
+
+    def speak_stage(self):
+        """Speak queued sentences until the session ends (runs on the caller's thread)"""
+        self.calibrated.wait()
+        while not self.stopped.is_set():
+            try:
+                turn, sentence = self.sentences.get(timeout=0.1)
+            except queue.Empty:
+                if self._prefetch:
+                    self.speaker.prepare(self._prefetch.pop())
+                continue
+            if not self.turns.is_current(turn):
+                continue
+            should_stop = lambda: not self.turns.is_current(turn)  # noqa: E731
+            if sentence is _END_OF_TURN or sentence is _EXIT:
+                self.speaker.wait(should_stop)
+                self.turns.busy.clear()
+                if sentence is _EXIT:
+                    self.stopped.set()
+                continue
+            heard_turn, capture = self._heard
+            if heard_turn == turn:
+                self._heard = (None, None)
+                print(f"[VOICE] Turn latency: {time.perf_counter() - capture.last_voice_at:.2f}s "
+                      f"from end of speech to first audio")
+            print(f"Bot: {sentence}")
+            self.speaker.speak(sentence, should_stop)
+
+    def run(self):
+        """Run the session until the visitor says goodbye or presses Ctrl+C"""
+        for stage in (self.capture, self.recognize_stage, self.think):
+            threading.Thread(target=self._run_stage, args=(stage,), name=f"voice-{stage.__name__}",
+                             daemon=True).start()
+        try:
+            self.speak_stage()
+        finally:
+            self.stopped.set()